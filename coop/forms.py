@@ -1,7 +1,9 @@
+from decimal import Decimal
+
 from django.contrib.auth import get_user_model
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
-from .models import User, Member, Vehicle, Batch, Document, DocumentEntry, Announcement, PaymentType, PaymentEntry, PaymentYear, CarWashCompliance
+from .models import User, Member, Vehicle, Batch, Document, DocumentEntry, Announcement, PaymentType, PaymentEntry, PaymentYear, CarWashCompliance, PaymentLog
 
 User = get_user_model()
 
@@ -243,6 +245,63 @@ class PaymentEntryForm(forms.ModelForm):
         }
 
 
+class PaymentBatchForm(forms.Form):
+    """
+    Several months of several "From Members" payment types for one member,
+    posted together. One amount field per payment type and month; blank
+    cells are skipped.
+    """
+    payment_method = forms.ChoiceField(
+        choices=PaymentLog.PAYMENT_METHOD_CHOICES,
+        initial='cash',
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+
+    def __init__(self, *args, payment_types=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.payment_types = list(payment_types)
+        for payment_type in self.payment_types:
+            for month in range(1, 13):
+                self.fields[self.amount_field(payment_type.pk, month)] = forms.DecimalField(
+                    required=False,
+                    min_value=Decimal('0.01'),
+                    max_digits=10,
+                    decimal_places=2,
+                    widget=forms.NumberInput(attrs={
+                        'class': 'form-control form-control-sm',
+                        'step': '0.01',
+                        'placeholder': payment_type.amount or '',
+                    })
+                )
+
+    @staticmethod
+    def amount_field(payment_type_id, month):
+        return f'amount_{payment_type_id}_{month}'
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not self.errors and not self.lines():
+            raise forms.ValidationError("Enter at least one amount.")
+        return cleaned_data
+
+    def lines(self):
+        """(payment_type, month, amount) for every filled cell."""
+        lines = []
+        for payment_type in self.payment_types:
+            for month in range(1, 13):
+                amount = self.cleaned_data.get(self.amount_field(payment_type.pk, month))
+                if amount is not None:
+                    lines.append((payment_type, month, amount))
+        return lines
+
+    def rows(self):
+        """(payment_type, 12 bound amount fields) for the entry grid."""
+        return [
+            (payment_type, [self[self.amount_field(payment_type.pk, month)] for month in range(1, 13)])
+            for payment_type in self.payment_types
+        ]
+
+
 # Password Reset Forms
 class PasswordResetRequestForm(forms.Form):
     """Step 1: User enters email to request password reset"""
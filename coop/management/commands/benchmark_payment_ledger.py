@@ -0,0 +1,105 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from coop.models import Member, PaymentEntry, PaymentType, PaymentYear
+from coop.payments import (
+    MemberLedger, build_payment_pivot, delete_placeholder_entries, invalidate_all_member_years,
+    invalidate_year_totals, placeholder_entries, year_monthly_totals,
+)
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compare payment table size and read times with and without placeholder entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per query; the best time is reported')
+        parser.add_argument('--members', type=int, default=50, help='Members loaded through MemberLedger per run')
+        parser.add_argument('--keep', action='store_true',
+                            help='Keep the placeholder deletion instead of rolling it back')
+
+    def handle(self, *args, **options):
+        year = PaymentYear.objects.order_by('-year').first()
+        if year is None:
+            self.stdout.write(self.style.ERROR('No payment years to benchmark.'))
+            return
+
+        try:
+            with transaction.atomic():
+                before = self._measure(year, options)
+                deleted = delete_placeholder_entries()
+                after = self._measure(year, options)
+                if not options['keep']:
+                    raise Rollback
+        except Rollback:
+            pass
+        finally:
+            # Cached figures may describe the rolled back state
+            for year_id in PaymentYear.objects.values_list('pk', flat=True):
+                invalidate_year_totals(year_id)
+            invalidate_all_member_years()
+
+        self.stdout.write(f'Year {year.year}: {deleted} placeholder entries '
+                          f'{"deleted" if options["keep"] else "deleted (rolled back)"}')
+        self.stdout.write(f'{"":<24}{"before":>14}{"after":>14}')
+        for label in before:
+            self.stdout.write(f'{label:<24}{self._format(before[label]):>14}{self._format(after[label]):>14}')
+
+    def _measure(self, year, options):
+        member_ids = list(Member.objects.order_by('pk').values_list('pk', flat=True))
+        from_members_types = list(PaymentType.objects.filter(year=year, payment_type='from_members'))
+        ledger_members = list(Member.objects.order_by('pk')[:options['members']])
+
+        def year_totals():
+            invalidate_year_totals(year.pk)
+            year_monthly_totals(year)
+
+        return {
+            'entries': PaymentEntry.objects.count(),
+            'placeholders': placeholder_entries().count(),
+            'table bytes': self._table_bytes(),
+            'year totals ms': self._best_of(options['repeat'], year_totals),
+            'member grid ms': self._best_of(options['repeat'], lambda: build_payment_pivot(member_ids, from_members_types)),
+            'member ledgers ms': self._best_of(
+                options['repeat'], lambda: [MemberLedger(member, year) for member in ledger_members]
+            ),
+        }
+
+    def _table_bytes(self):
+        # Payload bytes of the table and its indexes, where the backend reports them
+        table = PaymentEntry._meta.db_table
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                if connection.vendor == 'sqlite':
+                    cursor.execute(
+                        'SELECT SUM(pgsize - unused) FROM dbstat '
+                        'WHERE name IN (SELECT name FROM sqlite_master WHERE tbl_name = %s)',
+                        [table],
+                    )
+                elif connection.vendor == 'postgresql':
+                    cursor.execute('SELECT pg_total_relation_size(%s)', [table])
+                else:
+                    return None
+                return cursor.fetchone()[0]
+        except Exception:
+            return None
+
+    def _best_of(self, repeat, func):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best * 1000
+
+    def _format(self, value):
+        if value is None:
+            return 'n/a'
+        if isinstance(value, float):
+            return f'{value:.1f}'
+        return f'{value:,}'
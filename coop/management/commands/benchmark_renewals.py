@@ -0,0 +1,69 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from coop.renewals import (
+    BUCKETS, classify_days_left, classify_renewal_dates, local_today, next_expiry_for,
+)
+
+class Command(BaseCommand):
+    help = 'Benchmark the vectorized renewal classifier against the per-vehicle loop'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[10000, 100000],
+                            help='Numbers of vehicles to classify (default: 10000 100000)')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per size; the best time is reported')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        today = local_today()
+
+        for size in options['sizes']:
+            # Mix of stale, current and missing renewal dates, including leap days
+            renewal_dates = []
+            for _ in range(size):
+                roll = rng.random()
+                if roll < 0.05:
+                    renewal_dates.append(None)
+                elif roll < 0.07:
+                    renewal_dates.append(today.replace(year=rng.choice([2016, 2020, 2024]), month=2, day=29))
+                else:
+                    renewal_dates.append(today + timedelta(days=rng.randint(-8 * 365, 2 * 365)))
+
+            loop_time = self._best_of(options['repeat'], lambda: self._loop(renewal_dates, today))
+            vector_time = self._best_of(options['repeat'], lambda: classify_renewal_dates(renewal_dates, today))
+
+            expected = self._loop(renewal_dates, today)
+            expiries, _, codes = classify_renewal_dates(renewal_dates, today)
+            actual = [
+                (expiry.item() if BUCKETS[code] != 'none' else None, BUCKETS[code])
+                for expiry, code in zip(expiries, codes)
+            ]
+            if actual != expected:
+                mismatches = sum(1 for a, e in zip(actual, expected) if a != e)
+                self.stdout.write(self.style.ERROR(f'{size:>8} vehicles: {mismatches} results differ from the loop'))
+                continue
+
+            self.stdout.write(self.style.SUCCESS(
+                f'{size:>8} vehicles: loop {loop_time * 1000:9.1f} ms | '
+                f'vectorized {vector_time * 1000:7.1f} ms | {loop_time / vector_time:5.1f}x'
+            ))
+
+    def _loop(self, renewal_dates, today):
+        results = []
+        for renewal_date in renewal_dates:
+            expiry = next_expiry_for(renewal_date, today)
+            days_left = (expiry - today).days if expiry else None
+            results.append((expiry, classify_days_left(days_left)))
+        return results
+
+    def _best_of(self, repeat, func):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
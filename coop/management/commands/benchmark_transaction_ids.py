@@ -0,0 +1,82 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+from coop import sequences
+from coop.models import PaymentLog, TransactionSequence
+
+class Command(BaseCommand):
+    help = 'Compare transaction ID throughput of the prefix scan, the sequence table and per-worker blocks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=500, help='Payment logs written per writer (default: 500)')
+        parser.add_argument('--threads', type=int, default=1, help='Parallel writers (default: 1)')
+        parser.add_argument('--block-size', type=int, default=50, help='Block size for the block mode (default: 50)')
+        parser.add_argument('--year', type=int, default=9999,
+                            help='Sequence year used for the run; its logs and sequences are deleted afterwards')
+
+    def handle(self, *args, **options):
+        year = options['year']
+        modes = [
+            ('prefix scan', lambda: self._legacy_id(year), 1),
+            ('sequence', lambda: sequences.next_transaction_id('PMT', year), 1),
+            (f'block of {options["block_size"]}', lambda: sequences.next_transaction_id('PMT', year), options['block_size']),
+        ]
+        try:
+            for label, next_id, block_size in modes:
+                self._cleanup(year)
+                with override_settings(TRANSACTION_ID_BLOCK_SIZE=block_size):
+                    elapsed, written, duplicates = self._run(next_id, year, options)
+                style = self.style.SUCCESS if not duplicates else self.style.ERROR
+                self.stdout.write(style(
+                    f'{label:<14} {written:>7} logs in {elapsed * 1000:9.1f} ms | '
+                    f'{written / elapsed:8.0f} logs/s | {duplicates} failed writes (duplicate IDs)'
+                ))
+        finally:
+            self._cleanup(year)
+
+    def _run(self, next_id, year, options):
+        def writer(_):
+            written = duplicates = 0
+            try:
+                for _ in range(options['count']):
+                    try:
+                        PaymentLog.objects.create(
+                            transaction_id=next_id(),
+                            category='from_members',
+                            payment_type_name='Benchmark',
+                            amount=0,
+                            payment_year=year,
+                            payment_month=1,
+                        )
+                        written += 1
+                    except Exception:
+                        duplicates += 1
+            finally:
+                if options['threads'] > 1:
+                    connection.close()
+            return written, duplicates
+
+        start = time.perf_counter()
+        if options['threads'] > 1:
+            with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+                results = list(pool.map(writer, range(options['threads'])))
+        else:
+            results = [writer(0)]
+        elapsed = time.perf_counter() - start
+        return elapsed, sum(r[0] for r in results), sum(r[1] for r in results)
+
+    def _legacy_id(self, year):
+        # The scan generate_transaction_id() used before the sequence table
+        last_log = PaymentLog.objects.filter(
+            transaction_id__startswith=f"PMT-{year}-"
+        ).order_by('-transaction_id').first()
+        new_num = int(last_log.transaction_id.split('-')[-1]) + 1 if last_log else 1
+        return f"PMT-{year}-{new_num:05d}"
+
+    def _cleanup(self, year):
+        PaymentLog.objects.filter(transaction_id__startswith=f"PMT-{year}-").delete()
+        TransactionSequence.objects.filter(year=year).delete()
+        sequences._blocks.clear()
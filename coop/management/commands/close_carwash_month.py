@@ -0,0 +1,40 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from coop.models import PaymentYear
+from coop.payments import close_carwash_month
+
+class Command(BaseCommand):
+    help = 'Record car wash compliance for a closed month and assess penalties for shortfalls (safe to re-run)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, help='Payment year (default: year of the previous month)')
+        parser.add_argument('--month', type=int, help='Month number 1-12 (default: previous month)')
+        parser.add_argument('--force', action='store_true', help='Close the current or a future month')
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        previous = today.replace(day=1) - timedelta(days=1)
+        year_number = options['year'] or previous.year
+        month = options['month'] or (previous.month if not options['year'] else None)
+        if month is None:
+            raise CommandError('--month is required when --year is given.')
+        if not 1 <= month <= 12:
+            raise CommandError('--month must be between 1 and 12.')
+        if (year_number, month) >= (today.year, today.month) and not options['force']:
+            raise CommandError(f'{month}/{year_number} is not over yet; use --force to close it anyway.')
+
+        try:
+            year = PaymentYear.objects.get(year=year_number)
+        except PaymentYear.DoesNotExist:
+            raise CommandError(f'Payment year {year_number} does not exist.')
+
+        summary = close_carwash_month(year, month)
+        if summary is None:
+            self.stdout.write(self.style.WARNING(f'No car wash compliance settings for {year_number}; nothing to close.'))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Closed {month}/{year_number}: {summary["members"]} members, '
+            f'{summary["non_compliant"]} non-compliant, {summary["penalties"]} new penalties.'
+        ))
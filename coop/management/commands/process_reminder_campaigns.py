@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+from coop.models import RenewalReminderCampaign
+from coop.reminders import CAMPAIGN_CHUNK_SIZE, run_campaign
+
+class Command(BaseCommand):
+    help = 'Send queued bulk renewal reminder campaigns in chunks (resumes interrupted runs)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=CAMPAIGN_CHUNK_SIZE,
+                            help=f'Recipients sent per chunk (default: {CAMPAIGN_CHUNK_SIZE})')
+        parser.add_argument('--campaign', type=int, help='Only process this campaign id')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep polling for new campaigns instead of exiting when the queue is empty')
+        parser.add_argument('--interval', type=int, default=10, help='Seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            # Oldest first; 'running' campaigns were interrupted and are resumed
+            campaigns = RenewalReminderCampaign.objects.filter(
+                status__in=['pending', 'running']
+            ).order_by('created_at')
+            if options['campaign']:
+                campaigns = campaigns.filter(pk=options['campaign'])
+
+            for campaign in campaigns:
+                campaign = run_campaign(campaign, options['chunk_size'])
+                self.stdout.write(self.style.SUCCESS(
+                    f'Campaign {campaign.pk}: {campaign.sent_count} sent, '
+                    f'{campaign.failed_count} failed of {campaign.total_count}'
+                ))
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from coop.payments import PLACEHOLDER_DELETE_BATCH, delete_placeholder_entries, placeholder_entries
+
+class Command(BaseCommand):
+    help = 'Delete zero-amount placeholder payment entries left by the dense ledger, in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=PLACEHOLDER_DELETE_BATCH,
+                            help=f'Entries deleted per transaction (default: {PLACEHOLDER_DELETE_BATCH})')
+        parser.add_argument('--dry-run', action='store_true', help='Only report how many entries would be deleted')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            self.stdout.write(f'{placeholder_entries().count()} placeholder payment entries would be deleted.')
+            return
+
+        count = delete_placeholder_entries(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{count} placeholder payment entries deleted.'))
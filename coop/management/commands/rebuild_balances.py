@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from coop.payments import rebuild_member_balances
+
+class Command(BaseCommand):
+    help = 'Rebuild the member balance table from payment entries'
+
+    def handle(self, *args, **options):
+        count = rebuild_member_balances()
+        self.stdout.write(self.style.SUCCESS(f'{count} member balances rebuilt.'))
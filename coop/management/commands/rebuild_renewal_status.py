@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from coop.renewals import rebuild_renewal_statuses
+
+class Command(BaseCommand):
+    help = 'Rebuild the vehicle renewal status table from approved document entries'
+
+    def handle(self, *args, **options):
+        count = rebuild_renewal_statuses()
+        self.stdout.write(self.style.SUCCESS(f'{count} vehicle renewal statuses rebuilt.'))
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.5 on 2026-10-17 17:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def backfill_renewal_status(apps, schema_editor):
+    # Rows start from the raw renewal date with no computed_on, so the first
+    # coop.renewals.sync_renewal_statuses() call rolls and buckets them.
+    Vehicle = apps.get_model('coop', 'Vehicle')
+    DocumentEntry = apps.get_model('coop', 'DocumentEntry')
+    VehicleRenewalStatus = apps.get_model('coop', 'VehicleRenewalStatus')
+
+    latest_by_vehicle = {}
+    entries = DocumentEntry.objects.filter(
+        document__vehicle__isnull=False
+    ).filter(
+        Q(status='approved') | Q(uploaded_by__isnull=True)
+    ).values_list('document__vehicle_id', 'id', 'renewal_date').order_by('document__vehicle_id', '-renewal_date')
+    for vehicle_id, entry_id, renewal_date in entries:
+        latest_by_vehicle.setdefault(vehicle_id, (entry_id, renewal_date))
+
+    rows = []
+    for vehicle_id in Vehicle.objects.values_list('id', flat=True):
+        entry_id, renewal_date = latest_by_vehicle.get(vehicle_id, (None, None))
+        rows.append(VehicleRenewalStatus(
+            vehicle_id=vehicle_id,
+            latest_entry_id=entry_id,
+            renewal_date=renewal_date,
+            next_expiry=renewal_date,
+            status='none',
+        ))
+    VehicleRenewalStatus.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coop', '0015_paymenttype_frequency_alter_paymenttype_amount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VehicleRenewalStatus',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('renewal_date', models.DateField(blank=True, help_text='Renewal date recorded on the latest entry', null=True)),
+                ('next_expiry', models.DateField(blank=True, db_index=True, help_text='Next expected expiry, rolled forward from the renewal date', null=True)),
+                ('status', models.CharField(choices=[('overdue', 'Overdue'), ('urgent', 'Urgent'), ('upcoming', 'Upcoming'), ('normal', 'Normal'), ('none', 'No Record')], default='none', help_text='Days-left bucket as of computed_on', max_length=10)),
+                ('computed_on', models.DateField(blank=True, help_text='Date the status bucket was last evaluated', null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('latest_entry', models.ForeignKey(blank=True, help_text='Latest approved (or manager-created) document entry', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='coop.documententry')),
+                ('vehicle', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='renewal_status', to='coop.vehicle')),
+            ],
+            options={
+                'verbose_name': 'Vehicle Renewal Status',
+                'verbose_name_plural': 'Vehicle Renewal Statuses',
+                'indexes': [models.Index(fields=['status', 'next_expiry'], name='coop_vehicl_status_afdd6e_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_renewal_status, migrations.RunPython.noop),
+    ]
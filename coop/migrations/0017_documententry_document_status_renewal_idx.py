@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-17 17:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coop', '0016_vehiclerenewalstatus'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='documententry',
+            index=models.Index(fields=['document', 'status', 'renewal_date'], name='coop_docume_documen_08e161_idx'),
+        ),
+    ]
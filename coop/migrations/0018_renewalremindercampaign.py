@@ -0,0 +1,58 @@
+# Generated by Django 5.2.5 on 2026-10-17 17:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coop', '0017_documententry_document_status_renewal_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RenewalReminderCampaign',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('filter_type', models.CharField(choices=[('this_week', 'This Week'), ('this_month', 'This Month'), ('next_60', 'Next 60 Days'), ('all', 'Next 365 Days')], default='all', max_length=20)),
+                ('window_start', models.DateField(help_text='First expiry date targeted')),
+                ('window_end', models.DateField(help_text='Last expiry date targeted')),
+                ('portal_url', models.URLField(blank=True, help_text='Member portal link included in each email', max_length=500)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed')], db_index=True, default='pending', max_length=10)),
+                ('total_count', models.PositiveIntegerField(default=0)),
+                ('sent_count', models.PositiveIntegerField(default=0)),
+                ('failed_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('batch', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reminder_campaigns', to='coop.batch')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reminder_campaigns', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Renewal Reminder Campaign',
+                'verbose_name_plural': 'Renewal Reminder Campaigns',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RenewalReminderRecipient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('error_message', models.TextField(blank=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('campaign', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recipients', to='coop.renewalremindercampaign')),
+                ('document_entry', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='coop.documententry')),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='coop.member')),
+                ('vehicle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='coop.vehicle')),
+            ],
+            options={
+                'verbose_name': 'Renewal Reminder Recipient',
+                'verbose_name_plural': 'Renewal Reminder Recipients',
+                'indexes': [models.Index(fields=['campaign', 'status'], name='coop_renewa_campaig_f085a4_idx')],
+                'unique_together': {('campaign', 'vehicle')},
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-17 17:49
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coop', '0018_renewalremindercampaign'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RenewalReminderLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sent_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('campaign', models.ForeignKey(blank=True, help_text='Bulk campaign that sent this reminder, if any', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reminder_logs', to='coop.renewalremindercampaign')),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='renewal_reminders', to='coop.member')),
+                ('sent_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('vehicle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='renewal_reminders', to='coop.vehicle')),
+            ],
+            options={
+                'verbose_name': 'Renewal Reminder Log',
+                'verbose_name_plural': 'Renewal Reminder Logs',
+                'ordering': ['-sent_at'],
+                'indexes': [models.Index(fields=['vehicle', 'sent_at'], name='coop_renewa_vehicle_1ba482_idx'), models.Index(fields=['-sent_at'], name='coop_renewa_sent_at_f879b2_idx')],
+            },
+        ),
+    ]
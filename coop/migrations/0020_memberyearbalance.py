@@ -0,0 +1,70 @@
+# Generated by Django 5.2.5 on 2026-10-17 18:02
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_member_balances(apps, schema_editor):
+    # Same figures as coop.payments.rebuild_member_balances()
+    PaymentType = apps.get_model('coop', 'PaymentType')
+    PaymentEntry = apps.get_model('coop', 'PaymentEntry')
+    MemberYearBalance = apps.get_model('coop', 'MemberYearBalance')
+
+    types = {
+        payment_type.pk: payment_type
+        for payment_type in PaymentType.objects.filter(payment_type='from_members', is_car_wash=False)
+    }
+    totals = PaymentEntry.objects.filter(
+        member__isnull=False, payment_type_id__in=list(types)
+    ).values('member_id', 'payment_type_id').annotate(total=Sum('amount_paid')).order_by()
+
+    rows = []
+    for row in totals:
+        payment_type = types[row['payment_type_id']]
+        total_paid = row['total'] or Decimal('0')
+        expected_total = payment_type.amount * 12 if payment_type.amount else Decimal('0')
+        balance = max(expected_total - total_paid, 0)
+        rows.append(MemberYearBalance(
+            member_id=row['member_id'],
+            payment_type_id=payment_type.pk,
+            year_id=payment_type.year_id,
+            total_paid=total_paid,
+            expected_total=expected_total,
+            balance=balance,
+            status='paid' if balance == 0 else ('partial' if total_paid > 0 else 'unpaid'),
+        ))
+    MemberYearBalance.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coop', '0019_renewalreminderlog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MemberYearBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_paid', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('expected_total', models.DecimalField(decimal_places=2, default=0, help_text='Monthly amount × 12', max_digits=12)),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('status', models.CharField(choices=[('paid', 'Fully Paid'), ('partial', 'Partially Paid'), ('unpaid', 'Not Paid')], default='unpaid', max_length=10)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='year_balances', to='coop.member')),
+                ('payment_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='member_balances', to='coop.paymenttype')),
+                ('year', models.ForeignKey(help_text="Payment type's year, copied for per-year lookups", on_delete=django.db.models.deletion.CASCADE, related_name='member_balances', to='coop.paymentyear')),
+            ],
+            options={
+                'verbose_name': 'Member Year Balance',
+                'verbose_name_plural': 'Member Year Balances',
+                'indexes': [models.Index(fields=['year', 'status'], name='coop_member_year_id_8d6d2f_idx')],
+                'unique_together': {('member', 'payment_type')},
+            },
+        ),
+        migrations.RunPython(backfill_member_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.5 on 2026-10-17 18:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coop', '0020_memberyearbalance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransactionSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefix', models.CharField(help_text='Transaction ID prefix (PMT, OTH, CW)', max_length=10)),
+                ('year', models.PositiveIntegerField()),
+                ('last_value', models.PositiveBigIntegerField(default=0, help_text='Highest number allocated so far')),
+            ],
+            options={
+                'verbose_name': 'Transaction Sequence',
+                'verbose_name_plural': 'Transaction Sequences',
+                'unique_together': {('prefix', 'year')},
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.5 on 2026-10-17 18:10
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coop', '0021_transactionsequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CarWashMonthlyCompliance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.PositiveSmallIntegerField(choices=[(1, 1), (2, 2), (3, 3), (4, 4), (5, 5), (6, 6), (7, 7), (8, 8), (9, 9), (10, 10), (11, 11), (12, 12)])),
+                ('wash_count', models.PositiveIntegerField(default=0)),
+                ('required_count', models.PositiveIntegerField(default=0, help_text='Monthly threshold in force when the month was closed')),
+                ('is_compliant', models.BooleanField(default=True)),
+                ('closed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('member', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='carwash_monthly_compliance', to='coop.member')),
+                ('penalty_entry', models.ForeignKey(blank=True, help_text='Penalty assessed for the shortfall, if any', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='coop.paymententry')),
+                ('year', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='carwash_monthly_compliance', to='coop.paymentyear')),
+            ],
+            options={
+                'verbose_name': 'Car Wash Monthly Compliance',
+                'verbose_name_plural': 'Car Wash Monthly Compliance',
+                'indexes': [models.Index(fields=['year', 'month', 'is_compliant'], name='coop_carwas_year_id_40417d_idx')],
+                'unique_together': {('year', 'month', 'member')},
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.5 on 2026-10-17 18:12
+
+from django.db import migrations, models
+
+
+def backfill_customer_keys(apps, schema_editor):
+    # Same normalization as CarWashLog.normalize_customer_name()
+    CarWashLog = apps.get_model('coop', 'CarWashLog')
+    logs = list(CarWashLog.objects.exclude(customer_name='').only('pk', 'customer_name'))
+    for log in logs:
+        log.customer_key = ' '.join(log.customer_name.split()).casefold()
+    CarWashLog.objects.bulk_update(logs, ['customer_key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coop', '0022_carwashmonthlycompliance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='carwashlog',
+            name='customer_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='Case- and whitespace-insensitive customer name, for counting unique customers', max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='carwashlog',
+            index=models.Index(fields=['carwash_year', 'customer_type', '-timestamp', '-id'], name='coop_carwas_carwash_36734a_idx'),
+        ),
+        migrations.RunPython(backfill_customer_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.5 on 2026-10-17 18:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coop', '0023_carwashlog_customer_key'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='carwashmonthlycompliance',
+            name='wash_count',
+            field=models.PositiveIntegerField(default=0, help_text="Washes of the member's least-washed vehicle (the threshold applies per vehicle)"),
+        ),
+        migrations.AddIndex(
+            model_name='paymententry',
+            index=models.Index(fields=['vehicle', 'payment_type', 'month'], name='coop_paymen_vehicle_a8104a_idx'),
+        ),
+    ]
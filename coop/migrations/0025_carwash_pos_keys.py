@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-17 18:18
+
+from django.db import migrations, models
+
+
+def backfill_plate_keys(apps, schema_editor):
+    # Same normalization as Vehicle.normalize_plate()
+    Vehicle = apps.get_model('coop', 'Vehicle')
+    vehicles = list(Vehicle.objects.only('pk', 'plate_number'))
+    for vehicle in vehicles:
+        vehicle.plate_key = ''.join(char for char in vehicle.plate_number.upper() if char.isalnum())
+    Vehicle.objects.bulk_update(vehicles, ['plate_key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coop', '0024_paymententry_vehicle_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='carwashlog',
+            name='idempotency_key',
+            field=models.CharField(blank=True, help_text='Client-supplied key so a retried submission is recorded only once', max_length=64, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='vehicle',
+            name='plate_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='Plate number without spaces or dashes, uppercased, for lookups', max_length=20),
+        ),
+        migrations.RunPython(backfill_plate_keys, migrations.RunPython.noop),
+    ]
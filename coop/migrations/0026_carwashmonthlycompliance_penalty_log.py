@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-17 18:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coop', '0025_carwash_pos_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='carwashmonthlycompliance',
+            name='penalty_log',
+            field=models.ForeignKey(blank=True, help_text='Penalty assessed for the shortfall, pending until paid', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='coop.paymentlog'),
+        ),
+        migrations.AlterField(
+            model_name='carwashmonthlycompliance',
+            name='penalty_entry',
+            field=models.ForeignKey(blank=True, help_text='Penalty payment, recorded when the penalty is settled', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='coop.paymententry'),
+        ),
+    ]
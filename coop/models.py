@@ -98,15 +98,44 @@ class Vehicle(models.Model):
     series = models.CharField(max_length=50, blank=True, null=True)
     color = models.CharField(max_length=30, blank=True, null=True)
     member = models.ForeignKey(Member, on_delete=models.SET_NULL, null=True, blank=True, related_name="vehicles")
+    plate_key = models.CharField(max_length=20, blank=True, db_index=True, editable=False, help_text="Plate number without spaces or dashes, uppercased, for lookups")
     def __str__(self):
         return self.plate_number
 
+    @staticmethod
+    def normalize_plate(plate):
+        """Plate lookup key: "abc-1234" and "ABC 1234" both give "ABC1234"."""
+        return ''.join(char for char in (plate or '').upper() if char.isalnum())
+
 class Document(models.Model):
     mv_file_no = models.CharField(max_length=70, unique=True, null=True, blank=True, help_text="MV File Number (alphanumeric, varies per vehicle)")
     vehicle = models.OneToOneField(Vehicle, on_delete=models.SET_NULL, null=True, blank=True, related_name="document")
     def __str__(self):
         return f"MV File #{self.mv_file_no}" if self.mv_file_no else f"Document #{self.pk}"
 
+class DocumentEntryQuerySet(models.QuerySet):
+    def approved(self):
+        """Entries that count toward a vehicle's renewal: approved or manager-created."""
+        return self.filter(models.Q(status="approved") | models.Q(uploaded_by__isnull=True))
+
+    def latest_approved(self, vehicles=None):
+        """
+        Latest approved entry per vehicle, resolved in a single query.
+        `vehicles` may be a list of vehicles/ids or a Vehicle queryset.
+        """
+        latest_pk = self.model.objects.approved().filter(
+            document=models.OuterRef('document')
+        ).order_by('-renewal_date', '-pk').values('pk')[:1]
+        qs = self.approved().filter(pk=models.Subquery(latest_pk))
+        if vehicles is not None:
+            qs = qs.filter(document__vehicle__in=vehicles)
+        return qs.annotate(vehicle_id=models.F('document__vehicle_id'))
+
+    def latest_approved_by_vehicle(self, vehicles=None):
+        """Map of vehicle id -> latest approved entry."""
+        return {entry.vehicle_id: entry for entry in self.latest_approved(vehicles)}
+
+
 class DocumentEntry(models.Model):
     document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name="entries")
     renewal_date = models.DateField()
@@ -126,6 +155,14 @@ class DocumentEntry(models.Model):
     )
     approved_at = models.DateTimeField(null=True, blank=True)
     manager_notes = models.TextField(null=True, blank=True)
+
+    objects = DocumentEntryQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['document', 'status', 'renewal_date']),
+        ]
+
     def __str__(self):
         return f"{self.document.mv_file_no} - {self.renewal_date}"
     
@@ -322,14 +359,14 @@ class PaymentType(models.Model):
     
     def member_balance(self, member):
         """Calculate remaining balance for a member"""
-        from django.db.models import Sum
         if self.payment_type != 'from_members' or not self.amount:
             return None
         
         yearly_total = self.yearly_total()
-        paid_amount = self.entries.filter(member=member).aggregate(
-            total=Sum('amount_paid')
-        )['total'] or 0
+        # Paid amount is kept in MemberYearBalance by coop.payments
+        paid_amount = self.member_balances.filter(member=member).values_list(
+            'total_paid', flat=True
+        ).first() or 0
         
         return max(yearly_total - paid_amount, 0)
 
@@ -362,6 +399,8 @@ class PaymentEntry(models.Model):
     class Meta:
         indexes = [
             models.Index(fields=['is_public_customer']),
+            # Per-vehicle monthly car wash counts (payment type fixes the year)
+            models.Index(fields=['vehicle', 'payment_type', 'month']),
         ]
 
     def __str__(self):
@@ -682,29 +721,15 @@ class PaymentLog(models.Model):
             return self.member.full_name
         return self.payee_name or "Unknown"
     
+    @classmethod
+    def transaction_prefix(cls, category):
+        return 'PMT' if category == 'from_members' else 'OTH'
+    
     @classmethod
     def generate_transaction_id(cls, category):
         """Generate unique transaction ID"""
-        from django.utils import timezone
-        year = timezone.now().year
-        prefix = 'PMT' if category == 'from_members' else 'OTH'
-        
-        # Get last transaction for this year and category
-        last_log = cls.objects.filter(
-            transaction_id__startswith=f"{prefix}-{year}-"
-        ).order_by('-transaction_id').first()
-        
-        if last_log:
-            # Extract number and increment
-            try:
-                last_num = int(last_log.transaction_id.split('-')[-1])
-                new_num = last_num + 1
-            except (ValueError, IndexError):
-                new_num = 1
-        else:
-            new_num = 1
-        
-        return f"{prefix}-{year}-{new_num:05d}"
+        from .sequences import next_transaction_id
+        return next_transaction_id(cls.transaction_prefix(category))
 
 
 class CarWashLog(models.Model):
@@ -774,6 +799,13 @@ class CarWashLog(models.Model):
         blank=True,
         help_text="Name of public customer (if not a member)"
     )
+    customer_key = models.CharField(
+        max_length=255,
+        blank=True,
+        db_index=True,
+        editable=False,
+        help_text="Case- and whitespace-insensitive customer name, for counting unique customers"
+    )
     vehicle_plate = models.CharField(
         max_length=20,
         blank=True,
@@ -832,6 +864,13 @@ class CarWashLog(models.Model):
         blank=True,
         help_text="Additional comments or remarks"
     )
+    idempotency_key = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True,
+        unique=True,
+        help_text="Client-supplied key so a retried submission is recorded only once"
+    )
     
     class Meta:
         ordering = ['-timestamp']
@@ -840,11 +879,18 @@ class CarWashLog(models.Model):
         indexes = [
             models.Index(fields=['-timestamp', 'customer_type']),
             models.Index(fields=['carwash_year', 'carwash_month']),
+            # Keyset pagination of a year's records by (timestamp, id)
+            models.Index(fields=['carwash_year', 'customer_type', '-timestamp', '-id']),
         ]
     
     def __str__(self):
         return f"{self.transaction_id} - {self.get_display_name()} - {self.service_type_name}"
     
+    @staticmethod
+    def normalize_customer_name(name):
+        """Customer key for a name: "  Juan  dela Cruz" and "juan dela cruz" match"""
+        return ' '.join((name or '').split()).casefold()
+    
     def get_display_name(self):
         """Return member name or customer name"""
         if self.member:
@@ -854,26 +900,8 @@ class CarWashLog(models.Model):
     @classmethod
     def generate_transaction_id(cls):
         """Generate unique transaction ID"""
-        from django.utils import timezone
-        year = timezone.now().year
-        prefix = 'CW'
-        
-        # Get last transaction for this year
-        last_log = cls.objects.filter(
-            transaction_id__startswith=f"{prefix}-{year}-"
-        ).order_by('-transaction_id').first()
-        
-        if last_log:
-            # Extract number and increment
-            try:
-                last_num = int(last_log.transaction_id.split('-')[-1])
-                new_num = last_num + 1
-            except (ValueError, IndexError):
-                new_num = 1
-        else:
-            new_num = 1
-        
-        return f"{prefix}-{year}-{new_num:05d}"
+        from .sequences import next_transaction_id
+        return next_transaction_id('CW')
 
 
 class LogEmailHistory(models.Model):
@@ -972,6 +1000,345 @@ class LogEmailHistory(models.Model):
         return f"{self.get_log_type_display()} sent to {member_name} on {self.sent_at.strftime('%Y-%m-%d %H:%M')}"
 
 
+class TransactionSequence(models.Model):
+    """
+    Last transaction number handed out per ID prefix and year.
+    Incremented atomically by coop.sequences so concurrent cashiers never
+    scan the log tables or receive the same transaction ID.
+    """
+    prefix = models.CharField(max_length=10, help_text="Transaction ID prefix (PMT, OTH, CW)")
+    year = models.PositiveIntegerField()
+    last_value = models.PositiveBigIntegerField(
+        default=0,
+        help_text="Highest number allocated so far"
+    )
+
+    class Meta:
+        unique_together = ['prefix', 'year']
+        verbose_name = "Transaction Sequence"
+        verbose_name_plural = "Transaction Sequences"
+
+    def __str__(self):
+        return f"{self.prefix}-{self.year}: {self.last_value}"
+
+
+# ============================================================================
+# RENEWAL TRACKING MODELS
+# ============================================================================
+
+class VehicleRenewalStatus(models.Model):
+    """
+    Denormalized renewal state for a vehicle.
+    One row per vehicle holding the latest approved document entry and the
+    next expected expiry, kept current by coop.renewals so renewal pages can
+    read expiries without resolving document entries per vehicle.
+    """
+    STATUS_CHOICES = [
+        ('overdue', 'Overdue'),
+        ('urgent', 'Urgent'),
+        ('upcoming', 'Upcoming'),
+        ('normal', 'Normal'),
+        ('none', 'No Record'),
+    ]
+
+    vehicle = models.OneToOneField(
+        Vehicle,
+        on_delete=models.CASCADE,
+        related_name='renewal_status'
+    )
+    latest_entry = models.ForeignKey(
+        DocumentEntry,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        help_text="Latest approved (or manager-created) document entry"
+    )
+    renewal_date = models.DateField(
+        null=True,
+        blank=True,
+        help_text="Renewal date recorded on the latest entry"
+    )
+    next_expiry = models.DateField(
+        null=True,
+        blank=True,
+        db_index=True,
+        help_text="Next expected expiry, rolled forward from the renewal date"
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default='none',
+        help_text="Days-left bucket as of computed_on"
+    )
+    computed_on = models.DateField(
+        null=True,
+        blank=True,
+        help_text="Date the status bucket was last evaluated"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Vehicle Renewal Status"
+        verbose_name_plural = "Vehicle Renewal Statuses"
+        indexes = [
+            models.Index(fields=['status', 'next_expiry']),
+        ]
+
+    def __str__(self):
+        return f"{self.vehicle.plate_number} - {self.next_expiry or 'no record'} ({self.status})"
+
+    @property
+    def days_left(self):
+        if not self.next_expiry:
+            return None
+        return (self.next_expiry - timezone.localtime(timezone.now()).date()).days
+
+
+class RenewalReminderCampaign(models.Model):
+    """
+    A bulk renewal reminder run started from the renewals hub.
+    Targets are snapshotted into RenewalReminderRecipient rows when the
+    campaign is created; the process_reminder_campaigns command sends them
+    in chunks and can resume an interrupted run.
+    """
+    FILTER_CHOICES = [
+        ('this_week', 'This Week'),
+        ('this_month', 'This Month'),
+        ('next_60', 'Next 60 Days'),
+        ('all', 'Next 365 Days'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+    ]
+
+    filter_type = models.CharField(max_length=20, choices=FILTER_CHOICES, default='all')
+    batch = models.ForeignKey(
+        Batch,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='reminder_campaigns'
+    )
+    window_start = models.DateField(help_text="First expiry date targeted")
+    window_end = models.DateField(help_text="Last expiry date targeted")
+    portal_url = models.URLField(
+        max_length=500,
+        blank=True,
+        help_text="Member portal link included in each email"
+    )
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', db_index=True)
+
+    total_count = models.PositiveIntegerField(default=0)
+    sent_count = models.PositiveIntegerField(default=0)
+    failed_count = models.PositiveIntegerField(default=0)
+
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='reminder_campaigns'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Renewal Reminder Campaign"
+        verbose_name_plural = "Renewal Reminder Campaigns"
+
+    def __str__(self):
+        return f"{self.get_filter_type_display()} reminders ({self.status}) - {self.created_at:%Y-%m-%d %H:%M}"
+
+    @property
+    def processed_count(self):
+        return self.sent_count + self.failed_count
+
+    @property
+    def percent_complete(self):
+        if not self.total_count:
+            return 100
+        return int(self.processed_count * 100 / self.total_count)
+
+
+class RenewalReminderRecipient(models.Model):
+    """One vehicle targeted by a reminder campaign and its delivery outcome."""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    campaign = models.ForeignKey(
+        RenewalReminderCampaign,
+        on_delete=models.CASCADE,
+        related_name='recipients'
+    )
+    member = models.ForeignKey(Member, on_delete=models.CASCADE, related_name='+')
+    vehicle = models.ForeignKey(Vehicle, on_delete=models.CASCADE, related_name='+')
+    document_entry = models.ForeignKey(
+        DocumentEntry,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    error_message = models.TextField(blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Renewal Reminder Recipient"
+        verbose_name_plural = "Renewal Reminder Recipients"
+        unique_together = ['campaign', 'vehicle']
+        indexes = [
+            models.Index(fields=['campaign', 'status']),
+        ]
+
+    def __str__(self):
+        return f"{self.vehicle.plate_number} ({self.status})"
+
+
+class RenewalReminderLog(models.Model):
+    """
+    Every renewal reminder email delivered to a member, whether sent
+    individually or by a bulk campaign. Shared by all staff so recently
+    reminded vehicles are visible and skipped by later bulk runs.
+    """
+    member = models.ForeignKey(Member, on_delete=models.CASCADE, related_name='renewal_reminders')
+    vehicle = models.ForeignKey(Vehicle, on_delete=models.CASCADE, related_name='renewal_reminders')
+    sent_at = models.DateTimeField(default=timezone.now)
+    sent_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    campaign = models.ForeignKey(
+        RenewalReminderCampaign,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='reminder_logs',
+        help_text="Bulk campaign that sent this reminder, if any"
+    )
+
+    class Meta:
+        ordering = ['-sent_at']
+        verbose_name = "Renewal Reminder Log"
+        verbose_name_plural = "Renewal Reminder Logs"
+        indexes = [
+            models.Index(fields=['vehicle', 'sent_at']),
+            models.Index(fields=['-sent_at']),
+        ]
+
+    def __str__(self):
+        return f"Reminder for {self.vehicle.plate_number} on {self.sent_at.strftime('%Y-%m-%d %H:%M')}"
+
+
+# ============================================================================
+# PAYMENT SUMMARY MODELS
+# ============================================================================
+
+class MemberYearBalance(models.Model):
+    """
+    Running balance for a member on a "From Members" payment type.
+    One row per (member, payment type) that has entries, kept current by
+    coop.payments on every PaymentEntry write so balance and arrears views
+    can read totals without aggregating entries. Members without a row have
+    paid nothing yet.
+    """
+    STATUS_CHOICES = [
+        ('paid', 'Fully Paid'),
+        ('partial', 'Partially Paid'),
+        ('unpaid', 'Not Paid'),
+    ]
+
+    member = models.ForeignKey(Member, on_delete=models.CASCADE, related_name='year_balances')
+    payment_type = models.ForeignKey(PaymentType, on_delete=models.CASCADE, related_name='member_balances')
+    year = models.ForeignKey(
+        PaymentYear,
+        on_delete=models.CASCADE,
+        related_name='member_balances',
+        help_text="Payment type's year, copied for per-year lookups"
+    )
+    total_paid = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    expected_total = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        help_text="Monthly amount × 12"
+    )
+    balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='unpaid')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['member', 'payment_type']
+        verbose_name = "Member Year Balance"
+        verbose_name_plural = "Member Year Balances"
+        indexes = [
+            models.Index(fields=['year', 'status']),
+        ]
+
+    def __str__(self):
+        return f"{self.member.full_name} - {self.payment_type.name}: {self.balance} ({self.status})"
+
+
+class CarWashMonthlyCompliance(models.Model):
+    """
+    A member's car wash count for a closed month against the year's
+    CarWashCompliance threshold. Written by the close_carwash_month command
+    together with the pending penalty log for a shortfall, so compliance is
+    recorded once instead of being recomputed on every page.
+    """
+    year = models.ForeignKey(PaymentYear, on_delete=models.CASCADE, related_name='carwash_monthly_compliance')
+    month = models.PositiveSmallIntegerField(choices=[(i, i) for i in range(1, 13)])
+    member = models.ForeignKey(Member, on_delete=models.CASCADE, related_name='carwash_monthly_compliance')
+    wash_count = models.PositiveIntegerField(
+        default=0,
+        help_text="Washes of the member's least-washed vehicle (the threshold applies per vehicle)"
+    )
+    required_count = models.PositiveIntegerField(
+        default=0,
+        help_text="Monthly threshold in force when the month was closed"
+    )
+    is_compliant = models.BooleanField(default=True)
+    penalty_log = models.ForeignKey(
+        PaymentLog,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        help_text="Penalty assessed for the shortfall, pending until paid"
+    )
+    penalty_entry = models.ForeignKey(
+        PaymentEntry,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        help_text="Penalty payment, recorded when the penalty is settled"
+    )
+    closed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = ['year', 'month', 'member']
+        verbose_name = "Car Wash Monthly Compliance"
+        verbose_name_plural = "Car Wash Monthly Compliance"
+        indexes = [
+            models.Index(fields=['year', 'month', 'is_compliant']),
+        ]
+
+    def __str__(self):
+        return f"{self.member.full_name} - {self.year.year}/{self.month:02d}: {self.wash_count}/{self.required_count}"
+
+
 # Signals or logic should be added in views/forms to:
 # - Sync Member info to User account
 # - Only show unassigned vehicles in member add/edit forms
@@ -0,0 +1,1164 @@
+# coop/payments.py
+"""
+Payment aggregation helpers.
+
+Builds member × payment type × month grids from a single grouped query over
+PaymentEntry so payment pages do not issue one aggregate per cell. Year-wide
+monthly totals and members' year summaries are cached and dropped on
+PaymentEntry, PaymentType and PaymentYear writes (see coop.signals).
+
+MemberYearBalance rows hold each member's running total and balance per
+"From Members" type; refresh_member_balance() is called for every entry
+write (signals, or explicitly after bulk_create) and rebuild_member_balances()
+repairs the whole table.
+
+With settings.PAYMENT_SPARSE_LEDGER only real payments are stored: months
+without entries read as unpaid instead of being seeded with zero-amount
+placeholder rows.
+"""
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import (
+    Case, Count, DecimalField, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Greatest
+
+
+MONTHS = range(1, 13)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+YEAR_TOTALS_KEY = 'payments:year_totals:{year_id}'
+
+# Entries invalidate the key on every write; the timeout only bounds staleness
+# from writes that bypass signals (queryset update/bulk_create)
+YEAR_TOTALS_TIMEOUT = 60 * 60
+
+# Member year cards are keyed by member and by a shared version that is
+# bumped whenever payment types or years change
+MEMBER_YEARS_KEY = 'payments:member_years:{member_id}:{version}'
+MEMBER_YEARS_VERSION_KEY = 'payments:member_years:version'
+MEMBER_YEARS_TIMEOUT = 60 * 60 * 24
+
+# Car wash service types per year, read by the point-of-sale endpoint on
+# every submission; dropped on PaymentType and PaymentYear writes
+CARWASH_TYPES_KEY = 'payments:carwash_types:{year_id}'
+CARWASH_TYPES_TIMEOUT = 60 * 60
+
+# "Other" payment type that car wash shortfall penalties are recorded under
+CARWASH_PENALTY_TYPE_NAME = 'Car Wash Penalty'
+
+# MemberYearBalance rows written per bulk_create by rebuild_member_balances()
+BALANCE_REBUILD_BATCH = 1000
+
+# Placeholder rows inserted per bulk_create by seed_placeholder_entries()
+PLACEHOLDER_SEED_BATCH = 1000
+
+# Placeholder rows removed per transaction by delete_placeholder_entries()
+PLACEHOLDER_DELETE_BATCH = 1000
+
+
+class PaymentPivot:
+    """
+    Dense member × payment type × month grid of paid amounts and car wash
+    counts. Cells without entries hold zero.
+    """
+
+    def __init__(self, member_ids, type_ids):
+        self.member_index = {member_id: i for i, member_id in enumerate(member_ids)}
+        self.type_index = {type_id: i for i, type_id in enumerate(type_ids)}
+        size = len(self.member_index) * len(self.type_index) * 12
+        self.amounts = [Decimal('0')] * size
+        self.counts = [0] * size
+
+    def _offset(self, member_id, type_id):
+        return (self.member_index[member_id] * len(self.type_index) + self.type_index[type_id]) * 12
+
+    def add(self, member_id, type_id, month, amount, count):
+        cell = self._offset(member_id, type_id) + month - 1
+        self.amounts[cell] += amount or 0
+        self.counts[cell] += count or 0
+
+    def monthly_amounts(self, member_id, type_id):
+        start = self._offset(member_id, type_id)
+        return self.amounts[start:start + 12]
+
+    def monthly_counts(self, member_id, type_id):
+        start = self._offset(member_id, type_id)
+        return self.counts[start:start + 12]
+
+
+def build_payment_pivot(member_ids, payment_types):
+    """
+    Load paid amounts and car wash counts for many members in one query.
+
+    Args:
+        member_ids: Member primary keys (grid rows, in order)
+        payment_types: PaymentType objects or ids (grid columns, in order)
+
+    Returns:
+        PaymentPivot object
+    """
+    from .models import PaymentEntry
+
+    member_ids = list(member_ids)
+    type_ids = [getattr(payment_type, 'pk', payment_type) for payment_type in payment_types]
+    pivot = PaymentPivot(member_ids, type_ids)
+    if not member_ids or not type_ids:
+        return pivot
+
+    rows = PaymentEntry.objects.filter(
+        member_id__in=member_ids,
+        payment_type_id__in=type_ids,
+    ).values('member_id', 'payment_type_id', 'month').annotate(
+        amount=Sum('amount_paid'),
+        washes=Count('id', filter=Q(is_car_wash_record=True)),
+    ).order_by()
+
+    for row in rows:
+        pivot.add(row['member_id'], row['payment_type_id'], row['month'], row['amount'], row['washes'])
+    return pivot
+
+
+class MemberLedger:
+    """
+    One member's payments for a PaymentYear.
+
+    Loads the year's payment types and all of the member's entries for the
+    year (two queries), then answers monthly totals, entry lists, balances
+    and car wash counts from memory so every single-member page and
+    statement reports the same figures.
+    """
+
+    def __init__(self, member, year):
+        from .models import PaymentEntry, PaymentType
+
+        self.member = member
+        self.year = year
+        self.payment_types = list(PaymentType.objects.filter(year=year).order_by('name'))
+        self._entries = {payment_type.pk: [[] for _ in MONTHS] for payment_type in self.payment_types}
+        entries = PaymentEntry.objects.filter(
+            member=member, payment_type__year=year
+        ).select_related('recorded_by').order_by('month', 'pk')
+        for entry in entries:
+            self._entries.setdefault(entry.payment_type_id, [[] for _ in MONTHS])[entry.month - 1].append(entry)
+
+    @property
+    def from_members_types(self):
+        return [payment_type for payment_type in self.payment_types if payment_type.payment_type == 'from_members']
+
+    @property
+    def other_types(self):
+        return [payment_type for payment_type in self.payment_types if payment_type.payment_type == 'other']
+
+    @property
+    def has_entries(self):
+        return any(month_entries for months in self._entries.values() for month_entries in months)
+
+    def entries(self, payment_type, month, car_wash_only=False):
+        """Entries for one type and month (1-12), oldest first."""
+        month_entries = self._entries.get(getattr(payment_type, 'pk', payment_type), [[]] * 12)[month - 1]
+        if car_wash_only:
+            return [entry for entry in month_entries if entry.is_car_wash_record]
+        return list(month_entries)
+
+    def monthly_totals(self, payment_type):
+        """12 amounts paid for a type, None for months without entries."""
+        totals = []
+        for month in MONTHS:
+            month_entries = self.entries(payment_type, month)
+            totals.append(sum(entry.amount_paid for entry in month_entries) if month_entries else None)
+        return totals
+
+    def monthly_counts(self, payment_type):
+        """12 car wash record counts for a type."""
+        return [len(self.entries(payment_type, month, car_wash_only=True)) for month in MONTHS]
+
+    def total_paid(self, payment_type=None, start_month=1, end_month=12):
+        """Amount paid for one type (or all types) over a month range."""
+        types = [payment_type] if payment_type is not None else self.payment_types
+        return sum(
+            (entry.amount_paid
+             for each_type in types
+             for month in range(start_month, end_month + 1)
+             for entry in self.entries(each_type, month)),
+            Decimal('0'),
+        )
+
+    def carwash_count(self, start_month=1, end_month=12):
+        """Car wash records on the year's car wash types over a month range."""
+        return sum(
+            len(self.entries(payment_type, month, car_wash_only=True))
+            for payment_type in self.payment_types if payment_type.is_car_wash
+            for month in range(start_month, end_month + 1)
+        )
+
+    def balance(self, payment_type, start_month=1, end_month=12):
+        """Amount still due for a from-members type over a month range."""
+        months_in_period = end_month - start_month + 1
+        expected_amount = (payment_type.amount * months_in_period) if payment_type.amount else 0
+        return max(expected_amount - self.total_paid(payment_type, start_month, end_month), 0)
+
+
+def _wash_records(carwash_types):
+    from .models import PaymentEntry
+
+    type_ids = [getattr(payment_type, 'pk', payment_type) for payment_type in carwash_types]
+    return PaymentEntry.objects.filter(
+        payment_type_id__in=type_ids,
+        is_car_wash_record=True,
+        is_penalty=False,
+    )
+
+
+def member_wash_counts(member_ids, carwash_types):
+    """
+    Members' car wash records per month in one grouped query (public
+    customers and penalties excluded).
+
+    Returns:
+        dict of member id -> 12 monthly counts, for every requested member
+    """
+    member_ids = list(member_ids)
+    counts = {member_id: [0] * 12 for member_id in member_ids}
+    if not member_ids:
+        return counts
+    rows = _wash_records(carwash_types).filter(
+        member_id__in=member_ids, is_public_customer=False
+    ).values('member_id', 'month').annotate(count=Count('id')).order_by()
+    for row in rows:
+        counts[row['member_id']][row['month'] - 1] = row['count']
+    return counts
+
+
+def vehicle_wash_counts(vehicle_ids, carwash_types, month=None):
+    """
+    Vehicles' car wash records per month in one grouped query. Compliance
+    is per vehicle, so records logged without a vehicle count towards none.
+
+    Args:
+        vehicle_ids: Vehicle primary keys
+        carwash_types: Car wash PaymentTypes (or ids) of the year
+        month: Only count this month (1-12)
+
+    Returns:
+        dict of vehicle id -> 12 monthly counts, for every requested vehicle
+    """
+    vehicle_ids = list(vehicle_ids)
+    counts = {vehicle_id: [0] * 12 for vehicle_id in vehicle_ids}
+    if not vehicle_ids:
+        return counts
+    rows = _wash_records(carwash_types).filter(vehicle_id__in=vehicle_ids, is_public_customer=False)
+    if month:
+        rows = rows.filter(month=month)
+    for row in rows.values('vehicle_id', 'month').annotate(count=Count('id')).order_by():
+        counts[row['vehicle_id']][row['month'] - 1] = row['count']
+    return counts
+
+
+def weakest_vehicle_counts(vehicle_ids, vehicle_counts):
+    """
+    Lowest vehicle count per month: a member is only compliant in a month
+    when every one of their vehicles meets the threshold.
+    """
+    vehicle_ids = list(vehicle_ids)
+    if not vehicle_ids:
+        return [0] * 12
+    return [min(vehicle_counts[vehicle_id][index] for vehicle_id in vehicle_ids) for index in range(12)]
+
+
+def vehicle_compliance_grid(vehicles, carwash_types, monthly_threshold):
+    """
+    Monthly car wash counts and compliance for a Vehicle queryset in one
+    query (twelve filtered counts over the vehicles' car wash entries).
+
+    Args:
+        vehicles: Vehicle queryset, already filtered
+        carwash_types: Car wash PaymentType queryset of the year
+        monthly_threshold: Washes required per vehicle per month
+
+    Returns:
+        list of dicts with vehicle_id, plate_number, member_id, member_name,
+        counts (12), compliant (12 booleans) and is_compliant
+    """
+    washes = Q(
+        carwash_entries__payment_type__in=carwash_types,
+        carwash_entries__is_car_wash_record=True,
+        carwash_entries__is_penalty=False,
+        carwash_entries__is_public_customer=False,
+    )
+    annotations = {
+        f'month_{month}': Count('carwash_entries', filter=washes & Q(carwash_entries__month=month))
+        for month in MONTHS
+    }
+    rows = vehicles.annotate(**annotations).values(
+        'pk', 'plate_number', 'member_id', 'member__full_name', *annotations
+    ).order_by('plate_number')
+
+    grid = []
+    for row in rows:
+        counts = [row[f'month_{month}'] for month in MONTHS]
+        compliant = [count >= monthly_threshold for count in counts]
+        grid.append({
+            'vehicle_id': row['pk'],
+            'plate_number': row['plate_number'],
+            'member_id': row['member_id'],
+            'member_name': row['member__full_name'],
+            'counts': counts,
+            'compliant': compliant,
+            'is_compliant': all(compliant),
+        })
+    return grid
+
+
+def public_wash_counts(carwash_types):
+    """12 monthly counts of public customer car wash records."""
+    counts = [0] * 12
+    rows = _wash_records(carwash_types).filter(
+        is_public_customer=True
+    ).values('month').annotate(count=Count('id')).order_by()
+    for row in rows:
+        counts[row['month'] - 1] = row['count']
+    return counts
+
+
+def service_type_counts(carwash_types):
+    """
+    Member and public car wash records per service type in one query.
+
+    Returns:
+        dict of payment type id -> {'member_count', 'public_count'}
+    """
+    rows = _wash_records(carwash_types).values('payment_type_id').annotate(
+        member_count=Count('id', filter=Q(is_public_customer=False)),
+        public_count=Count('id', filter=Q(is_public_customer=True)),
+    ).order_by()
+    return {
+        row['payment_type_id']: {'member_count': row['member_count'], 'public_count': row['public_count']}
+        for row in rows
+    }
+
+
+def wash_compliance(monthly_counts, monthly_threshold):
+    """Months below the threshold and whether the member is compliant."""
+    non_compliant_months = sum(1 for count in monthly_counts if count < monthly_threshold)
+    return non_compliant_months, non_compliant_months == 0
+
+
+def carwash_log_stats(records):
+    """
+    Headline figures for a filtered CarWashLog queryset in one
+    conditional-aggregation query.
+
+    Returns:
+        dict with total_records, unique_customers (distinct customer_key),
+        total_revenue, average_amount and monthly_breakdown (months with
+        records, each a dict of carwash_month, month, count and revenue)
+    """
+    aggregates = {
+        'total_records': Count('id'),
+        'unique_customers': Count('customer_key', distinct=True),
+        'total_revenue': Sum('service_amount'),
+    }
+    for month in MONTHS:
+        aggregates[f'count_{month}'] = Count('id', filter=Q(carwash_month=month))
+        aggregates[f'revenue_{month}'] = Sum('service_amount', filter=Q(carwash_month=month))
+    row = records.order_by().aggregate(**aggregates)
+
+    total_records = row['total_records']
+    total_revenue = row['total_revenue'] or 0
+    return {
+        'total_records': total_records,
+        'unique_customers': row['unique_customers'],
+        'total_revenue': total_revenue,
+        'average_amount': (total_revenue / total_records) if total_records > 0 else 0,
+        'monthly_breakdown': [
+            {
+                'carwash_month': month,
+                'month': month,
+                'count': row[f'count_{month}'],
+                'revenue': row[f'revenue_{month}'],
+            }
+            for month in MONTHS if row[f'count_{month}']
+        ],
+    }
+
+
+def log_cursor(log):
+    """Opaque keyset position of a log: microseconds since the epoch and id."""
+    micros = (log.timestamp - _EPOCH) // timedelta(microseconds=1)
+    return f'{micros}.{log.pk}'
+
+
+def _parse_log_cursor(cursor):
+    try:
+        micros, pk = cursor.split('.')
+        return _EPOCH + timedelta(microseconds=int(micros)), int(pk)
+    except (AttributeError, ValueError, OverflowError):
+        return None
+
+
+def keyset_page(records, cursor=None, before=False, per_page=50):
+    """
+    One page of logs, newest first, positioned by (timestamp, id) instead
+    of an OFFSET, so deep pages cost the same as the first and no COUNT is
+    needed.
+
+    Args:
+        records: Filtered log queryset (PaymentLog or CarWashLog)
+        cursor: log_cursor() of the page boundary, None for the newest page
+        before: Page of newer logs preceding the cursor instead of older
+            logs following it
+        per_page: Page size
+
+    Returns:
+        dict with object_list, has_next, has_previous, next_cursor and
+        previous_cursor
+    """
+    position = _parse_log_cursor(cursor) if cursor else None
+    if position is None:
+        before = False
+        page = records
+    else:
+        timestamp, pk = position
+        if before:
+            page = records.filter(Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, pk__gt=pk))
+        else:
+            page = records.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, pk__lt=pk))
+
+    ordering = ('timestamp', 'id') if before else ('-timestamp', '-id')
+    rows = list(page.order_by(*ordering)[:per_page + 1])
+    if before and not rows:
+        # Nothing newer than the cursor any more
+        return keyset_page(records, per_page=per_page)
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if before:
+        rows.reverse()
+        has_next, has_previous = True, has_more
+    else:
+        has_next, has_previous = has_more, position is not None
+
+    return {
+        'object_list': rows,
+        'has_next': has_next and bool(rows),
+        'has_previous': has_previous and bool(rows),
+        'next_cursor': log_cursor(rows[-1]) if rows else None,
+        'previous_cursor': log_cursor(rows[0]) if rows else None,
+    }
+
+
+def payment_status(payment_type, monthly_amounts):
+    """
+    Balance figures for one member and from-members payment type.
+
+    Args:
+        payment_type: PaymentType (monthly amount × 12 is the yearly total)
+        monthly_amounts: 12 paid amounts, January first
+
+    Returns:
+        dict with yearly_total, total_paid, balance, percentage_paid,
+        is_fully_paid and status ('paid', 'partial' or 'unpaid')
+    """
+    yearly_total = payment_type.amount * 12 if payment_type.amount else 0
+    total_paid = sum(monthly_amounts)
+    balance = max(yearly_total - total_paid, 0)
+    return {
+        'yearly_total': yearly_total,
+        'total_paid': total_paid,
+        'balance': balance,
+        'percentage_paid': (total_paid / yearly_total * 100) if yearly_total > 0 else 0,
+        'is_fully_paid': balance == 0,
+        'status': 'paid' if balance == 0 else ('partial' if total_paid > 0 else 'unpaid'),
+    }
+
+
+def balance_figures(payment_type, balance=None):
+    """
+    payment_status()-shaped figures read from a MemberYearBalance row.
+
+    Args:
+        payment_type: PaymentType the row belongs to
+        balance: MemberYearBalance object, or None when nothing is paid yet
+
+    Returns:
+        dict with the same keys as payment_status()
+    """
+    if balance is None:
+        return payment_status(payment_type, [])
+    return {
+        'yearly_total': balance.expected_total,
+        'total_paid': balance.total_paid,
+        'balance': balance.balance,
+        'percentage_paid': (balance.total_paid / balance.expected_total * 100) if balance.expected_total > 0 else 0,
+        'is_fully_paid': balance.status == 'paid',
+        'status': balance.status,
+    }
+
+
+def member_balances(member_ids, payment_types):
+    """
+    MemberYearBalance rows for many members in one query.
+
+    Returns:
+        dict of (member id, payment type id) -> MemberYearBalance
+    """
+    from .models import MemberYearBalance
+
+    type_ids = [getattr(payment_type, 'pk', payment_type) for payment_type in payment_types]
+    rows = MemberYearBalance.objects.filter(member_id__in=list(member_ids), payment_type_id__in=type_ids)
+    return {(row.member_id, row.payment_type_id): row for row in rows}
+
+
+def year_monthly_totals(year):
+    """
+    Amount paid per payment type and month for a whole PaymentYear.
+
+    One values('payment_type', 'month').annotate(Sum) query, pivoted in
+    memory and cached per year.
+
+    Args:
+        year: PaymentYear object or id
+
+    Returns:
+        dict of payment type id -> 12 monthly sums (None for months without
+        entries); types without entries are absent
+    """
+    from .models import PaymentEntry
+
+    year_id = getattr(year, 'pk', year)
+    key = YEAR_TOTALS_KEY.format(year_id=year_id)
+    totals = cache.get(key)
+    if totals is None:
+        totals = {}
+        rows = PaymentEntry.objects.filter(payment_type__year_id=year_id).values(
+            'payment_type', 'month'
+        ).annotate(total=Sum('amount_paid')).order_by()
+        for row in rows:
+            monthly = totals.setdefault(row['payment_type'], [None] * 12)
+            monthly[row['month'] - 1] = row['total']
+        cache.set(key, totals, YEAR_TOTALS_TIMEOUT)
+    return totals
+
+
+def invalidate_year_totals(year_id):
+    """Drop the cached monthly totals for a PaymentYear."""
+    cache.delete(YEAR_TOTALS_KEY.format(year_id=year_id))
+
+
+def _member_years_version():
+    version = cache.get(MEMBER_YEARS_VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(MEMBER_YEARS_VERSION_KEY, version, None):
+            version = cache.get(MEMBER_YEARS_VERSION_KEY, version)
+    return version
+
+
+def member_year_summaries(member):
+    """
+    Year cards for a member's payments page, newest year first.
+
+    Payment type counts and the member's paid totals for every year come
+    from one grouped query; the result is cached per member.
+
+    Args:
+        member: Member object or id
+
+    Returns:
+        list of dicts with year, from_members_count, other_count,
+        member_payments_count and total_paid
+    """
+    from .models import PaymentEntry, PaymentYear
+
+    member_id = getattr(member, 'pk', member)
+    key = MEMBER_YEARS_KEY.format(member_id=member_id, version=_member_years_version())
+    years_data = cache.get(key)
+    if years_data is None:
+        member_entries = PaymentEntry.objects.filter(
+            payment_type__year=OuterRef('pk'), member_id=member_id
+        ).order_by().values('payment_type__year')
+        years = PaymentYear.objects.order_by('-year').annotate(
+            from_members_count=Count('payment_types', filter=Q(payment_types__payment_type='from_members'), distinct=True),
+            other_count=Count('payment_types', filter=Q(payment_types__payment_type='other'), distinct=True),
+            member_payments_count=Subquery(
+                member_entries.exclude(amount_paid=0).annotate(count=Count('id')).values('count'),
+                output_field=IntegerField(),
+            ),
+            total_paid=Subquery(member_entries.annotate(total=Sum('amount_paid')).values('total')),
+        )
+        years_data = [
+            {
+                'year': year,
+                'from_members_count': year.from_members_count,
+                'other_count': year.other_count,
+                'member_payments_count': year.member_payments_count or 0,
+                'total_paid': year.total_paid or 0,
+            }
+            for year in years
+        ]
+        cache.set(key, years_data, MEMBER_YEARS_TIMEOUT)
+    return years_data
+
+
+def invalidate_member_years(member_id):
+    """Drop a member's cached year cards."""
+    cache.delete(MEMBER_YEARS_KEY.format(member_id=member_id, version=_member_years_version()))
+
+
+def invalidate_all_member_years():
+    """Retire every member's cached year cards by moving to a new version."""
+    cache.set(MEMBER_YEARS_VERSION_KEY, time.time_ns(), None)
+
+
+def carwash_service_types(year_id):
+    """
+    A year's car wash service types, cached.
+
+    Returns:
+        dict with the calendar year and services (payment type id ->
+        {'name', 'amount'}), or None when the PaymentYear does not exist
+    """
+    from .models import PaymentType, PaymentYear
+
+    key = CARWASH_TYPES_KEY.format(year_id=year_id)
+    cached = cache.get(key)
+    if cached is None:
+        year = PaymentYear.objects.filter(pk=year_id).values_list('year', flat=True).first()
+        if year is None:
+            return None
+        cached = {
+            'year': year,
+            'services': {
+                pk: {'name': name, 'amount': amount or Decimal('0')}
+                for pk, name, amount in PaymentType.objects.filter(
+                    year_id=year_id, is_car_wash=True
+                ).values_list('pk', 'name', 'car_wash_amount')
+            },
+        }
+        cache.set(key, cached, CARWASH_TYPES_TIMEOUT)
+    return cached
+
+
+def invalidate_carwash_types(year_id):
+    """Drop the cached car wash service types of a PaymentYear."""
+    cache.delete(CARWASH_TYPES_KEY.format(year_id=year_id))
+
+
+def sparse_ledger_enabled():
+    """True when months without payments are not seeded with placeholder rows."""
+    return getattr(settings, 'PAYMENT_SPARSE_LEDGER', True)
+
+
+def placeholder_entries():
+    """
+    Zero-amount from-members entries seeded by the dense ledger.
+
+    Anything recorded by a user, car wash records, penalties and public
+    customer entries are never placeholders, even at zero.
+    """
+    from .models import PaymentEntry
+
+    return PaymentEntry.objects.filter(
+        payment_type__payment_type='from_members',
+        member__isnull=False,
+        amount_paid=0,
+        recorded_by__isnull=True,
+        is_car_wash_record=False,
+        is_penalty=False,
+        is_public_customer=False,
+    )
+
+
+def seed_placeholder_entries(payment_types, members, months=None, batch_size=PLACEHOLDER_SEED_BATCH):
+    """
+    Create zero-amount month entries for members on from-members types.
+
+    Rows are inserted with chunked bulk_create inside one transaction. That
+    skips the PaymentEntry signals, so the payment caches are invalidated
+    here on commit; zero amounts leave MemberYearBalance rows unchanged.
+    Does nothing when the sparse ledger is enabled.
+
+    Args:
+        payment_types: PaymentType objects to seed
+        members: Member objects or ids to seed
+        months: Months per type (defaults to each type's frequency)
+        batch_size: Entries per INSERT
+
+    Returns:
+        Number of entries created
+    """
+    from .models import PaymentEntry
+
+    if sparse_ledger_enabled():
+        return 0
+
+    payment_types = [payment_type for payment_type in payment_types if payment_type.payment_type == 'from_members']
+    member_ids = [getattr(member, 'pk', member) for member in members]
+    if not payment_types or not member_ids:
+        return 0
+
+    entries = (
+        PaymentEntry(payment_type=payment_type, member_id=member_id, month=month, amount_paid=Decimal('0.00'))
+        for payment_type in payment_types
+        for member_id in member_ids
+        for month in range(1, (months or payment_type.frequency) + 1)
+    )
+
+    def invalidate():
+        for year_id in {payment_type.year_id for payment_type in payment_types}:
+            invalidate_year_totals(year_id)
+        if len(member_ids) == 1:
+            invalidate_member_years(member_ids[0])
+        else:
+            invalidate_all_member_years()
+
+    created = 0
+    with transaction.atomic():
+        while True:
+            chunk = list(islice(entries, batch_size))
+            if not chunk:
+                break
+            PaymentEntry.objects.bulk_create(chunk)
+            created += len(chunk)
+        transaction.on_commit(invalidate)
+    return created
+
+
+def delete_placeholder_entries(batch_size=PLACEHOLDER_DELETE_BATCH):
+    """
+    Delete placeholder entries in batches, one transaction per batch.
+
+    Each batch is deleted with _raw_delete() so per-row signals are
+    skipped; like the other bulk paths, the batch then refreshes the
+    affected members' balances and drops the payment caches on commit.
+
+    Returns:
+        Number of entries deleted
+    """
+    from .models import PaymentEntry, PaymentType
+
+    deleted = 0
+    while True:
+        rows = list(placeholder_entries().order_by('pk').values_list(
+            'pk', 'member_id', 'payment_type_id', 'payment_type__year_id'
+        )[:batch_size])
+        if not rows:
+            break
+        with transaction.atomic():
+            # Re-applies the placeholder filter, in case an entry was paid since the select
+            deleted += placeholder_entries().filter(pk__in=[row[0] for row in rows])._raw_delete(
+                PaymentEntry.objects.db
+            )
+            payment_types = PaymentType.objects.in_bulk({row[2] for row in rows})
+            for member_id, payment_type_id in {(row[1], row[2]) for row in rows}:
+                refresh_member_balance(member_id, payment_types[payment_type_id])
+            for year_id in {row[3] for row in rows}:
+                transaction.on_commit(lambda year_id=year_id: invalidate_year_totals(year_id))
+            transaction.on_commit(invalidate_all_member_years)
+        if len(rows) < batch_size:
+            break
+    return deleted
+
+
+def tracks_balance(payment_type):
+    """True for payment types that get MemberYearBalance rows."""
+    return payment_type.payment_type == 'from_members' and not payment_type.is_car_wash
+
+
+def _balance_fields(payment_type, total_paid):
+    expected_total = payment_type.amount * 12 if payment_type.amount else Decimal('0')
+    balance = max(expected_total - total_paid, 0)
+    return {
+        'year_id': payment_type.year_id,
+        'total_paid': total_paid,
+        'expected_total': expected_total,
+        'balance': balance,
+        'status': 'paid' if balance == 0 else ('partial' if total_paid > 0 else 'unpaid'),
+    }
+
+
+def refresh_member_balance(member_id, payment_type):
+    """
+    Recompute one member's MemberYearBalance row for a payment type.
+
+    The existing row is locked before the entries are summed, so a second
+    writer for the same member and type waits and then sums a total that
+    includes the first writer's entry. Callers that write an entry should
+    run it and this refresh inside one transaction.atomic() block so the
+    entry, its log and the row commit or roll back together.
+
+    Args:
+        member_id: Member primary key
+        payment_type: PaymentType object or id
+    """
+    from .models import MemberYearBalance, PaymentEntry, PaymentType
+
+    if not member_id:
+        return
+    if not isinstance(payment_type, PaymentType):
+        payment_type = PaymentType.objects.filter(pk=payment_type).first()
+    if payment_type is None or not tracks_balance(payment_type):
+        return
+
+    with transaction.atomic():
+        MemberYearBalance.objects.select_for_update().filter(
+            member_id=member_id, payment_type=payment_type
+        ).first()
+        total_paid = PaymentEntry.objects.filter(
+            member_id=member_id, payment_type=payment_type
+        ).aggregate(total=Sum('amount_paid'))['total'] or Decimal('0')
+        MemberYearBalance.objects.update_or_create(
+            member_id=member_id,
+            payment_type=payment_type,
+            defaults=_balance_fields(payment_type, total_paid),
+        )
+
+
+def refresh_type_balances(payment_type):
+    """
+    Re-derive expected totals, balances and statuses after a payment type
+    changes, with a single UPDATE over its rows. When the type has just
+    started tracking balances, rows are created for members who already
+    have entries under it.
+    """
+    from .models import MemberYearBalance, PaymentEntry
+
+    rows = MemberYearBalance.objects.filter(payment_type=payment_type)
+    if not tracks_balance(payment_type):
+        rows.delete()
+        return
+
+    expected_total = Value(
+        payment_type.amount * 12 if payment_type.amount else Decimal('0'),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    )
+    rows.update(
+        year_id=payment_type.year_id,
+        expected_total=expected_total,
+        balance=Greatest(expected_total - F('total_paid'), Value(Decimal('0'))),
+        status=Case(
+            When(total_paid__gte=expected_total, then=Value('paid')),
+            When(total_paid__gt=0, then=Value('partial')),
+            default=Value('unpaid'),
+        ),
+    )
+
+    untracked_members = PaymentEntry.objects.filter(
+        payment_type=payment_type, member__isnull=False
+    ).exclude(member_id__in=rows.values('member_id')).order_by().values_list('member_id', flat=True).distinct()
+    for member_id in untracked_members:
+        refresh_member_balance(member_id, payment_type)
+
+
+def rebuild_member_balances(batch_size=BALANCE_REBUILD_BATCH):
+    """
+    Rebuild the MemberYearBalance table from payment entries.
+
+    Returns:
+        Number of balance rows written
+    """
+    from .models import MemberYearBalance, PaymentEntry, PaymentType
+
+    types = {
+        payment_type.pk: payment_type
+        for payment_type in PaymentType.objects.filter(payment_type='from_members', is_car_wash=False)
+    }
+    totals = PaymentEntry.objects.filter(
+        member__isnull=False, payment_type_id__in=list(types)
+    ).values('member_id', 'payment_type_id').annotate(total=Sum('amount_paid')).order_by()
+
+    rows = [
+        MemberYearBalance(
+            member_id=row['member_id'],
+            payment_type_id=row['payment_type_id'],
+            **_balance_fields(types[row['payment_type_id']], row['total'] or Decimal('0')),
+        )
+        for row in totals
+    ]
+    with transaction.atomic():
+        MemberYearBalance.objects.all().delete()
+        MemberYearBalance.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def post_payment_batch(member, year, lines, recorded_by=None, payment_method='cash'):
+    """
+    Record several payments for one member in a single transaction.
+
+    Entries and logs are written with bulk_create and take a contiguous
+    block of transaction IDs. bulk_create skips the PaymentEntry signals,
+    so balances are refreshed and caches invalidated here.
+
+    Args:
+        member: Member paying
+        year: PaymentYear the payment types belong to
+        lines: Validated (payment_type, month, amount) tuples
+        recorded_by: User posting the payments
+        payment_method: PaymentLog payment method
+
+    Returns:
+        List of the created PaymentLog objects
+    """
+    from .models import PaymentEntry, PaymentLog
+    from .sequences import allocate_transaction_ids
+
+    with transaction.atomic():
+        PaymentEntry.objects.bulk_create([
+            PaymentEntry(
+                payment_type=payment_type,
+                member=member,
+                month=month,
+                amount_paid=amount,
+                recorded_by=recorded_by,
+            )
+            for payment_type, month, amount in lines
+        ])
+
+        transaction_ids = allocate_transaction_ids(PaymentLog.transaction_prefix('from_members'), len(lines))
+        logs = PaymentLog.objects.bulk_create([
+            PaymentLog(
+                transaction_id=transaction_id,
+                category='from_members',
+                logged_by=recorded_by,
+                member=member,
+                payment_type=payment_type,
+                payment_type_name=payment_type.name,
+                amount=amount,
+                payment_year=year.year,
+                payment_month=month,
+                payment_method=payment_method,
+                status='confirmed',
+                notes=f'Payment recorded via batch posting for {member.full_name}'
+            )
+            for transaction_id, (payment_type, month, amount) in zip(transaction_ids, lines)
+        ])
+
+        for payment_type in {payment_type.pk: payment_type for payment_type, _, _ in lines}.values():
+            refresh_member_balance(member.pk, payment_type)
+        transaction.on_commit(lambda: invalidate_year_totals(year.pk))
+        transaction.on_commit(lambda: invalidate_member_years(member.pk))
+    return logs
+
+
+def close_carwash_month(year, month, closed_by=None):
+    """
+    Record every member's car wash compliance for a month and assess
+    penalties for shortfalls.
+
+    Wash counts for all members with vehicles come from one grouped query.
+    The threshold applies to each vehicle, so a member is compliant only
+    when every one of their vehicles meets it; the least-washed vehicle's
+    count is upserted as the CarWashMonthlyCompliance row. Non-compliant rows
+    without a penalty get a pending PaymentLog, bulk-created under the
+    year's "Car Wash Penalty" type when the compliance settings carry a
+    penalty amount; the penalty PaymentEntry is only written when it is paid
+    (settle_carwash_penalty). Re-running recounts the month but never
+    assesses a member twice.
+
+    Args:
+        year: PaymentYear being closed
+        month: Month number (1-12)
+        closed_by: User closing the month
+
+    Returns:
+        dict with members, non_compliant and penalties counts, or None when
+        the year has no compliance settings
+    """
+    from .models import (
+        CarWashCompliance, CarWashMonthlyCompliance, PaymentLog, PaymentType, Vehicle,
+    )
+    from .sequences import allocate_transaction_ids
+
+    compliance = CarWashCompliance.objects.filter(year=year).first()
+    if compliance is None:
+        return None
+
+    carwash_types = PaymentType.objects.filter(year=year, is_car_wash=True)
+    vehicles_by_member = {}
+    for vehicle_id, member_id in Vehicle.objects.filter(member__isnull=False).values_list('pk', 'member_id'):
+        vehicles_by_member.setdefault(member_id, []).append(vehicle_id)
+    all_vehicle_ids = [vehicle_id for vehicle_ids in vehicles_by_member.values() for vehicle_id in vehicle_ids]
+    vehicle_counts = vehicle_wash_counts(all_vehicle_ids, carwash_types, month=month)
+    wash_counts = {
+        member_id: weakest_vehicle_counts(vehicle_ids, vehicle_counts)[month - 1]
+        for member_id, vehicle_ids in vehicles_by_member.items()
+    }
+
+    with transaction.atomic():
+        CarWashMonthlyCompliance.objects.bulk_create(
+            [
+                CarWashMonthlyCompliance(
+                    year=year,
+                    month=month,
+                    member_id=member_id,
+                    wash_count=wash_count,
+                    required_count=compliance.monthly_threshold,
+                    is_compliant=wash_count >= compliance.monthly_threshold,
+                )
+                for member_id, wash_count in wash_counts.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['year', 'month', 'member'],
+            update_fields=['wash_count', 'required_count', 'is_compliant', 'closed_at'],
+            batch_size=500,
+        )
+
+        unassessed = list(
+            CarWashMonthlyCompliance.objects.filter(
+                year=year, month=month, is_compliant=False, penalty_log__isnull=True, penalty_entry__isnull=True
+            ).select_related('member').select_for_update().order_by('member_id')
+        )
+        non_compliant = CarWashMonthlyCompliance.objects.filter(year=year, month=month, is_compliant=False).count()
+        if not unassessed or not compliance.penalty_amount:
+            return {'members': len(wash_counts), 'non_compliant': non_compliant, 'penalties': 0}
+
+        penalty_type, _ = PaymentType.objects.get_or_create(
+            year=year, name=CARWASH_PENALTY_TYPE_NAME, defaults={'payment_type': 'other'}
+        )
+        transaction_ids = allocate_transaction_ids(PaymentLog.transaction_prefix('other'), len(unassessed), year=year.year)
+        logs = PaymentLog.objects.bulk_create([
+            PaymentLog(
+                transaction_id=transaction_id,
+                category='other',
+                logged_by=closed_by,
+                member=row.member,
+                payee_name=row.member.full_name,
+                payment_type=penalty_type,
+                payment_type_name=penalty_type.name,
+                amount=compliance.penalty_amount,
+                payment_year=year.year,
+                payment_month=month,
+                status='pending',
+                notes=f'Car wash penalty: {row.wash_count} of {row.required_count} washes per vehicle in month {month}'
+            )
+            for transaction_id, row in zip(transaction_ids, unassessed)
+        ])
+
+        for row, log in zip(unassessed, logs):
+            row.penalty_log = log
+        CarWashMonthlyCompliance.objects.bulk_update(unassessed, ['penalty_log'], batch_size=500)
+
+    return {'members': len(wash_counts), 'non_compliant': non_compliant, 'penalties': len(logs)}
+
+
+def settle_carwash_penalty(penalty_log, recorded_by=None, payment_method='cash'):
+    """
+    Record payment of a penalty assessed by close_carwash_month().
+
+    The penalty PaymentEntry is written only now, so unpaid penalties never
+    appear in the collected totals. Settling twice returns the first entry.
+
+    Args:
+        penalty_log: Pending PaymentLog created when the month was closed
+        recorded_by: User receiving the payment
+        payment_method: One of PaymentLog.PAYMENT_METHOD_CHOICES
+
+    Returns:
+        The penalty PaymentEntry, or None when the log is not a car wash
+        penalty
+    """
+    from .models import CarWashMonthlyCompliance, PaymentEntry
+
+    with transaction.atomic():
+        row = CarWashMonthlyCompliance.objects.select_for_update().filter(penalty_log=penalty_log).first()
+        if row is None:
+            return None
+        if row.penalty_entry_id:
+            return row.penalty_entry
+
+        # A plain create so the entry signals drop the payment caches
+        entry = PaymentEntry.objects.create(
+            payment_type_id=penalty_log.payment_type_id,
+            member_id=row.member_id,
+            month=row.month,
+            amount_paid=penalty_log.amount,
+            recorded_by=recorded_by,
+            is_penalty=True,
+        )
+        penalty_log.status = 'confirmed'
+        penalty_log.payment_method = payment_method
+        penalty_log.save(update_fields=['status', 'payment_method'])
+        row.penalty_entry = entry
+        row.save(update_fields=['penalty_entry'])
+    return entry
+
+
+def record_carwash(year_id, year, service_type_id, service, month, member_id=None, vehicle_id=None,
+                   customer_name='', vehicle_plate='', recorded_by=None, idempotency_key=None):
+    """
+    Write a car wash PaymentEntry and its CarWashLog in one transaction.
+
+    A submission whose idempotency key was already recorded writes nothing
+    and returns the original log, so retries from a flaky connection are
+    counted once.
+
+    Args:
+        year_id: PaymentYear id
+        year: Calendar year of the PaymentYear
+        service_type_id: Car wash PaymentType id
+        service: That type's carwash_service_types() entry
+        month: Month number (1-12)
+        member_id: Member id (member service), or None for a public customer
+        vehicle_id: Vehicle id for a member service
+        customer_name: Public customer name
+        vehicle_plate: Plate as entered, kept on public customer logs
+        recorded_by: User recording the service
+        idempotency_key: Client-supplied key, optional
+
+    Returns:
+        (CarWashLog, created)
+    """
+    from .models import CarWashLog, PaymentEntry
+
+    is_public = member_id is None
+    try:
+        with transaction.atomic():
+            # bulk_create skips the PaymentEntry signals: car wash types carry
+            # no balances, and the caches are dropped below
+            PaymentEntry.objects.bulk_create([PaymentEntry(
+                payment_type_id=service_type_id,
+                member_id=member_id,
+                vehicle_id=vehicle_id,
+                month=month,
+                amount_paid=service['amount'],
+                recorded_by=recorded_by,
+                is_car_wash_record=True,
+                is_public_customer=is_public,
+                customer_name=customer_name if is_public else None,
+            )])
+            log = CarWashLog.objects.create(
+                transaction_id=CarWashLog.generate_transaction_id(),
+                logged_by=recorded_by,
+                customer_type='public' if is_public else 'member',
+                member_id=member_id,
+                vehicle_id=vehicle_id,
+                customer_name=customer_name if is_public else '',
+                vehicle_plate=vehicle_plate if is_public else '',
+                service_type_id=service_type_id,
+                service_type_name=service['name'],
+                service_amount=service['amount'],
+                carwash_year=year,
+                carwash_month=month,
+                is_compliance=not is_public,
+                compliance_status='' if is_public else 'Service Recorded',
+                status='completed',
+                notes='Car wash service recorded at the wash bay',
+                idempotency_key=idempotency_key or None,
+            )
+            transaction.on_commit(lambda: invalidate_year_totals(year_id))
+            if member_id:
+                transaction.on_commit(lambda: invalidate_member_years(member_id))
+    except IntegrityError:
+        # A concurrent retry with the same key committed first
+        existing = CarWashLog.objects.filter(idempotency_key=idempotency_key).first() if idempotency_key else None
+        if existing is None:
+            raise
+        return existing, False
+    return log, True
@@ -0,0 +1,281 @@
+# coop/reminders.py
+"""
+Renewal reminder emails and bulk reminder campaigns.
+
+Bulk sends are recorded as a RenewalReminderCampaign with one
+RenewalReminderRecipient per targeted vehicle. The staff request only
+creates the campaign; the process_reminder_campaigns command sends it in
+chunks, so a long run never blocks a web worker and a crashed run picks up
+where it stopped.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+
+# Recipients sent per chunk by the worker
+CAMPAIGN_CHUNK_SIZE = 50
+
+# Vehicles reminded within this window are skipped by bulk campaigns and
+# flagged on the renewals hub
+REMINDER_DEDUP_WINDOW = timedelta(hours=24)
+
+# Days ahead targeted by each bulk filter
+CAMPAIGN_WINDOWS = {
+    'this_week': 7,
+    'this_month': 30,
+    'next_60': 60,
+    'all': 365,
+}
+
+
+def send_renewal_reminder_email(member, vehicle, document_entry, portal_url):
+    """
+    Send renewal reminder email to member with vehicle details.
+
+    Args:
+        member: Member receiving the reminder
+        vehicle: Vehicle due for renewal
+        document_entry: Latest approved DocumentEntry for the vehicle
+        portal_url: Absolute link to the member documents portal
+
+    Returns:
+        (success: bool, message: str) tuple
+    """
+    # Check if member has email
+    if not member.user_account or not member.user_account.email:
+        return False, "No email address found for member"
+
+    email = member.user_account.email
+
+    # Calculate days left
+    today = timezone.localtime(timezone.now()).date()
+    expiry_date = document_entry.renewal_date
+    days_left = (expiry_date - today).days
+
+    # Determine urgency
+    is_urgent = days_left <= 29
+
+    # Email context
+    context = {
+        'member_name': member.full_name,
+        'plate_number': vehicle.plate_number,
+        'document_type': 'Vehicle Registration',  # Default document type
+        'expiry_date': expiry_date.strftime('%B %d, %Y'),
+        'days_left': days_left,
+        'is_urgent': is_urgent,
+        'batch_number': member.batch.number if member.batch else 'N/A',
+        'portal_url': portal_url,
+    }
+
+    # Render email templates
+    try:
+        html_content = render_to_string('emails/renewal_reminder.html', context)
+        text_content = render_to_string('emails/renewal_reminder.txt', context)
+    except Exception as e:
+        return False, f"Failed to render email template: {str(e)}"
+
+    # Email subject
+    if days_left <= 0:
+        subject = f'⚠️ URGENT: Vehicle {vehicle.plate_number} Registration EXPIRED'
+    elif days_left <= 7:
+        subject = f'⚠️ URGENT: Vehicle {vehicle.plate_number} Expires in {days_left} Days'
+    elif days_left <= 29:
+        subject = f'⚠️ Reminder: Vehicle {vehicle.plate_number} Registration Expires Soon'
+    else:
+        subject = f'Reminder: Vehicle {vehicle.plate_number} Registration Due for Renewal'
+
+    try:
+        # Create email with both HTML and plain text
+        email_message = EmailMultiAlternatives(
+            subject=subject,
+            body=text_content,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[email],
+        )
+        email_message.attach_alternative(html_content, "text/html")
+        email_message.send(fail_silently=False)
+
+        return True, f"Email sent successfully to {email}"
+    except Exception as e:
+        return False, f"Failed to send email: {str(e)}"
+
+
+def record_reminder(member, vehicle, sent_by=None, campaign=None):
+    """Log a delivered renewal reminder in the shared RenewalReminderLog."""
+    from .models import RenewalReminderLog
+
+    return RenewalReminderLog.objects.create(
+        member=member,
+        vehicle=vehicle,
+        sent_by=sent_by,
+        campaign=campaign,
+    )
+
+
+def reminded_since(cutoff):
+    """RenewalReminderLog rows sent after cutoff, for OuterRef('vehicle') lookups."""
+    from .models import RenewalReminderLog
+
+    return RenewalReminderLog.objects.filter(vehicle=OuterRef('vehicle'), sent_at__gte=cutoff)
+
+
+def create_campaign(filter_type, batch_id=None, portal_url='', created_by=None, today=None):
+    """
+    Create a reminder campaign and snapshot its recipients.
+
+    Targets are member vehicles with an approved entry whose next expiry
+    falls inside the filter's window and that were not reminded within
+    REMINDER_DEDUP_WINDOW, selected with one query.
+
+    Args:
+        filter_type: Key of CAMPAIGN_WINDOWS
+        batch_id: Optional batch to restrict the campaign to
+        portal_url: Absolute portal link for the emails
+        created_by: User starting the campaign
+        today: Reference date (defaults to local today)
+
+    Returns:
+        RenewalReminderCampaign object, or None for an unknown filter
+    """
+    from .models import RenewalReminderCampaign, RenewalReminderRecipient, VehicleRenewalStatus
+    from .renewals import local_today, sync_renewal_statuses
+
+    if filter_type not in CAMPAIGN_WINDOWS:
+        return None
+
+    today = today or local_today()
+    window_start = today
+    window_end = today + timedelta(days=CAMPAIGN_WINDOWS[filter_type])
+
+    sync_renewal_statuses(today)
+    targets = VehicleRenewalStatus.objects.filter(
+        vehicle__member__isnull=False,
+        latest_entry__isnull=False,
+        next_expiry__range=(window_start, window_end),
+    ).exclude(
+        Exists(reminded_since(timezone.now() - REMINDER_DEDUP_WINDOW))
+    )
+    if batch_id:
+        targets = targets.filter(vehicle__member__batch_id=batch_id)
+    targets = targets.order_by('next_expiry', 'id').values_list(
+        'vehicle_id', 'vehicle__member_id', 'latest_entry_id'
+    )
+
+    with transaction.atomic():
+        campaign = RenewalReminderCampaign.objects.create(
+            filter_type=filter_type,
+            batch_id=batch_id or None,
+            window_start=window_start,
+            window_end=window_end,
+            portal_url=portal_url,
+            created_by=created_by,
+        )
+        recipients = RenewalReminderRecipient.objects.bulk_create([
+            RenewalReminderRecipient(
+                campaign=campaign,
+                vehicle_id=vehicle_id,
+                member_id=member_id,
+                document_entry_id=entry_id,
+            )
+            for vehicle_id, member_id, entry_id in targets
+        ], batch_size=500)
+        campaign.total_count = len(recipients)
+        if not recipients:
+            campaign.status = 'completed'
+            campaign.finished_at = timezone.now()
+        campaign.save(update_fields=['total_count', 'status', 'finished_at'])
+    return campaign
+
+
+def process_campaign_chunk(campaign, chunk_size=CAMPAIGN_CHUNK_SIZE):
+    """
+    Send the next chunk of pending recipients for a campaign.
+
+    Each recipient's outcome is saved as soon as its email is attempted, so
+    an interrupted run resumes with the recipients still marked pending.
+    Only one worker should process a given campaign at a time.
+
+    Returns:
+        Number of recipients processed (0 when the campaign is done)
+    """
+    from .models import RenewalReminderCampaign
+
+    chunk = list(
+        campaign.recipients.filter(status='pending')
+        .select_related('member__user_account', 'member__batch', 'vehicle', 'document_entry')
+        .order_by('id')[:chunk_size]
+    )
+    for recipient in chunk:
+        if recipient.document_entry is None:
+            success, message = False, "No approved document entry found"
+        else:
+            try:
+                success, message = send_renewal_reminder_email(
+                    recipient.member, recipient.vehicle, recipient.document_entry, campaign.portal_url
+                )
+            except Exception as e:
+                success, message = False, str(e)
+
+        recipient.status = 'sent' if success else 'failed'
+        recipient.error_message = '' if success else message
+        recipient.processed_at = timezone.now()
+        recipient.save(update_fields=['status', 'error_message', 'processed_at'])
+        if success:
+            record_reminder(recipient.member, recipient.vehicle, sent_by=campaign.created_by, campaign=campaign)
+
+    if chunk:
+        # Recount from the recipient rows so totals stay right after a crash
+        counts = campaign.recipients.aggregate(
+            sent=Count('id', filter=Q(status='sent')),
+            failed=Count('id', filter=Q(status='failed')),
+        )
+        RenewalReminderCampaign.objects.filter(pk=campaign.pk).update(
+            sent_count=counts['sent'],
+            failed_count=counts['failed'],
+        )
+    return len(chunk)
+
+
+def run_campaign(campaign, chunk_size=CAMPAIGN_CHUNK_SIZE):
+    """
+    Process a campaign chunk by chunk until no pending recipients remain.
+
+    Returns:
+        The refreshed campaign
+    """
+    from .models import RenewalReminderCampaign
+
+    updated = RenewalReminderCampaign.objects.filter(
+        pk=campaign.pk, status__in=['pending', 'running']
+    ).update(status='running', started_at=campaign.started_at or timezone.now())
+    if not updated:
+        return campaign
+
+    while process_campaign_chunk(campaign, chunk_size):
+        pass
+
+    RenewalReminderCampaign.objects.filter(pk=campaign.pk, status='running').update(
+        status='completed', finished_at=timezone.now()
+    )
+    campaign.refresh_from_db()
+    return campaign
+
+
+def campaign_progress(campaign):
+    """JSON-ready progress summary for the hub's polling endpoint."""
+    return {
+        'id': campaign.id,
+        'status': campaign.status,
+        'filter_type': campaign.get_filter_type_display(),
+        'total': campaign.total_count,
+        'sent': campaign.sent_count,
+        'failed': campaign.failed_count,
+        'pending': max(campaign.total_count - campaign.processed_count, 0),
+        'percent': campaign.percent_complete,
+    }
@@ -0,0 +1,344 @@
+# coop/renewals.py
+"""
+Renewal tracking helpers.
+
+Keeps the VehicleRenewalStatus table in step with document entries so the
+dashboard, batch pages, calendar and renewals hub can read every vehicle's
+next expiry with a single query instead of resolving entries per vehicle.
+"""
+from datetime import date, timedelta
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+
+# Days-left buckets shared by every renewal view, as inclusive (min, max)
+# ranges. Anything past the last range is 'normal', negative is 'overdue'.
+RENEWAL_THRESHOLDS = {
+    'urgent': (0, 29),
+    'upcoming': (30, 60),
+}
+
+# Bucket codes returned by classify_renewal_dates()
+BUCKETS = ['overdue', 'urgent', 'upcoming', 'normal', 'none']
+BUCKET_CODES = {name: code for code, name in enumerate(BUCKETS)}
+
+# How many yearly cycles a stale renewal date is rolled forward
+MAX_ROLLOVER_YEARS = 5
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+_NAT_ORDINAL = -1
+
+STATUS_CLASSES = {
+    'overdue': 'dark',
+    'urgent': 'danger',
+    'upcoming': 'warning',
+    'normal': 'secondary',
+    'none': 'secondary',
+}
+
+
+def local_today():
+    return timezone.localtime(timezone.now()).date()
+
+
+def add_years_safe(dt, years=1):
+    try:
+        return dt.replace(year=dt.year + years)
+    except ValueError:
+        # fallback for leap day -> move to Feb 28
+        return dt.replace(month=2, day=28, year=dt.year + years)
+
+
+def next_expiry_for(renewal_date, today):
+    """
+    Roll a recorded renewal date forward to the next expected expiry.
+
+    Args:
+        renewal_date: Date (or datetime) stored on the document entry
+        today: Reference date
+
+    Returns:
+        date of the next anniversary on or after today, or the last rolled
+        date if it is more than MAX_ROLLOVER_YEARS behind
+    """
+    if renewal_date is None:
+        return None
+    candidate = renewal_date
+    if hasattr(candidate, "date"):
+        candidate = candidate.date()
+    attempts = 0
+    while candidate < today and attempts < MAX_ROLLOVER_YEARS:
+        candidate = add_years_safe(candidate, 1)
+        attempts += 1
+    return candidate
+
+
+def classify_days_left(days_left):
+    """Map days left to a status bucket ('overdue', 'urgent', 'upcoming', 'normal', 'none')."""
+    if days_left is None:
+        return 'none'
+    if days_left < 0:
+        return 'overdue'
+    for bucket, (low, high) in RENEWAL_THRESHOLDS.items():
+        if low <= days_left <= high:
+            return bucket
+    return 'normal'
+
+
+def expiry_window(bucket, today):
+    """Inclusive (start, end) expiry dates for a RENEWAL_THRESHOLDS bucket."""
+    low, high = RENEWAL_THRESHOLDS[bucket]
+    return today + timedelta(days=low), today + timedelta(days=high)
+
+
+def pending_window(today):
+    """Inclusive (start, end) expiry dates covering every pending bucket."""
+    low = min(low for low, _ in RENEWAL_THRESHOLDS.values())
+    high = max(high for _, high in RENEWAL_THRESHOLDS.values())
+    return today + timedelta(days=low), today + timedelta(days=high)
+
+
+def classify_renewal_dates(renewal_dates, today):
+    """
+    Vectorized next_expiry_for() + classify_days_left() over many vehicles.
+
+    Args:
+        renewal_dates: Sequence of dates (None for vehicles without a record)
+        today: Reference date
+
+    Returns:
+        (next_expiries, days_left, codes) NumPy arrays. next_expiries is
+        datetime64[D] with NaT for missing dates, days_left is int64 (0 where
+        missing) and codes index into BUCKETS.
+    """
+    if isinstance(renewal_dates, np.ndarray):
+        dates = renewal_dates.astype('datetime64[D]')
+    else:
+        # Going through proleptic ordinals is far cheaper than letting NumPy
+        # parse date objects one by one.
+        ordinals = np.fromiter(
+            (d.toordinal() if d is not None else _NAT_ORDINAL for d in renewal_dates),
+            dtype=np.int64,
+        )
+        dates = (ordinals - _EPOCH_ORDINAL).astype('datetime64[D]')
+        dates[ordinals == _NAT_ORDINAL] = np.datetime64('NaT')
+    today64 = np.datetime64(today, 'D')
+    missing = np.isnat(dates)
+    dates = np.where(missing, today64, dates)
+
+    months_since_epoch = dates.astype('datetime64[M]').astype(np.int64)
+    years = months_since_epoch // 12 + 1970
+    months = months_since_epoch % 12 + 1
+    days = (dates - dates.astype('datetime64[M]')).astype(np.int64) + 1
+
+    # Leap days roll to Feb 28 on the first step and stay there, matching
+    # repeated add_years_safe() calls.
+    leap_day = (months == 2) & (days == 29)
+    month_day = months * 100 + np.where(leap_day, 28, days)
+    steps = today.year - years + (month_day < today.month * 100 + today.day)
+    steps = np.where(dates >= today64, 0, np.clip(steps, 0, MAX_ROLLOVER_YEARS))
+
+    expiry_days = np.where(leap_day & (steps > 0), 28, days)
+    expiries = ((years + steps - 1970) * 12 + months - 1).astype('datetime64[M]').astype('datetime64[D]')
+    expiries = expiries + (expiry_days - 1).astype('timedelta64[D]')
+    days_left = (expiries - today64).astype(np.int64)
+
+    codes = np.full(dates.shape, BUCKET_CODES['normal'], dtype=np.int8)
+    codes[days_left < 0] = BUCKET_CODES['overdue']
+    for bucket, (low, high) in reversed(list(RENEWAL_THRESHOLDS.items())):
+        codes[(days_left >= low) & (days_left <= high)] = BUCKET_CODES[bucket]
+    codes[missing] = BUCKET_CODES['none']
+    days_left[missing] = 0
+    expiries[missing] = np.datetime64('NaT')
+    return expiries, days_left, codes
+
+
+def latest_approved_entry(vehicle_id):
+    """Latest approved or manager-created DocumentEntry for a vehicle."""
+    from .models import DocumentEntry
+
+    return DocumentEntry.objects.latest_approved([vehicle_id]).first()
+
+
+def _status_fields(entry, today):
+    renewal_date = entry.renewal_date if entry else None
+    next_expiry = next_expiry_for(renewal_date, today)
+    days_left = (next_expiry - today).days if next_expiry else None
+    return {
+        'latest_entry': entry,
+        'renewal_date': renewal_date,
+        'next_expiry': next_expiry,
+        'status': classify_days_left(days_left),
+        'computed_on': today,
+    }
+
+
+def refresh_vehicle_status(vehicle_id, today=None):
+    """
+    Recompute the renewal status row for one vehicle.
+
+    Args:
+        vehicle_id: Primary key of the vehicle
+        today: Reference date (defaults to local today)
+
+    Returns:
+        VehicleRenewalStatus object
+    """
+    from .models import VehicleRenewalStatus
+
+    today = today or local_today()
+    entry = latest_approved_entry(vehicle_id)
+    status, _ = VehicleRenewalStatus.objects.update_or_create(
+        vehicle_id=vehicle_id,
+        defaults=_status_fields(entry, today),
+    )
+    return status
+
+
+def rebuild_renewal_statuses(today=None):
+    """
+    Rebuild the renewal status table for every vehicle.
+
+    Returns:
+        Number of status rows written
+    """
+    from .models import Vehicle, DocumentEntry, VehicleRenewalStatus
+
+    today = today or local_today()
+    latest_by_vehicle = DocumentEntry.objects.latest_approved_by_vehicle()
+    vehicle_ids = list(Vehicle.objects.values_list('id', flat=True))
+    entries = [latest_by_vehicle.get(vehicle_id) for vehicle_id in vehicle_ids]
+    expiries, _, codes = classify_renewal_dates(
+        [entry.renewal_date if entry else None for entry in entries], today
+    )
+
+    rows = [
+        VehicleRenewalStatus(
+            vehicle_id=vehicle_id,
+            latest_entry=entry,
+            renewal_date=entry.renewal_date if entry else None,
+            next_expiry=expiry.item() if entry else None,
+            status=BUCKETS[code],
+            computed_on=today,
+        )
+        for vehicle_id, entry, expiry, code in zip(vehicle_ids, entries, expiries, codes)
+    ]
+    with transaction.atomic():
+        VehicleRenewalStatus.objects.all().delete()
+        VehicleRenewalStatus.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
+
+
+def sync_renewal_statuses(today=None):
+    """
+    Bring status buckets up to date for the current day.
+
+    Expiries that have passed are rolled forward and every bucket is
+    re-evaluated with a handful of range UPDATEs. Runs at most once per day;
+    later calls cost a single EXISTS query.
+    """
+    from .models import VehicleRenewalStatus
+
+    today = today or local_today()
+    stale = VehicleRenewalStatus.objects.filter(
+        Q(computed_on__lt=today) | Q(computed_on__isnull=True)
+    )
+    if not stale.exists():
+        return
+
+    with transaction.atomic():
+        passed = list(VehicleRenewalStatus.objects.filter(
+            next_expiry__lt=today, renewal_date__isnull=False
+        ).only('id', 'renewal_date', 'next_expiry'))
+        if passed:
+            expiries, _, _ = classify_renewal_dates([row.renewal_date for row in passed], today)
+            rolled = []
+            for row, expiry in zip(passed, expiries):
+                if expiry.item() != row.next_expiry:
+                    row.next_expiry = expiry.item()
+                    rolled.append(row)
+            VehicleRenewalStatus.objects.bulk_update(rolled, ['next_expiry'], batch_size=500)
+
+        rows = VehicleRenewalStatus.objects
+        rows.filter(next_expiry__isnull=True).update(status='none', computed_on=today)
+        rows.filter(next_expiry__lt=today).update(status='overdue', computed_on=today)
+        rows.filter(next_expiry__gte=today).update(status='normal', computed_on=today)
+        for bucket in reversed(list(RENEWAL_THRESHOLDS)):
+            rows.filter(next_expiry__range=expiry_window(bucket, today)).update(status=bucket)
+
+
+def pending_renewals_count(today=None):
+    """Number of member vehicles in any RENEWAL_THRESHOLDS bucket."""
+    from .models import VehicleRenewalStatus
+
+    today = today or local_today()
+    sync_renewal_statuses(today)
+    return VehicleRenewalStatus.objects.filter(
+        vehicle__member__isnull=False,
+        status__in=list(RENEWAL_THRESHOLDS),
+    ).count()
+
+
+def month_bounds(year, month):
+    """First and last day of a calendar month."""
+    first = date(year, month, 1)
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return first, last
+
+
+def renewal_counts_by_day(start, end):
+    """
+    Per-day renewal counts for member vehicles expiring between two dates.
+
+    Args:
+        start: First date (inclusive)
+        end: Last date (inclusive)
+
+    Returns:
+        dict of 'YYYY-MM-DD' -> {'urgent', 'upcoming', 'normal'} counts,
+        only for days that have renewals
+    """
+    from .models import VehicleRenewalStatus
+
+    rows = VehicleRenewalStatus.objects.filter(
+        vehicle__member__isnull=False,
+        next_expiry__range=(start, end),
+    ).values('next_expiry').annotate(
+        total=Count('id'),
+        urgent=Count('id', filter=Q(status='urgent')),
+        upcoming=Count('id', filter=Q(status='upcoming')),
+    ).order_by('next_expiry')
+
+    return {
+        row['next_expiry'].isoformat(): {
+            'urgent': row['urgent'],
+            'upcoming': row['upcoming'],
+            'normal': row['total'] - row['urgent'] - row['upcoming'],
+        }
+        for row in rows
+    }
+
+
+def vehicle_renewal_info(vehicle, today):
+    """
+    Summarize a vehicle's renewal status row for templates and JSON.
+
+    Args:
+        vehicle: Vehicle with renewal_status selected
+        today: Reference date
+
+    Returns:
+        dict with plate, expiry_date (YYYY-MM-DD or None), days_left and status
+    """
+    renewal_status = getattr(vehicle, 'renewal_status', None)
+    expiry_date = renewal_status.next_expiry if renewal_status else None
+    days_left = (expiry_date - today).days if expiry_date else None
+    return {
+        'plate': getattr(vehicle, 'plate_number', 'N/A'),
+        'expiry_date': expiry_date.strftime('%Y-%m-%d') if expiry_date else None,
+        'days_left': days_left,
+        'status': classify_days_left(days_left),
+    }
@@ -0,0 +1,149 @@
+# coop/sequences.py
+"""
+Transaction ID allocation for PaymentLog and CarWashLog.
+
+IDs look like PMT-2025-00123. The number comes from a TransactionSequence
+row per (prefix, year): an UPDATE ... SET last_value = last_value + n takes
+the row lock, so concurrent writers are serialized on that single row
+instead of scanning the log table for the highest ID and racing each other.
+
+With settings.TRANSACTION_ID_BLOCK_SIZE above 1 each worker process
+reserves a block of numbers at a time and hands them out from memory. IDs
+stay unique but are no longer strictly in posting order across workers, and
+numbers left in a block when a worker exits are skipped.
+"""
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+
+# Log model holding the existing IDs for each prefix, used to seed a new
+# sequence so numbering continues where the prefix scan left off
+SEQUENCE_MODELS = {
+    'PMT': 'PaymentLog',
+    'OTH': 'PaymentLog',
+    'CW': 'CarWashLog',
+}
+
+# SQLite has no row locks: a concurrent writer gets "database is locked"
+# (or "database table is locked" with a shared cache) instead of waiting on
+# the sequence row, so the reservation is retried with a growing pause
+LOCK_RETRIES = 50
+LOCK_RETRY_DELAY = 0.005
+
+_blocks = {}
+_blocks_lock = threading.Lock()
+
+
+def format_transaction_id(prefix, year, number):
+    return f"{prefix}-{year}-{number:05d}"
+
+
+def _highest_existing_number(prefix, year):
+    from django.apps import apps
+
+    model = apps.get_model('coop', SEQUENCE_MODELS[prefix])
+    last_id = model.objects.filter(
+        transaction_id__startswith=f"{prefix}-{year}-"
+    ).order_by('-transaction_id').values_list('transaction_id', flat=True).first()
+    try:
+        return int(last_id.split('-')[-1]) if last_id else 0
+    except ValueError:
+        return 0
+
+
+def allocate_transaction_numbers(prefix, year=None, count=1):
+    """
+    Reserve count consecutive transaction numbers.
+
+    The reservation belongs to the caller's transaction: if it rolls back,
+    the numbers are released again.
+
+    Args:
+        prefix: Transaction ID prefix (a key of SEQUENCE_MODELS)
+        year: Sequence year (defaults to the current year)
+        count: How many numbers to reserve
+
+    Returns:
+        First number of the reserved range
+    """
+    year = year or timezone.now().year
+    for attempt in range(LOCK_RETRIES):
+        try:
+            return _reserve_numbers(prefix, year, count)
+        except OperationalError as error:
+            if 'locked' not in str(error) or attempt == LOCK_RETRIES - 1:
+                raise
+            time.sleep(LOCK_RETRY_DELAY * (attempt + 1))
+
+
+def _reserve_numbers(prefix, year, count):
+    from .models import TransactionSequence
+
+    sequence = TransactionSequence.objects.filter(prefix=prefix, year=year)
+    with transaction.atomic():
+        if not sequence.update(last_value=F('last_value') + count):
+            # First ID of the year for this prefix
+            try:
+                with transaction.atomic():
+                    TransactionSequence.objects.create(
+                        prefix=prefix, year=year, last_value=_highest_existing_number(prefix, year)
+                    )
+            except IntegrityError:
+                pass  # Another writer created it first
+            sequence.update(last_value=F('last_value') + count)
+        last_value = sequence.select_for_update().values_list('last_value', flat=True).get()
+    return last_value - count + 1
+
+
+def _block_size():
+    return max(getattr(settings, 'TRANSACTION_ID_BLOCK_SIZE', 1), 1)
+
+
+def next_transaction_number(prefix, year=None):
+    """
+    Next transaction number for a prefix, from this worker's block when
+    block pre-allocation is enabled.
+    """
+    year = year or timezone.now().year
+    block_size = _block_size()
+    # A block reserved inside an outer transaction could be rolled back
+    # while this worker keeps handing it out, so only refill in autocommit
+    if block_size == 1 or connection.in_atomic_block:
+        with _blocks_lock:
+            block = _blocks.get((prefix, year))
+            if block and block['pid'] == os.getpid() and block['next'] <= block['last']:
+                block['next'] += 1
+                return block['next'] - 1
+        return allocate_transaction_numbers(prefix, year)
+
+    with _blocks_lock:
+        block = _blocks.get((prefix, year))
+        # Forked workers must not reuse their parent's block
+        if not block or block['pid'] != os.getpid() or block['next'] > block['last']:
+            first = allocate_transaction_numbers(prefix, year, block_size)
+            block = {'pid': os.getpid(), 'next': first, 'last': first + block_size - 1}
+            _blocks[(prefix, year)] = block
+        block['next'] += 1
+        return block['next'] - 1
+
+
+def next_transaction_id(prefix, year=None):
+    """Next formatted transaction ID for a prefix, e.g. CW-2025-00042."""
+    year = year or timezone.now().year
+    return format_transaction_id(prefix, year, next_transaction_number(prefix, year))
+
+
+def allocate_transaction_ids(prefix, count, year=None):
+    """
+    Reserve a contiguous block of formatted transaction IDs in the caller's
+    transaction, for batch postings.
+    """
+    year = year or timezone.now().year
+    first = allocate_transaction_numbers(prefix, year, count)
+    return [format_transaction_id(prefix, year, number) for number in range(first, first + count)]
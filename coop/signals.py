@@ -1,19 +1,158 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
-from .models import Member, PaymentType, PaymentEntry
+from .models import User, Member, PaymentYear, PaymentType, PaymentEntry, Vehicle, Document, DocumentEntry, VehicleRenewalStatus, CarWashLog
+from .renewals import refresh_vehicle_status
+from .whiteboard import invalidate_pending_counts
+from .payments import (
+    invalidate_year_totals, invalidate_member_years, invalidate_all_member_years, seed_placeholder_entries,
+    refresh_member_balance, refresh_type_balances, invalidate_carwash_types,
+)
 
 @receiver(post_save, sender=Member)
 def create_payment_entries_for_new_member(sender, instance, created, **kwargs):
     if created:  # Only run this logic when a new Member is created
-        # Get all "From Members" payment types
+        # Seed January to December of every "From Members" type (no-op with the sparse ledger)
         from_members_payment_types = PaymentType.objects.filter(payment_type='from_members')
+        seed_placeholder_entries(from_members_payment_types, [instance], months=12)
 
-        # Create PaymentEntry records for each payment type and month
-        for payment_type in from_members_payment_types:
-            for month in range(1, 13):  # January to December
-                PaymentEntry.objects.create(
-                    payment_type=payment_type,
-                    member=instance,
-                    month=month,
-                    amount_paid=0.00  # Default to 0
-                )
\ No newline at end of file
+
+# ==== Renewal status upkeep ====
+
+@receiver(post_save, sender=Vehicle)
+def create_renewal_status_for_new_vehicle(sender, instance, created, **kwargs):
+    if created:
+        refresh_vehicle_status(instance.pk)
+
+
+@receiver(post_save, sender=Document)
+def refresh_renewal_status_on_document_change(sender, instance, **kwargs):
+    # A document moved to another vehicle leaves a stale row on the old one
+    stale_vehicle_ids = VehicleRenewalStatus.objects.filter(
+        latest_entry__document=instance
+    ).exclude(vehicle_id=instance.vehicle_id).values_list('vehicle_id', flat=True)
+    for vehicle_id in list(stale_vehicle_ids):
+        refresh_vehicle_status(vehicle_id)
+    if instance.vehicle_id:
+        refresh_vehicle_status(instance.vehicle_id)
+
+
+@receiver(post_save, sender=DocumentEntry)
+@receiver(post_delete, sender=DocumentEntry)
+def refresh_renewal_status_on_entry_change(sender, instance, **kwargs):
+    # Covers uploads, approve/reject and manager "mark as renewed" entries
+    vehicle_id = Document.objects.filter(pk=instance.document_id).values_list('vehicle_id', flat=True).first()
+    if vehicle_id:
+        refresh_vehicle_status(vehicle_id)
+
+
+# ==== Whiteboard count invalidation ====
+
+WHITEBOARD_USER_FIELDS = ('is_active', 'dormant')
+
+
+@receiver(pre_save, sender=User)
+def remember_user_activation(sender, instance, update_fields=None, **kwargs):
+    if instance.pk and (update_fields is None or set(WHITEBOARD_USER_FIELDS) & set(update_fields)):
+        instance._previous_activation = User.objects.filter(pk=instance.pk).values_list(*WHITEBOARD_USER_FIELDS).first()
+
+
+@receiver(post_save, sender=User)
+def invalidate_counts_on_activation(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_activation', None)
+    if created or (previous is not None and tuple(previous) != (instance.is_active, instance.dormant)):
+        transaction.on_commit(invalidate_pending_counts)
+
+
+@receiver(pre_save, sender=DocumentEntry)
+def remember_entry_status(sender, instance, **kwargs):
+    if instance.pk:
+        instance._previous_status = DocumentEntry.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+
+
+@receiver(post_save, sender=DocumentEntry)
+def invalidate_counts_on_entry_status(sender, instance, created, **kwargs):
+    # New uploads, approve/reject and manager renewals all land here
+    if created or getattr(instance, '_previous_status', None) != instance.status:
+        transaction.on_commit(invalidate_pending_counts)
+
+
+@receiver(post_delete, sender=DocumentEntry)
+@receiver(post_delete, sender=User)
+def invalidate_counts_on_delete(sender, instance, **kwargs):
+    transaction.on_commit(invalidate_pending_counts)
+
+
+# ==== Payment summary caches ====
+
+@receiver(post_save, sender=PaymentEntry)
+@receiver(post_delete, sender=PaymentEntry)
+def invalidate_payment_totals_on_entry_change(sender, instance, **kwargs):
+    if PaymentEntry.payment_type.is_cached(instance):
+        year_id = instance.payment_type.year_id
+    else:
+        year_id = PaymentType.objects.filter(pk=instance.payment_type_id).values_list('year_id', flat=True).first()
+    if year_id:
+        transaction.on_commit(lambda: invalidate_year_totals(year_id))
+    if instance.member_id:
+        member_id = instance.member_id
+        transaction.on_commit(lambda: invalidate_member_years(member_id))
+
+
+@receiver(post_save, sender=PaymentType)
+@receiver(post_delete, sender=PaymentType)
+@receiver(post_save, sender=PaymentYear)
+@receiver(post_delete, sender=PaymentYear)
+def invalidate_member_years_on_type_change(sender, instance, **kwargs):
+    # Type counts appear on every member's year cards
+    transaction.on_commit(invalidate_all_member_years)
+    year_id = instance.pk if sender is PaymentYear else instance.year_id
+    transaction.on_commit(lambda: invalidate_carwash_types(year_id))
+
+
+# ==== Member balance upkeep ====
+
+@receiver(pre_save, sender=PaymentEntry)
+def remember_entry_balance_key(sender, instance, **kwargs):
+    # An edit can move an entry to another member or payment type
+    if instance.pk:
+        instance._previous_balance_key = PaymentEntry.objects.filter(pk=instance.pk).values_list(
+            'member_id', 'payment_type_id'
+        ).first()
+
+
+@receiver(post_save, sender=PaymentEntry)
+def refresh_balance_on_entry_change(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_balance_key', None)
+    if previous and tuple(previous) != (instance.member_id, instance.payment_type_id):
+        refresh_member_balance(*previous)
+    payment_type = instance.payment_type if PaymentEntry.payment_type.is_cached(instance) else instance.payment_type_id
+    refresh_member_balance(instance.member_id, payment_type)
+
+
+@receiver(post_delete, sender=PaymentEntry)
+def refresh_balance_on_entry_delete(sender, instance, **kwargs):
+    # Entries are also deleted by the cascade from their PaymentType or
+    # PaymentYear; refreshing then would recreate a balance row for the type
+    # being deleted, so wait for the commit and look the type up again
+    member_id, payment_type_id = instance.member_id, instance.payment_type_id
+    if member_id:
+        transaction.on_commit(lambda: refresh_member_balance(member_id, payment_type_id))
+
+
+@receiver(post_save, sender=PaymentType)
+def refresh_balances_on_type_change(sender, instance, created, **kwargs):
+    if not created:
+        refresh_type_balances(instance)
+
+
+# ==== Normalized lookup keys ====
+
+@receiver(pre_save, sender=CarWashLog)
+def set_carwash_customer_key(sender, instance, **kwargs):
+    instance.customer_key = CarWashLog.normalize_customer_name(instance.customer_name)
+
+
+@receiver(pre_save, sender=Vehicle)
+def set_vehicle_plate_key(sender, instance, **kwargs):
+    instance.plate_key = Vehicle.normalize_plate(instance.plate_number)
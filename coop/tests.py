@@ -1,3 +1,282 @@
-from django.test import TestCase
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+
+from . import sequences
+from .models import (
+    Batch, CarWashCompliance, CarWashLog, CarWashMonthlyCompliance, Member, MemberYearBalance, PaymentEntry, PaymentLog, PaymentType, PaymentYear,
+    TransactionSequence, User, Vehicle,
+)
+from .payments import close_carwash_month, seed_placeholder_entries, settle_carwash_penalty, year_monthly_totals
+
+
+@override_settings(PAYMENT_SPARSE_LEDGER=False)
+class SeedPlaceholderEntriesTests(TestCase):
+    MEMBERS = 1000
+
+    @classmethod
+    def setUpTestData(cls):
+        batch = Batch.objects.create(number='1')
+        # bulk_create skips the new-member signal, so members start without entries
+        Member.objects.bulk_create([
+            Member(full_name=f'Member {i}', batch=batch, batch_monitoring_number=i)
+            for i in range(1, cls.MEMBERS + 1)
+        ])
+        year = PaymentYear.objects.create(year=2025)
+        cls.payment_type = PaymentType.objects.create(
+            name='Monthly Dues', year=year, payment_type='from_members', amount=100, frequency=12,
+        )
+
+    def test_seeds_1k_members_by_12_months_in_chunked_inserts(self):
+        member_ids = Member.objects.values_list('pk', flat=True)
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            created = seed_placeholder_entries([self.payment_type], member_ids)
+            elapsed = time.perf_counter() - start
+
+        self.assertEqual(created, self.MEMBERS * 12)
+        self.assertEqual(PaymentEntry.objects.filter(payment_type=self.payment_type).count(), self.MEMBERS * 12)
+        # Multi-row INSERTs, never one per entry (backends may split a chunk
+        # further to stay under their query parameter limit)
+        inserts = [query for query in queries.captured_queries if query['sql'].startswith('INSERT')]
+        self.assertLess(len(inserts), self.MEMBERS * 12 // 50)
+        self.assertLess(elapsed, 10)
+
+    def test_new_member_is_seeded_for_every_month(self):
+        member = Member.objects.create(full_name='New Member', batch=Batch.objects.get(), batch_monitoring_number=0)
+        self.assertEqual(member.payment_entries.count(), 12)
+
+    @override_settings(PAYMENT_SPARSE_LEDGER=True)
+    def test_sparse_ledger_seeds_nothing(self):
+        member = Member.objects.create(full_name='New Member', batch=Batch.objects.get(), batch_monitoring_number=0)
+        self.assertEqual(member.payment_entries.count(), 0)
+
+
+class MemberBalanceDeleteTests(TestCase):
+    def setUp(self):
+        self.member = Member.objects.create(
+            full_name='Balance Member', batch=Batch.objects.create(number='1'), batch_monitoring_number=1,
+        )
+        self.year = PaymentYear.objects.create(year=2025)
+        self.payment_type = PaymentType.objects.create(
+            name='Monthly Dues', year=self.year, payment_type='from_members', amount=100, frequency=12,
+        )
+        for month in (1, 2):
+            PaymentEntry.objects.create(payment_type=self.payment_type, member=self.member, month=month, amount_paid=100)
+
+    def test_deleting_entry_refreshes_balance(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            PaymentEntry.objects.filter(month=2).get().delete()
+        balance = MemberYearBalance.objects.get(member=self.member, payment_type=self.payment_type)
+        self.assertEqual(balance.total_paid, 100)
+
+    def test_deleting_type_with_entries(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.payment_type.delete()
+        self.assertFalse(PaymentEntry.objects.exists())
+        self.assertFalse(MemberYearBalance.objects.exists())
+
+    def test_deleting_year_with_entries(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.year.delete()
+        self.assertFalse(PaymentType.objects.exists())
+        self.assertFalse(MemberYearBalance.objects.exists())
+
+    def test_type_that_starts_tracking_gets_balance_rows(self):
+        payment_type = PaymentType.objects.create(
+            name='Hall Rental', year=self.year, payment_type='other', amount=50, frequency=12,
+        )
+        for month in (1, 2, 3):
+            PaymentEntry.objects.create(payment_type=payment_type, member=self.member, month=month, amount_paid=50)
+        self.assertFalse(MemberYearBalance.objects.filter(payment_type=payment_type).exists())
+
+        payment_type.payment_type = 'from_members'
+        payment_type.save()
+        balance = MemberYearBalance.objects.get(member=self.member, payment_type=payment_type)
+        self.assertEqual(balance.total_paid, 150)
+        self.assertEqual(balance.status, 'partial')
+
+
+class TransactionSequenceTests(TestCase):
+    def setUp(self):
+        sequences._blocks.clear()
+
+    def test_ids_continue_from_existing_logs(self):
+        PaymentLog.objects.create(
+            transaction_id='PMT-2025-00041', category='from_members', payment_type_name='Dues',
+            amount=100, payment_year=2025, payment_month=1,
+        )
+        self.assertEqual(sequences.next_transaction_id('PMT', 2025), 'PMT-2025-00042')
+        self.assertEqual(sequences.next_transaction_id('PMT', 2025), 'PMT-2025-00043')
+        self.assertEqual(sequences.next_transaction_id('OTH', 2025), 'OTH-2025-00001')
+
+    def test_generate_transaction_id_uses_sequence(self):
+        first = CarWashLog.generate_transaction_id()
+        second = CarWashLog.generate_transaction_id()
+        self.assertEqual(int(second.split('-')[-1]), int(first.split('-')[-1]) + 1)
+
+    def test_allocate_reserves_contiguous_block(self):
+        ids = sequences.allocate_transaction_ids('CW', 3, year=2025)
+        self.assertEqual(ids, ['CW-2025-00001', 'CW-2025-00002', 'CW-2025-00003'])
+        self.assertEqual(sequences.next_transaction_id('CW', 2025), 'CW-2025-00004')
+
+    @override_settings(TRANSACTION_ID_BLOCK_SIZE=10)
+    def test_block_is_only_refilled_outside_transactions(self):
+        # Inside the test transaction numbers are reserved one at a time
+        sequences.next_transaction_number('CW', 2025)
+        self.assertEqual(sequences.allocate_transaction_numbers('CW', 2025), 2)
+        self.assertEqual(sequences._blocks, {})
+
+
+class TransactionSequenceParallelWriterTests(TransactionTestCase):
+    """
+    Parallel writers on the configured database (SQLite here): each
+    allocation is an UPDATE ... SET last_value = last_value + 1 that takes
+    the database write lock, so writers are serialized on the sequence row.
+    """
+    WRITERS = 8
+    IDS_PER_WRITER = 25
+
+    def setUp(self):
+        sequences._blocks.clear()
+
+    def _write(self, _):
+        try:
+            return [sequences.next_transaction_id('PMT', 2025) for _ in range(self.IDS_PER_WRITER)]
+        finally:
+            connection.close()
+
+    def test_parallel_writers_get_unique_consecutive_ids(self):
+        # Create the sequence row up front so writers only race on the UPDATE
+        sequences.next_transaction_id('PMT', 2025)
+        with ThreadPoolExecutor(max_workers=self.WRITERS) as pool:
+            results = list(pool.map(self._write, range(self.WRITERS)))
+
+        numbers = sorted(int(transaction_id.split('-')[-1]) for ids in results for transaction_id in ids)
+        self.assertEqual(numbers, list(range(2, self.WRITERS * self.IDS_PER_WRITER + 2)))
+        self.assertEqual(
+            TransactionSequence.objects.get(prefix='PMT', year=2025).last_value, self.WRITERS * self.IDS_PER_WRITER + 1,
+        )
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class TransactionSequenceConcurrencyTests(TransactionTestCase):
+    WRITERS = 8
+    IDS_PER_WRITER = 50
+
+    def setUp(self):
+        sequences._blocks.clear()
+
+    def _write(self, _):
+        try:
+            return [sequences.next_transaction_id('PMT', 2025) for _ in range(self.IDS_PER_WRITER)]
+        finally:
+            connection.close()
+
+    def _assert_unique(self, block_size):
+        with override_settings(TRANSACTION_ID_BLOCK_SIZE=block_size):
+            with ThreadPoolExecutor(max_workers=self.WRITERS) as pool:
+                results = list(pool.map(self._write, range(self.WRITERS)))
+        ids = [transaction_id for writer_ids in results for transaction_id in writer_ids]
+        self.assertEqual(len(ids), self.WRITERS * self.IDS_PER_WRITER)
+        self.assertEqual(len(set(ids)), len(ids))
+
+    def test_parallel_writers_get_unique_ids(self):
+        self._assert_unique(block_size=1)
+
+    def test_parallel_writers_get_unique_ids_with_blocks(self):
+        self._assert_unique(block_size=20)
+
+
+class CloseCarWashMonthTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        batch = Batch.objects.create(number='1')
+        cls.year = PaymentYear.objects.create(year=2025)
+        wash = PaymentType.objects.create(
+            name='Basic Wash', year=cls.year, payment_type='from_members', is_car_wash=True, car_wash_amount=150,
+        )
+        CarWashCompliance.objects.create(year=cls.year, monthly_threshold=1, penalty_amount=250)
+        cls.compliant = Member.objects.create(full_name='Washed', batch=batch, batch_monitoring_number=1)
+        cls.short = Member.objects.create(full_name='Unwashed', batch=batch, batch_monitoring_number=2)
+        washed_van = Vehicle.objects.create(plate_number='AAA 111', member=cls.compliant)
+        Vehicle.objects.create(plate_number='BBB 222', member=cls.short)
+        PaymentEntry.objects.create(
+            payment_type=wash, member=cls.compliant, vehicle=washed_van, month=3, amount_paid=150,
+            is_car_wash_record=True,
+        )
+
+    def setUp(self):
+        sequences._blocks.clear()
+
+    def test_rerun_assesses_a_single_penalty_per_member(self):
+        first = close_carwash_month(self.year, 3)
+        second = close_carwash_month(self.year, 3)
+
+        self.assertEqual((first['members'], first['non_compliant'], first['penalties']), (2, 1, 1))
+        self.assertEqual(second['penalties'], 0)
+        self.assertEqual(CarWashMonthlyCompliance.objects.filter(year=self.year, month=3).count(), 2)
+        penalties = PaymentLog.objects.filter(payment_type__name='Car Wash Penalty')
+        self.assertEqual(list(penalties.values_list('member', 'status')), [(self.short.pk, 'pending')])
+
+    def test_penalty_counts_as_collected_only_once_settled(self):
+        close_carwash_month(self.year, 3)
+        penalty_type = PaymentType.objects.get(year=self.year, name='Car Wash Penalty')
+        self.assertNotIn(penalty_type.pk, year_monthly_totals(self.year))
+
+        penalty_log = PaymentLog.objects.get(payment_type=penalty_type)
+        with self.captureOnCommitCallbacks(execute=True):
+            entry = settle_carwash_penalty(penalty_log)
+        self.assertEqual(settle_carwash_penalty(penalty_log), entry)
+        self.assertEqual(year_monthly_totals(self.year)[penalty_type.pk][2], 250)
+        penalty_log.refresh_from_db()
+        self.assertEqual(penalty_log.status, 'confirmed')
+
+
+class CarWashPosApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user(username='washbay', password='pw', is_staff=True)
+        member = Member.objects.create(
+            full_name='Wash Member', batch=Batch.objects.create(number='1'), batch_monitoring_number=1,
+        )
+        cls.vehicle = Vehicle.objects.create(plate_number='ABC-1234', member=member)
+        cls.year = PaymentYear.objects.create(year=2025)
+        cls.service = PaymentType.objects.create(
+            name='Basic Wash', year=cls.year, payment_type='from_members', is_car_wash=True, car_wash_amount=150,
+        )
+
+    def setUp(self):
+        sequences._blocks.clear()
+        self.client.force_login(self.staff)
+
+    def _post(self, payload, **headers):
+        return self.client.post(
+            f'/api/carwash/{self.year.pk}/record/', json.dumps(payload), content_type='application/json', **headers
+        )
+
+    def test_plate_lookup_ignores_spacing_and_case(self):
+        response = self._post({'plate': 'abc 1234', 'service_type': self.service.pk, 'month': 3})
+        self.assertEqual(response.status_code, 201)
+        log = CarWashLog.objects.get(transaction_id=response.json()['transaction_id'])
+        self.assertEqual((log.vehicle, log.member, log.carwash_month), (self.vehicle, self.vehicle.member, 3))
+        self.assertTrue(PaymentEntry.objects.filter(vehicle=self.vehicle, month=3, amount_paid=150).exists())
+
+    def test_retry_with_same_idempotency_key_is_recorded_once(self):
+        payload = {'plate': 'ABC1234', 'service_type': self.service.pk}
+        first = self._post(payload, HTTP_IDEMPOTENCY_KEY='bay-1-0001')
+        retry = self._post(payload, HTTP_IDEMPOTENCY_KEY='bay-1-0001')
+        self.assertEqual(retry.status_code, 200)
+        self.assertTrue(retry.json()['replayed'])
+        self.assertEqual(retry.json()['transaction_id'], first.json()['transaction_id'])
+        self.assertEqual(CarWashLog.objects.count(), 1)
+        self.assertEqual(PaymentEntry.objects.filter(is_car_wash_record=True).count(), 1)
+
+    def test_unknown_plate_writes_nothing(self):
+        response = self._post({'plate': 'ZZZ 999', 'service_type': self.service.pk})
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(CarWashLog.objects.exists())
@@ -361,6 +361,8 @@ def user_documents(request):
     """
     return render(request, "user_documents.html")
 
+from .payments import member_year_summaries, MemberLedger
+
 @login_required
 def user_payments(request):
     """
@@ -374,43 +376,8 @@ def user_payments(request):
         messages.warning(request, "Your account is not linked to a member profile. Please contact the administrator to link your account.")
         return render(request, "user_payments.html", {'member': None, 'payment_years': []})
     
-    # Get all payment years
-    payment_years = PaymentYear.objects.all().order_by('-year')
-    
-    # Build year summary data
-    years_data = []
-    for year in payment_years:
-        # Count total payment types for this year (from_members + other)
-        from_members_count = PaymentType.objects.filter(
-            year=year, 
-            payment_type='from_members'
-        ).count()
-        
-        other_count = PaymentType.objects.filter(
-            year=year, 
-            payment_type='other'
-        ).count()
-        
-        # Count member's payments for this year
-        member_payments = PaymentEntry.objects.filter(
-            payment_type__year=year,
-            member=member
-        ).exclude(amount_paid=0).count()
-        
-        # Calculate total amount paid by member for this year
-        from django.db.models import Sum
-        total_paid = PaymentEntry.objects.filter(
-            payment_type__year=year,
-            member=member
-        ).aggregate(total=Sum('amount_paid'))['total'] or 0
-        
-        years_data.append({
-            'year': year,
-            'from_members_count': from_members_count,
-            'other_count': other_count,
-            'member_payments_count': member_payments,
-            'total_paid': total_paid,
-        })
+    # Year cards for every payment year (one grouped query, cached per member)
+    years_data = member_year_summaries(member)
     
     context = {
         'member': member,
@@ -435,63 +402,22 @@ def user_payment_year_detail(request, year_id):
     # Get the specific payment year
     year = get_object_or_404(PaymentYear, id=year_id)
     
-    # Get "From Members" payment types
-    from_members_types = PaymentType.objects.filter(
-        year=year, 
-        payment_type='from_members'
-    ).order_by('name')
-    
-    # Get "Other" payment types
-    other_types = PaymentType.objects.filter(
-        year=year, 
-        payment_type='other'
-    ).order_by('name')
+    # All of the member's entries for the year in one query
+    ledger = MemberLedger(member, year)
     
     # Build payment data for "From Members"
-    from_members_data = []
-    for payment_type in from_members_types:
-        monthly_totals = []
-        for month_num in range(1, 13):
-            # Aggregate all payment entries for this payment type, member, and month
-            total = PaymentEntry.objects.filter(
-                payment_type=payment_type,
-                member=member,
-                month=month_num
-            ).aggregate(total=Sum('amount_paid'))['total']
-            
-            # total will be None if no payments exist, or the sum if they do
-            monthly_totals.append(total)
-        
-        from_members_data.append({
-            'payment_type': payment_type,
-            'monthly_totals': monthly_totals,
-        })
+    from_members_data = [
+        {'payment_type': payment_type, 'monthly_totals': ledger.monthly_totals(payment_type)}
+        for payment_type in ledger.from_members_types
+    ]
     
     # Build payment data for "Other"
-    other_data = []
-    for payment_type in other_types:
-        monthly_totals = []
-        for month_num in range(1, 13):
-            # Aggregate all payment entries for this payment type, member, and month
-            total = PaymentEntry.objects.filter(
-                payment_type=payment_type,
-                member=member,
-                month=month_num
-            ).aggregate(total=Sum('amount_paid'))['total']
-            
-            # total will be None if no payments exist, or the sum if they do
-            monthly_totals.append(total)
-        
-        other_data.append({
-            'payment_type': payment_type,
-            'monthly_totals': monthly_totals,
-        })
+    other_data = [
+        {'payment_type': payment_type, 'monthly_totals': ledger.monthly_totals(payment_type)}
+        for payment_type in ledger.other_types
+    ]
     
-    # Calculate totals (Sum is already imported at module level)
-    total_paid = PaymentEntry.objects.filter(
-        payment_type__year=year,
-        member=member
-    ).aggregate(total=Sum('amount_paid'))['total'] or 0
+    total_paid = ledger.total_paid()
     
     context = {
         'member': member,
@@ -1597,13 +1523,7 @@ from django.contrib.admin.views.decorators import staff_member_required
 from .models import Member, Document, DocumentEntry, User
 from .forms import AdminProfileForm
 from datetime import timedelta, date
-
-def _add_years_safe(dt, years=1):
-    try:
-        return dt.replace(year=dt.year + years)
-    except ValueError:
-        # fallback for leap day -> move to Feb 28
-        return dt.replace(month=2, day=28, year=dt.year + years)
+from .renewals import add_years_safe as _add_years_safe
 
 @login_required
 @user_passes_test(lambda u: u.is_staff)
@@ -1628,9 +1548,7 @@ def member_view(request, pk):
     documents = []
     for doc in Document.objects.filter(vehicle__in=vehicles):
         # Only approved or manager-created entries
-        entries = list(doc.entries.filter(
-            models.Q(status="approved") | models.Q(uploaded_by__isnull=True)
-        ).order_by('renewal_date'))
+        entries = list(doc.entries.approved().order_by('renewal_date'))
         if entries:
             doc.entries_list = entries
             documents.append(doc)
@@ -1789,6 +1707,12 @@ from django.contrib.auth import get_user_model
 from .models import Member, Vehicle
 
 from django.core.paginator import Paginator
+from django.db.models import Prefetch, Count, Q
+from django.http import JsonResponse
+from django.urls import reverse
+from .models import VehicleRenewalStatus
+from .renewals import sync_renewal_statuses, vehicle_renewal_info, renewal_counts_by_day, month_bounds
+from .whiteboard import get_pending_counts
 
 @login_required
 def home(request):
@@ -1801,98 +1725,27 @@ def home(request):
     batch_count = Batch.objects.count()
     document_count = Document.objects.count()
 
-    urgent_members = []
-    warning_members = []
-    
-    # Track total renewals for whiteboard
-    total_renewals_count = 0
-
-    batch_cards = []
-    for batch in Batch.objects.all():
-        members_qs = batch.members.select_related('user_account').prefetch_related('vehicles__document__entries').all().order_by('full_name')
-        total_count = members_qs.count()
-
-        urgent_count = 0
-        upcoming_count = 0
-        members_preview = []   # for client-side preview (member -> vehicles list)
-
-        for idx, member in enumerate(members_qs):
-            # collect per-vehicle renewal info for this member
-            vehicle_infos = []
-            member_has_urgent = False
-            member_has_upcoming = False
-
-            for vehicle in member.vehicles.all():
-                plate = getattr(vehicle, 'plate_number', 'N/A')
-                latest_entry = DocumentEntry.objects.filter(
-                    document__vehicle=vehicle
-                ).filter(
-                    Q(status="approved") | Q(uploaded_by__isnull=True)
-                ).order_by('-renewal_date').first()
-
-                expiry_date = None
-                if latest_entry and latest_entry.renewal_date:
-                    candidate = latest_entry.renewal_date
-                    # convert to date if datetime
-                    if hasattr(candidate, "date"):
-                        candidate = candidate.date()
-                    # if stored date is in the past, advance year-by-year to next expected expiry
-                    attempts = 0
-                    while candidate < today and attempts < 5:
-                        candidate = _add_years_safe(candidate, 1)
-                        attempts += 1
-                    expiry_date = candidate
-
-                if expiry_date:
-                    days_left = (expiry_date - today).days
-                    status = 'normal'
-                    if 0 <= days_left <= 29:
-                        status = 'urgent'
-                        member_has_urgent = True
-                        total_renewals_count += 1  # Count for whiteboard
-                    elif 30 <= days_left <= 60:
-                        status = 'upcoming'
-                        # only mark upcoming if not already urgent
-                        if not member_has_urgent:
-                            member_has_upcoming = True
-                        total_renewals_count += 1  # Count for whiteboard
-                    vehicle_infos.append({
-                        'plate': plate,
-                        'expiry_date': expiry_date.strftime('%Y-%m-%d'),
-                        'days_left': days_left,
-                        'status': status
-                    })
-                else:
-                    # include vehicle even if no entry so UI shows plate with N/A
-                    vehicle_infos.append({
-                        'plate': plate,
-                        'expiry_date': None,
-                        'days_left': None,
-                        'status': 'none'
-                    })
-
-            # decide member bucket (urgent > upcoming > normal)
-            if member_has_urgent:
-                urgent_count += 1
-                urgent_members.append({'name': member.full_name, 'vehicles': [v for v in vehicle_infos if v['status'] == 'urgent' or v['status']=='upcoming' or v['status']=='normal']})
-            elif member_has_upcoming:
-                upcoming_count += 1
-                warning_members.append({'name': member.full_name, 'vehicles': [v for v in vehicle_infos if v['status'] == 'upcoming' or v['status']=='normal']})
-            # members_preview contains vehicles info for client-side chart fallback
-            if idx < 50:  # keep preview reasonably sized
-                members_preview.append({
-                    'member_name': member.full_name,
-                    'vehicles': vehicle_infos
-                })
-
-        batch_cards.append({
-            'id': batch.id,
-            'number': batch.number,
-            'total': total_count,
-            'urgent': urgent_count,
-            'warning': upcoming_count,
-            'members_preview': members_preview,
-        })
+    sync_renewal_statuses(today)
+
+    # Batch totals with member-level buckets (urgent beats upcoming), one grouped query
+    # Unassigned vehicles are excluded: a NULL in NOT IN (...) would match no member
+    urgent_member_ids = VehicleRenewalStatus.objects.filter(
+        status='urgent', vehicle__member__isnull=False
+    ).values('vehicle__member_id')
+    upcoming_member_ids = VehicleRenewalStatus.objects.filter(
+        status='upcoming', vehicle__member__isnull=False
+    ).values('vehicle__member_id')
+    batch_cards = list(Batch.objects.order_by('pk').annotate(
+        total=Count('members'),
+        urgent=Count('members', filter=Q(members__in=urgent_member_ids)),
+        warning=Count('members', filter=Q(members__in=upcoming_member_ids) & ~Q(members__in=urgent_member_ids)),
+    ).values('id', 'number', 'total', 'urgent', 'warning'))
+    for card in batch_cards:
+        card['preview_url'] = reverse('batch_preview_api', args=[card['id']])
+
+    # Per-day renewal counts for the calendar's opening month; other months
+    # are fetched from renewal_calendar_api as the user navigates.
+    renewal_events = renewal_counts_by_day(*month_bounds(today.year, today.month))
 
     context = {
         'total_members': total_members,
@@ -1901,22 +1754,12 @@ def home(request):
         'batch_count': batch_count,
         'document_count': document_count,
         'batch_cards': batch_cards,
-        'urgent_members': urgent_members,
-        'warning_members': warning_members,
+        'renewal_events_json': json.dumps(renewal_events),
     }
     
     # Add whiteboard data with renewal counts
-    from django.urls import reverse
     try:
-        UserModel = get_user_model()
-        accounts_pending = UserModel.objects.filter(is_active=False, dormant=0).count()
-        documents_pending = DocumentEntry.objects.filter(status__iexact="pending", uploaded_by__isnull=False).count()
-        
-        pending_counts = {
-            'accounts': accounts_pending,
-            'documents': documents_pending,
-            'renewals': total_renewals_count
-        }
+        pending_counts = get_pending_counts(today)
         whiteboard_links = {
             'accounts': reverse('accounts_list'),
             'documents': reverse('approve_documents'),
@@ -1934,6 +1777,32 @@ def home(request):
         context['batch_cards_json'] = '[]'
     return render(request, "home.html", context)
 
+
+BATCH_PREVIEW_SIZE = 50
+
+@login_required
+@user_passes_test(lambda u: u.is_staff)
+def batch_preview_api(request, pk):
+    """
+    Member preview for a home dashboard batch card, fetched when the card is expanded.
+    Returns JSON { id, number, members_preview: [{ member_name, vehicles: [...] }] }.
+    """
+    batch = get_object_or_404(Batch, pk=pk)
+    today = timezone.localtime(timezone.now()).date()
+    sync_renewal_statuses(today)
+
+    members = batch.members.prefetch_related(
+        Prefetch('vehicles', queryset=Vehicle.objects.select_related('renewal_status'))
+    ).order_by('full_name')[:BATCH_PREVIEW_SIZE]
+    members_preview = [
+        {
+            'member_name': member.full_name,
+            'vehicles': [vehicle_renewal_info(vehicle, today) for vehicle in member.vehicles.all()],
+        }
+        for member in members
+    ]
+    return JsonResponse({'id': batch.id, 'number': batch.number, 'members_preview': members_preview})
+
 @staff_member_required
 def broadcast(request):
     """
@@ -2116,55 +1985,16 @@ from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.contrib.admin.views.decorators import staff_member_required
 from .models import DocumentEntry
+from .whiteboard import get_pending_counts
 
 @staff_member_required
 def pending_counts_api(request):
     """
     Returns JSON for whiteboard: counts and links.
     Only accessible to staff members.
+    Counts come from the cache and are invalidated by coop.signals.
     """
-    UserModel = get_user_model()
-    today = timezone.localtime(timezone.now()).date()
-    
-    # pending accounts: client role and not active
-    accounts_pending = UserModel.objects.filter(is_active=False, dormant=0).count()
-
-    # documents pending: entries uploaded by users with status "pending"
-    documents_pending = DocumentEntry.objects.filter(status__iexact="pending", uploaded_by__isnull=False).count()
-
-    # Calculate renewal counts (urgent + upcoming)
-    renewals_count = 0
-    members_query = Member.objects.select_related('user_account', 'batch').prefetch_related(
-        'vehicles__document__entries'
-    ).all()
-    
-    for member in members_query:
-        for vehicle in member.vehicles.all():
-            # Get latest approved document entry
-            latest_entry = DocumentEntry.objects.filter(
-                document__vehicle=vehicle
-            ).filter(
-                Q(status="approved") | Q(uploaded_by__isnull=True)
-            ).order_by('-renewal_date').first()
-            
-            if latest_entry and latest_entry.renewal_date:
-                candidate = latest_entry.renewal_date
-                
-                # Convert to date if datetime
-                if hasattr(candidate, "date"):
-                    candidate = candidate.date()
-                
-                # Normalize expiry date to future
-                attempts = 0
-                while candidate < today and attempts < 5:
-                    candidate = _add_years_safe(candidate, 1)
-                    attempts += 1
-                
-                days_left = (candidate - today).days
-                
-                # Count urgent (0-29 days) and upcoming (30-60 days)
-                if 0 <= days_left <= 60:
-                    renewals_count += 1
+    counts = get_pending_counts()
 
     # resolve links with reverse (safe fallback)
     try:
@@ -2180,11 +2010,6 @@ def pending_counts_api(request):
     except:
         renewals_link = '/renewals/'
 
-    counts = {
-        'accounts': accounts_pending,
-        'documents': documents_pending,
-        'renewals': renewals_count
-    }
     links = {
         'accounts': accounts_link,
         'documents': documents_link,
@@ -2193,10 +2018,35 @@ def pending_counts_api(request):
 
     return JsonResponse({'counts': counts, 'links': links})
 
+@login_required
+@user_passes_test(lambda u: u.is_staff)
+def renewal_calendar_api(request):
+    """
+    Per-day renewal counts for one calendar month.
+    GET params: year, month (1-12); defaults to the current month.
+    Returns JSON { year, month, days: { 'YYYY-MM-DD': { urgent, upcoming, normal } } }.
+    """
+    today = timezone.localtime(timezone.now()).date()
+    try:
+        year = int(request.GET.get('year', today.year))
+        month = int(request.GET.get('month', today.month))
+        start, end = month_bounds(year, month)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid year or month'}, status=400)
+
+    sync_renewal_statuses(today)
+    return JsonResponse({
+        'year': year,
+        'month': month,
+        'days': renewal_counts_by_day(start, end),
+    })
+
 # ==== Batch Views: Member, Vehicle and Renewal Date ==== #
 
 from django.template.loader import render_to_string
 from django.http import JsonResponse
+from django.db.models import Case, When, Value, IntegerField, Exists, OuterRef
+from django.db.models.functions import Lower
 
 @login_required
 @user_passes_test(lambda u: u.is_staff)
@@ -2214,91 +2064,49 @@ def batch_detail(request, pk):
 
     today = timezone.localtime(timezone.now()).date()
 
-    members_qs = batch.members.prefetch_related('vehicles__document__entries').order_by('full_name')
-
-    members_list = []
-    for member in members_qs:
-        vehicle_infos = []
-        member_has_urgent = False
-        member_has_upcoming = False
-
-        for vehicle in member.vehicles.all():
-            plate = getattr(vehicle, 'plate_number', 'N/A')
-            latest_entry = DocumentEntry.objects.filter(
-                document__vehicle=vehicle
-            ).filter(
-                Q(status="approved") | Q(uploaded_by__isnull=True)
-            ).order_by('-renewal_date').first()
-
-            expiry_date = None
-            days_left = None
-            status = 'none'
-            if latest_entry and latest_entry.renewal_date:
-                candidate = latest_entry.renewal_date
-                if hasattr(candidate, "date"):
-                    candidate = candidate.date()
-                attempts = 0
-                while candidate < today and attempts < 5:
-                    candidate = _add_years_safe(candidate, 1)
-                    attempts += 1
-                expiry_date = candidate
-                days_left = (expiry_date - today).days
-                if 0 <= days_left <= 15:
-                    status = 'urgent'
-                    member_has_urgent = True
-                elif 30 <= days_left <= 60:
-                    status = 'upcoming'
-                    if not member_has_urgent:
-                        member_has_upcoming = True
-                else:
-                    status = 'normal'
+    sync_renewal_statuses(today)
 
-            vehicle_infos.append({
-                'plate': plate,
-                'expiry_date': expiry_date.strftime('%Y-%m-%d') if expiry_date else None,
-                'days_left': days_left,
-                'status': status,
-            })
+    # member-level bucket (urgent > upcoming > normal) from the renewal status table
+    def has_vehicle_with_status(status):
+        return Exists(VehicleRenewalStatus.objects.filter(vehicle__member=OuterRef('pk'), status=status))
 
-        # decide member-level bucket (urgent > upcoming > normal)
-        if member_has_urgent:
-            member_status = 'urgent'
-        elif member_has_upcoming:
-            member_status = 'upcoming'
-        else:
-            member_status = 'normal'
-
-        members_list.append({
-            'id': member.id,
-            'name': member.full_name,
-            'vehicles': vehicle_infos,
-            'status': member_status,
-        })
+    members_qs = batch.members.annotate(
+        status_rank=Case(
+            When(has_vehicle_with_status('urgent'), then=Value(0)),
+            When(has_vehicle_with_status('upcoming'), then=Value(1)),
+            default=Value(2),
+            output_field=IntegerField(),
+        )
+    )
 
     # apply q filter (name or plate) and status filter
-    def matches_filters(m):
-        if status_filter and status_filter != m['status']:
-            return False
-        if not q:
-            return True
-        qlow = q.lower()
-        if qlow in (m['name'] or '').lower():
-            return True
-        for v in m['vehicles']:
-            if v['plate'] and qlow in v['plate'].lower():
-                return True
-        return False
-
-    filtered = [m for m in members_list if matches_filters(m)]
-
-    # sort so urgent first, upcoming next, normal last (preserve alphabetical within group)
-    priority = {'urgent': 0, 'upcoming': 1, 'normal': 2, 'none': 3}
-    filtered.sort(key=lambda x: (priority.get(x.get('status'), 3), (x.get('name') or '').lower()))
-
-    # paginate
-    paginator = Paginator(filtered, 10)
+    status_ranks = {'urgent': 0, 'upcoming': 1, 'normal': 2}
+    if status_filter:
+        members_qs = members_qs.filter(status_rank=status_ranks.get(status_filter, -1))
+    if q:
+        members_qs = members_qs.filter(
+            Q(full_name__icontains=q) |
+            Exists(Vehicle.objects.filter(member=OuterRef('pk'), plate_number__icontains=q))
+        )
+
+    # urgent first, upcoming next, normal last (alphabetical within group)
+    members_qs = members_qs.order_by('status_rank', Lower('full_name'), 'pk').prefetch_related(
+        Prefetch('vehicles', queryset=Vehicle.objects.select_related('renewal_status'))
+    )
+
+    # paginate, then build rows for the current page only
+    paginator = Paginator(members_qs, 10)
     page_obj = paginator.get_page(page_number)
-    members_page = list(page_obj.object_list)
+    status_names = {rank: name for name, rank in status_ranks.items()}
+    members_page = [
+        {
+            'id': member.id,
+            'name': member.full_name,
+            'vehicles': [vehicle_renewal_info(vehicle, today) for vehicle in member.vehicles.all()],
+            'status': status_names[member.status_rank],
+        }
+        for member in page_obj.object_list
+    ]
 
     # batches for dropdown
     batches = Batch.objects.order_by('number').values('id', 'number')
@@ -2308,13 +2116,13 @@ def batch_detail(request, pk):
         'members': members_page,
         'page_obj': page_obj,
         'paginator': paginator,
-        'total_members': len(members_list),
+        'total_members': batch.members.count(),
         'q': q,
         'status_filter': status_filter,
         'batches': batches,
         'selected_batch_id': batch.id,
         'is_paginated': page_obj.has_other_pages(),
-        'object_list': page_obj.object_list,
+        'object_list': members_page,
     }
 
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
@@ -2424,6 +2232,10 @@ def payment_year_list(request):
     return render(request, 'payments/year_list.html', context)
 
 from django.db.models import Q
+from django.db import transaction
+from .payments import (
+    build_payment_pivot, balance_figures, member_balances, year_monthly_totals, seed_placeholder_entries,
+)
 
 @login_required
 def from_members_payment_view(request, year_id):
@@ -2456,9 +2268,17 @@ def from_members_payment_view(request, year_id):
     # Combine: from_members first, then car wash types with records
     payment_types = list(from_members_types) + list(carwash_types_with_records)
 
-    # Annotate members with payment data for EACH payment type
+    # Paginate members first so figures are only computed for the visible page
+    paginator = Paginator(members, 7)
+    page_obj = paginator.get_page(page_number)
+    page_members = list(page_obj.object_list)
+
+    # Paid amounts and car wash counts for the page in one grouped query
+    pivot = build_payment_pivot([member.id for member in page_members], payment_types)
+    balances = member_balances([member.id for member in page_members], from_members_types)
+
     members_data = []
-    for member in members:
+    for member in page_members:
         member_record = {
             'id': member.id,
             'full_name': member.full_name,
@@ -2470,69 +2290,25 @@ def from_members_payment_view(request, year_id):
             # Check if this is a car wash type
             if payment_type.is_car_wash:
                 # For car wash: count entries instead of sum amounts
-                total_count = PaymentEntry.objects.filter(
-                    member=member,
-                    payment_type=payment_type,
-                    is_car_wash_record=True
-                ).count()
-                
-                # Get monthly counts
-                monthly_totals = []
-                for month_num in range(1, 13):
-                    month_count = PaymentEntry.objects.filter(
-                        member=member,
-                        payment_type=payment_type,
-                        month=month_num,
-                        is_car_wash_record=True
-                    ).count()
-                    monthly_totals.append(month_count if month_count > 0 else None)
-                
+                monthly_counts = pivot.monthly_counts(member.id, payment_type.id)
                 member_record['payment_types_data'].append({
                     'payment_type': payment_type,
                     'is_car_wash': True,
-                    'total_count': total_count,
-                    'monthly_totals': monthly_totals,
+                    'total_count': sum(monthly_counts),
+                    'monthly_totals': [count if count > 0 else None for count in monthly_counts],
                 })
             else:
-                # Regular payment type: calculate amounts
-                yearly_total = payment_type.amount * 12 if payment_type.amount else 0
-                
-                # Calculate total paid by this member for this payment type
-                total_paid = PaymentEntry.objects.filter(
-                    member=member,
-                    payment_type=payment_type
-                ).aggregate(total=Sum('amount_paid'))['total'] or 0
-                
-                # Calculate balance
-                balance = max(yearly_total - total_paid, 0)
-                
-                # Get monthly breakdown
-                monthly_totals = []
-                for month_num in range(1, 13):
-                    month_total = PaymentEntry.objects.filter(
-                        member=member,
-                        payment_type=payment_type,
-                        month=month_num
-                    ).aggregate(total=Sum('amount_paid'))['total'] or 0
-                    monthly_totals.append(month_total if month_total > 0 else None)
-                
+                # Regular payment type: balance figures from the member balance table
+                monthly_amounts = pivot.monthly_amounts(member.id, payment_type.id)
                 member_record['payment_types_data'].append({
                     'payment_type': payment_type,
                     'is_car_wash': False,
-                    'yearly_total': yearly_total,
-                    'total_paid': total_paid,
-                    'balance': balance,
-                    'percentage_paid': (total_paid / yearly_total * 100) if yearly_total > 0 else 0,
-                    'is_fully_paid': balance == 0,
-                    'monthly_totals': monthly_totals,
-                    'status': 'paid' if balance == 0 else ('partial' if total_paid > 0 else 'unpaid')
+                    'monthly_totals': [amount if amount > 0 else None for amount in monthly_amounts],
+                    **balance_figures(payment_type, balances.get((member.id, payment_type.id))),
                 })
         
         members_data.append(member_record)
-
-    # Pagination
-    paginator = Paginator(members_data, 7)
-    page_obj = paginator.get_page(page_number)
+    page_obj.object_list = members_data
 
     context = {
         'year': year,
@@ -2577,38 +2353,26 @@ def payment_year_detail(request, year_id):
     
     months = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
     
+    # Monthly sums for every type in the year (one grouped query, cached)
+    year_totals = year_monthly_totals(year)
+    
     # Process "From Members" payment types - aggregate all members
-    from_members_data = []
-    for payment_type in from_members_types:
-        monthly_totals = []
-        for month in range(1, 13):  # January to December
-            # Sum amounts for regular payments
-            total = PaymentEntry.objects.filter(
-                payment_type=payment_type,
-                month=month
-            ).aggregate(total=Sum('amount_paid'))['total']
-            monthly_totals.append(total if total is not None else None)
-        
-        from_members_data.append({
+    from_members_data = [
+        {
             'payment_type': payment_type,
-            'monthly_totals': monthly_totals,
-        })
+            'monthly_totals': year_totals.get(payment_type.id, [None] * 12),
+        }
+        for payment_type in from_members_types
+    ]
     
     # Process "Other" payment types - aggregate all entries
-    other_data = []
-    for payment_type in other_types:
-        monthly_totals = []
-        for month in range(1, 13):  # January to December
-            # Sum all payments for this payment type and month
-            total = PaymentEntry.objects.filter(
-                payment_type=payment_type,
-                month=month
-            ).aggregate(total=Sum('amount_paid'))['total']
-            monthly_totals.append(total if total is not None else None)
-        other_data.append({
+    other_data = [
+        {
             'payment_type': payment_type,
-            'monthly_totals': monthly_totals,
-        })
+            'monthly_totals': year_totals.get(payment_type.id, [None] * 12),
+        }
+        for payment_type in other_types
+    ]
 
     # Get recent payment logs for this year
     from .models import PaymentLog
@@ -2630,20 +2394,13 @@ def add_payment_type(request, year_id):
     if request.method == 'POST':
         form = PaymentTypeForm(request.POST)
         if form.is_valid():
-            payment_type = form.save(commit=False)
-            payment_type.year = year
-            payment_type.save()
-
-            if payment_type.payment_type == 'from_members':
-                members = Member.objects.all()
-                for member in members:
-                    for i in range(1, payment_type.frequency + 1):
-                        PaymentEntry.objects.create(
-                            payment_type=payment_type,
-                            member=member,
-                            month=i,  # Use i as the period index (could be month or nth payment)
-                            amount_paid=0.00,  # Default to 0
-                        )
+            with transaction.atomic():
+                payment_type = form.save(commit=False)
+                payment_type.year = year
+                payment_type.save()
+
+                # One period per frequency (month or nth payment); no-op with the sparse ledger
+                seed_placeholder_entries([payment_type], Member.objects.values_list('pk', flat=True))
 
             return redirect('payment_year_detail', year_id=year.id)
 
@@ -2678,24 +2435,26 @@ def add_payment_entry(request, year_id, member_id=None):
                 messages.error(request, "Please select a member for the payment entry.")
                 return render(request, 'payments/add_payment_entry.html', {'form': form, 'year': year, 'member': member})
             payment_entry.recorded_by = request.user
-            payment_entry.save()
+            # Entry, log and balance row (refreshed by the post_save signal) commit together
+            with transaction.atomic():
+                payment_entry.save()
             
-            # Create payment log entry for member payment
-            from .models import PaymentLog
-            payment_log = PaymentLog.objects.create(
-                transaction_id=PaymentLog.generate_transaction_id('from_members'),
-                category='from_members',
-                logged_by=request.user,
-                member=payment_entry.member,
-                payment_type=payment_entry.payment_type,
-                payment_type_name=payment_entry.payment_type.name,
-                amount=payment_entry.amount_paid,
-                payment_year=year.year,
-                payment_month=payment_entry.month,
-                payment_method='cash',  # Default method, can be enhanced later
-                status='confirmed',
-                notes=f'Payment recorded via system for {payment_entry.member.full_name}'
-            )
+                # Create payment log entry for member payment
+                from .models import PaymentLog
+                payment_log = PaymentLog.objects.create(
+                    transaction_id=PaymentLog.generate_transaction_id('from_members'),
+                    category='from_members',
+                    logged_by=request.user,
+                    member=payment_entry.member,
+                    payment_type=payment_entry.payment_type,
+                    payment_type_name=payment_entry.payment_type.name,
+                    amount=payment_entry.amount_paid,
+                    payment_year=year.year,
+                    payment_month=payment_entry.month,
+                    payment_method='cash',  # Default method, can be enhanced later
+                    status='confirmed',
+                    notes=f'Payment recorded via system for {payment_entry.member.full_name}'
+                )
             
             messages.success(request, "Payment entry added successfully.")
             # Redirect to the specific member's payment table
@@ -2720,6 +2479,111 @@ def add_payment_entry(request, year_id, member_id=None):
     return render(request, 'payments/add_payment_entry.html', {'form': form, 'year': year, 'member': member})
 
 
+from .forms import PaymentBatchForm
+from .payments import post_payment_batch
+
+MONTH_LABELS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+
+def _batch_payment_types(year):
+    return PaymentType.objects.filter(year=year, payment_type='from_members', is_car_wash=False).order_by('name')
+
+
+@login_required
+def add_payment_batch(request, year_id, member_id):
+    """
+    Record several months of several "From Members" payment types for a
+    member in one submission.
+    """
+    year = get_object_or_404(PaymentYear, pk=year_id)
+    member = get_object_or_404(Member, pk=member_id)
+    payment_types = _batch_payment_types(year)
+
+    if request.method == 'POST':
+        form = PaymentBatchForm(request.POST, payment_types=payment_types)
+        if form.is_valid():
+            logs = post_payment_batch(
+                member, year, form.lines(),
+                recorded_by=request.user,
+                payment_method=form.cleaned_data['payment_method'],
+            )
+            messages.success(
+                request,
+                f"{len(logs)} payment entries recorded ({logs[0].transaction_id} to {logs[-1].transaction_id})."
+            )
+            return redirect('member_payment_list', year_id=year.id, member_id=member.id)
+        messages.error(request, "There was an error recording the payments.")
+    else:
+        form = PaymentBatchForm(payment_types=payment_types)
+
+    return render(request, 'payments/add_payment_batch.html', {
+        'form': form,
+        'year': year,
+        'member': member,
+        'months': MONTH_LABELS,
+    })
+
+
+@login_required
+@require_POST
+def payment_batch_api(request, year_id):
+    """
+    Post several payments for one member from JSON:
+    {"member_id": 1, "payment_method": "cash",
+     "lines": [{"payment_type": 3, "month": 1, "amount": "200.00"}, ...]}
+
+    All lines are validated together and nothing is written unless every
+    line is valid.
+    """
+    year = get_object_or_404(PaymentYear, pk=year_id)
+    try:
+        payload = json.loads(request.body)
+        member = Member.objects.get(pk=payload['member_id'])
+        lines = list(payload['lines'])
+    except (ValueError, KeyError, TypeError, Member.DoesNotExist):
+        return JsonResponse({'success': False, 'error': 'Expected a member_id and a list of lines.'}, status=400)
+
+    payment_types = _batch_payment_types(year)
+    type_ids = {payment_type.pk for payment_type in payment_types}
+    data = {'payment_method': payload.get('payment_method', 'cash')}
+    line_errors = []
+    for index, line in enumerate(lines, start=1):
+        try:
+            payment_type_id, month, amount = int(line['payment_type']), int(line['month']), line['amount']
+        except (KeyError, TypeError, ValueError):
+            line_errors.append(f'Line {index}: payment_type, month and amount are required.')
+            continue
+        field = PaymentBatchForm.amount_field(payment_type_id, month)
+        if payment_type_id not in type_ids:
+            line_errors.append(f'Line {index}: unknown payment type for {year.year}.')
+        elif not 1 <= month <= 12:
+            line_errors.append(f'Line {index}: month must be between 1 and 12.')
+        elif field in data:
+            line_errors.append(f'Line {index}: duplicate payment type and month.')
+        elif amount in (None, ''):
+            line_errors.append(f'Line {index}: amount is required.')
+        else:
+            data[field] = amount
+    if line_errors:
+        return JsonResponse({'success': False, 'errors': line_errors}, status=400)
+
+    form = PaymentBatchForm(data, payment_types=payment_types)
+    if not form.is_valid():
+        return JsonResponse({'success': False, 'errors': form.errors.get_json_data()}, status=400)
+
+    logs = post_payment_batch(
+        member, year, form.lines(),
+        recorded_by=request.user,
+        payment_method=form.cleaned_data['payment_method'],
+    )
+    return JsonResponse({
+        'success': True,
+        'count': len(logs),
+        'total': str(sum(log.amount for log in logs)),
+        'transaction_ids': [log.transaction_id for log in logs],
+    })
+
+
 @login_required
 def add_other_payment_entry(request, year_id):
     """
@@ -2734,28 +2598,30 @@ def add_other_payment_entry(request, year_id):
         if form.is_valid():
             payment_entry = form.save(commit=False)
             payment_entry.recorded_by = request.user
-            payment_entry.save()
+            # Entry, log and balance row (refreshed by the post_save signal) commit together
+            with transaction.atomic():
+                payment_entry.save()
             
-            # Create payment log entry for other payment
-            from .models import PaymentLog
-            # Determine payee name (could be member or someone else)
-            payee_name = payment_entry.member.full_name if payment_entry.member else "Other Payee"
+                # Create payment log entry for other payment
+                from .models import PaymentLog
+                # Determine payee name (could be member or someone else)
+                payee_name = payment_entry.member.full_name if payment_entry.member else "Other Payee"
             
-            payment_log = PaymentLog.objects.create(
-                transaction_id=PaymentLog.generate_transaction_id('other'),
-                category='other',
-                logged_by=request.user,
-                member=payment_entry.member if payment_entry.member else None,
-                payee_name=payee_name,
-                payment_type=payment_entry.payment_type,
-                payment_type_name=payment_entry.payment_type.name,
-                amount=payment_entry.amount_paid,
-                payment_year=year.year,
-                payment_month=payment_entry.month if payment_entry.month else None,
-                payment_method='cash',  # Default method
-                status='confirmed',
-                notes=f'Other payment recorded via system'
-            )
+                payment_log = PaymentLog.objects.create(
+                    transaction_id=PaymentLog.generate_transaction_id('other'),
+                    category='other',
+                    logged_by=request.user,
+                    member=payment_entry.member if payment_entry.member else None,
+                    payee_name=payee_name,
+                    payment_type=payment_entry.payment_type,
+                    payment_type_name=payment_entry.payment_type.name,
+                    amount=payment_entry.amount_paid,
+                    payment_year=year.year,
+                    payment_month=payment_entry.month if payment_entry.month else None,
+                    payment_method='cash',  # Default method
+                    status='confirmed',
+                    notes=f'Other payment recorded via system'
+                )
             
             messages.success(request, "Other payment entry added successfully.")
             return redirect('other_payments_view', year_id=year.id)
@@ -2787,112 +2653,69 @@ def add_payment_year(request):
         form = PaymentYearForm()
     return render(request, 'payments/add_payment_year.html', {'form': form})
 
-from .models import PaymentYear, PaymentType, PaymentEntry, Member
+from .models import PaymentYear, PaymentType, PaymentEntry, Member, MemberYearBalance
 from .forms import PaymentEntryForm
 
+BALANCE_STATUS_LABELS = dict(MemberYearBalance.STATUS_CHOICES)
+
 @login_required
 def member_payment_list(request, year_id, member_id):
     year = get_object_or_404(PaymentYear, pk=year_id)
     member = get_object_or_404(Member, pk=member_id)
     
-    # Get "from_members" payment types with balance calculations
-    from_members_types = PaymentType.objects.filter(
-        year=year, 
-        payment_type='from_members'
-    ).order_by('name')
+    # All of the member's entries for the year in one query
+    ledger = MemberLedger(member, year)
+    balances = member_balances([member.id], ledger.from_members_types)
+    month_labels = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
     
     from_members_data = []
-    for payment_type in from_members_types:
+    for payment_type in ledger.from_members_types:
         # Check if this is a car wash type
         if payment_type.is_car_wash:
-            # Get all car wash entries for this member/type
-            entries = PaymentEntry.objects.filter(
-                payment_type=payment_type,
-                member=member,
-                is_car_wash_record=True
-            ).order_by('month')
-            
-            # Count total car wash records
-            total_count = entries.count()
-            
-            # Build monthly breakdown with counts
+            # Build monthly breakdown with car wash counts
             monthly_breakdown = []
             for month_num in range(1, 13):
-                month_entries = entries.filter(month=month_num)
-                month_count = month_entries.count()
-                
+                month_entries = ledger.entries(payment_type, month_num, car_wash_only=True)
                 monthly_breakdown.append({
                     'month_num': month_num,
-                    'month_name': ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'][month_num - 1],
-                    'entries': list(month_entries.select_related('recorded_by')),
-                    'total': month_count
+                    'month_name': month_labels[month_num - 1],
+                    'entries': month_entries,
+                    'total': len(month_entries)
                 })
             
             from_members_data.append({
                 'payment_type': payment_type,
                 'is_car_wash': True,
-                'total_count': total_count,
+                'total_count': sum(month['total'] for month in monthly_breakdown),
                 'monthly_breakdown': monthly_breakdown
             })
         else:
-            # Regular payment type
-            yearly_total = payment_type.amount * 12 if payment_type.amount else 0
-            
-            # Get all entries for this member/type
-            entries = PaymentEntry.objects.filter(
-                payment_type=payment_type,
-                member=member
-            ).order_by('month')
-            
-            # Calculate totals
-            total_paid = entries.aggregate(total=Sum('amount_paid'))['total'] or 0
-            balance = max(yearly_total - total_paid, 0)
+            # Regular payment type: balance figures from the member balance table
+            figures = balance_figures(payment_type, balances.get((member.id, payment_type.id)))
             
             # Build monthly breakdown with entry details
             monthly_breakdown = []
-            for month_num in range(1, 13):
-                month_entries = entries.filter(month=month_num)
-                month_total = month_entries.aggregate(total=Sum('amount_paid'))['total'] or 0
-                
+            for month_num, month_total in enumerate(ledger.monthly_totals(payment_type), start=1):
                 monthly_breakdown.append({
                     'month_num': month_num,
-                    'month_name': ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'][month_num - 1],
-                    'entries': list(month_entries.select_related('recorded_by')),
-                    'total': month_total
+                    'month_name': month_labels[month_num - 1],
+                    'entries': ledger.entries(payment_type, month_num),
+                    'total': month_total or 0
                 })
             
             from_members_data.append({
                 'payment_type': payment_type,
                 'is_car_wash': False,
-                'yearly_total': yearly_total,
-                'total_paid': total_paid,
-                'balance': balance,
-                'percentage_paid': (total_paid / yearly_total * 100) if yearly_total > 0 else 0,
-                'is_fully_paid': balance == 0,
-                'status': 'Fully Paid' if balance == 0 else ('Partially Paid' if total_paid > 0 else 'Not Paid'),
+                **figures,
+                'status': BALANCE_STATUS_LABELS[figures['status']],
                 'monthly_breakdown': monthly_breakdown
             })
     
-    # Other payment types (unchanged logic)
-    other_types = PaymentType.objects.filter(
-        year=year, 
-        payment_type='other'
-    ).order_by('name')
-    
-    other_data = []
-    for payment_type in other_types:
-        monthly_totals = []
-        for month in range(1, 13):
-            entries = member.payment_entries.filter(
-                payment_type=payment_type,
-                month=month
-            )
-            total = entries.aggregate(total=Sum('amount_paid'))['total']
-            monthly_totals.append(total if total is not None else None)
-        other_data.append({
-            'payment_type': payment_type,
-            'monthly_totals': monthly_totals,
-        })
+    # Other payment types
+    other_data = [
+        {'payment_type': payment_type, 'monthly_totals': ledger.monthly_totals(payment_type)}
+        for payment_type in ledger.other_types
+    ]
 
     context = {
         'year': year,
@@ -2906,6 +2729,9 @@ def member_payment_list(request, year_id, member_id):
 
 # ==== Renewal Details View ====
 from datetime import datetime as dt
+from .models import VehicleRenewalStatus
+from .renewals import STATUS_CLASSES
+from .reminders import send_renewal_reminder_email as _send_renewal_reminder_email
 
 @staff_member_required
 def renewal_details(request, date):
@@ -2928,67 +2754,38 @@ def renewal_details(request, date):
     upcoming_renewals = []
     normal_renewals = []
     
-    # Get all members with their vehicles and documents
-    members = Member.objects.select_related('user_account', 'batch').prefetch_related(
-        'vehicles__document__entries'
-    ).all().order_by('full_name')
-    
-    for member in members:
-        for vehicle in member.vehicles.all():
-            plate = getattr(vehicle, 'plate_number', 'N/A')
-            
-            # Get latest approved document entry
-            latest_entry = DocumentEntry.objects.filter(
-                document__vehicle=vehicle
-            ).filter(
-                Q(status="approved") | Q(uploaded_by__isnull=True)
-            ).order_by('-renewal_date').first()
-            
-            if latest_entry and latest_entry.renewal_date:
-                candidate = latest_entry.renewal_date
-                
-                # Convert to date if datetime
-                if hasattr(candidate, "date"):
-                    candidate = candidate.date()
-                
-                # Normalize expiry date to future
-                attempts = 0
-                while candidate < today and attempts < 5:
-                    candidate = _add_years_safe(candidate, 1)
-                    attempts += 1
-                
-                # Check if this renewal matches our target date
-                if candidate == target_date:
-                    days_left = (candidate - today).days
-                    
-                    # Determine status
-                    status = 'normal'
-                    status_class = 'secondary'
-                    if 0 <= days_left <= 29:
-                        status = 'urgent'
-                        status_class = 'danger'
-                    elif 30 <= days_left <= 60:
-                        status = 'upcoming'
-                        status_class = 'warning'
-                    
-                    renewal_info = {
-                        'member': member,
-                        'vehicle': vehicle,
-                        'plate': plate,
-                        'expiry_date': candidate,
-                        'days_left': days_left,
-                        'status': status,
-                        'status_class': status_class,
-                        'document_entry': latest_entry,
-                    }
-                    
-                    # Categorize by status
-                    if status == 'urgent':
-                        urgent_renewals.append(renewal_info)
-                    elif status == 'upcoming':
-                        upcoming_renewals.append(renewal_info)
-                    else:
-                        normal_renewals.append(renewal_info)
+    # Only the vehicles whose next expiry falls on the requested date
+    sync_renewal_statuses(today)
+    renewal_rows = VehicleRenewalStatus.objects.filter(
+        next_expiry=target_date,
+        vehicle__member__isnull=False,
+    ).select_related(
+        'vehicle__member__user_account', 'vehicle__member__batch', 'latest_entry'
+    ).order_by('vehicle__member__full_name')
+
+    for row in renewal_rows:
+        vehicle = row.vehicle
+        days_left = (row.next_expiry - today).days
+        status = row.status if row.status in ('urgent', 'upcoming') else 'normal'
+
+        renewal_info = {
+            'member': vehicle.member,
+            'vehicle': vehicle,
+            'plate': getattr(vehicle, 'plate_number', 'N/A'),
+            'expiry_date': row.next_expiry,
+            'days_left': days_left,
+            'status': status,
+            'status_class': STATUS_CLASSES[status],
+            'document_entry': row.latest_entry,
+        }
+
+        # Categorize by status
+        if status == 'urgent':
+            urgent_renewals.append(renewal_info)
+        elif status == 'upcoming':
+            upcoming_renewals.append(renewal_info)
+        else:
+            normal_renewals.append(renewal_info)
     
     # Count totals
     total_renewals = len(urgent_renewals) + len(upcoming_renewals) + len(normal_renewals)
@@ -3010,76 +2807,44 @@ def send_renewal_reminder_email(member, vehicle, document_entry, request):
     Send renewal reminder email to member with vehicle details.
     Returns (success: bool, message: str) tuple.
     """
-    # Check if member has email
-    if not member.user_account or not member.user_account.email:
-        return False, "No email address found for member"
-    
-    email = member.user_account.email
-    
-    # Calculate days left
-    today = timezone.localtime(timezone.now()).date()
-    expiry_date = document_entry.renewal_date
-    days_left = (expiry_date - today).days
-    
-    # Determine urgency
-    is_urgent = days_left <= 29
-    
-    # Build portal URL
     portal_url = request.build_absolute_uri('/user-documents/')
-    
-    # Email context
-    context = {
-        'member_name': member.full_name,
-        'plate_number': vehicle.plate_number,
-        'document_type': 'Vehicle Registration',  # Default document type
-        'expiry_date': expiry_date.strftime('%B %d, %Y'),
-        'days_left': days_left,
-        'is_urgent': is_urgent,
-        'batch_number': member.batch.number if member.batch else 'N/A',
-        'portal_url': portal_url,
-    }
-    
-    # Render email templates
-    try:
-        html_content = render_to_string('emails/renewal_reminder.html', context)
-        text_content = render_to_string('emails/renewal_reminder.txt', context)
-    except Exception as e:
-        return False, f"Failed to render email template: {str(e)}"
-    
-    # Email subject
-    if days_left <= 0:
-        subject = f'⚠️ URGENT: Vehicle {vehicle.plate_number} Registration EXPIRED'
-    elif days_left <= 7:
-        subject = f'⚠️ URGENT: Vehicle {vehicle.plate_number} Expires in {days_left} Days'
-    elif days_left <= 29:
-        subject = f'⚠️ Reminder: Vehicle {vehicle.plate_number} Registration Expires Soon'
-    else:
-        subject = f'Reminder: Vehicle {vehicle.plate_number} Registration Due for Renewal'
-    
-    try:
-        # Create email with both HTML and plain text
-        email_message = EmailMultiAlternatives(
-            subject=subject,
-            body=text_content,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=[email],
-        )
-        email_message.attach_alternative(html_content, "text/html")
-        email_message.send(fail_silently=False)
-        
-        return True, f"Email sent successfully to {email}"
-    except Exception as e:
-        return False, f"Failed to send email: {str(e)}"
+    return _send_renewal_reminder_email(member, vehicle, document_entry, portal_url)
 
 
 # ===== RENEWALS HUB =====
-from .models import Member, Vehicle, Document, DocumentEntry, Batch
+from django.db.models import Subquery
+from .models import (
+    Member, Vehicle, Document, DocumentEntry, Batch, VehicleRenewalStatus,
+    RenewalReminderCampaign, RenewalReminderLog,
+)
+from .renewals import sync_renewal_statuses, expiry_window, RENEWAL_THRESHOLDS, STATUS_CLASSES
+from .reminders import create_campaign, campaign_progress, record_reminder, reminded_since, REMINDER_DEDUP_WINDOW
+
+RENEWALS_HUB_PAGE_SIZE = 50
+RECENT_CAMPAIGNS_SHOWN = 5
+
+
+def _renewal_cursor(row):
+    return f"{row.next_expiry.isoformat()}_{row.id}"
+
+
+def _parse_renewal_cursor(value):
+    """Parse an 'after'/'before' cursor of the form YYYY-MM-DD_<id>."""
+    if not value:
+        return None
+    try:
+        expiry, row_id = value.split('_', 1)
+        return dt.strptime(expiry, '%Y-%m-%d').date(), int(row_id)
+    except ValueError:
+        return None
+
 
 @staff_member_required
 def renewals_hub(request):
     """
     Central Renewals Hub - Main landing page for renewal management.
     Shows overview cards, filters, and comprehensive table of all renewals.
+    Filtering, sorting and keyset pagination (?after= / ?before=) run in the database.
     """
     today = timezone.localtime(timezone.now()).date()
     
@@ -3104,159 +2869,142 @@ def renewals_hub(request):
     elif filter_type == 'next_60':
         start_date = today
         end_date = today + timedelta(days=60)
-    elif filter_type == 'urgent':
-        start_date = today
-        end_date = today + timedelta(days=29)
-    elif filter_type == 'upcoming':
-        start_date = today + timedelta(days=30)
-        end_date = today + timedelta(days=60)
+    elif filter_type in RENEWAL_THRESHOLDS:
+        start_date, end_date = expiry_window(filter_type, today)
     elif filter_type == 'overdue':
         start_date = today - timedelta(days=365)
         end_date = today - timedelta(days=1)
     
-    # Get all members with their vehicles and documents
-    members_query = Member.objects.select_related('user_account', 'batch').prefetch_related(
-        'vehicles__document__entries'
-    ).all()
+    # Everything below runs against the renewal status table (indexed next_expiry)
+    sync_renewal_statuses(today)
+    renewal_rows = VehicleRenewalStatus.objects.filter(
+        vehicle__member__isnull=False,
+        next_expiry__isnull=False,
+    )
     
     # Apply batch filter
     if batch_filter:
-        members_query = members_query.filter(batch_id=batch_filter)
+        renewal_rows = renewal_rows.filter(vehicle__member__batch_id=batch_filter)
     
-    # Apply search filter
+    # Apply search filter (a matching member shows all of their vehicles)
     if search_query:
-        members_query = members_query.filter(
+        matching_members = Member.objects.filter(
             Q(full_name__icontains=search_query) |
             Q(vehicles__plate_number__icontains=search_query) |
             Q(vehicles__document__mv_file_no__icontains=search_query)
-        ).distinct()
+        ).values('id')
+        renewal_rows = renewal_rows.filter(vehicle__member__in=matching_members)
+    
+    # Overview card counts in one conditional-aggregation query
+    counts = renewal_rows.aggregate(
+        urgent_count=Count('id', filter=Q(status='urgent')),
+        upcoming_count=Count('id', filter=Q(status='upcoming')),
+        overdue_count=Count('id', filter=Q(status='overdue')),
+        this_month_count=Count('id', filter=Q(next_expiry__range=(today, today + timedelta(days=30)))),
+    )
+    
+    # Apply status and date range filters
+    if status_filter:
+        renewal_rows = renewal_rows.filter(status=status_filter)
+    if start_date and end_date:
+        renewal_rows = renewal_rows.filter(next_expiry__range=(start_date, end_date))
+    total_results = renewal_rows.count()
+    
+    # Keyset pagination on (next_expiry, id): days left ascending
+    after = _parse_renewal_cursor(request.GET.get('after'))
+    before = _parse_renewal_cursor(request.GET.get('before'))
+    if before:
+        page_rows = renewal_rows.filter(
+            Q(next_expiry__lt=before[0]) | Q(next_expiry=before[0], id__lt=before[1])
+        ).order_by('-next_expiry', '-id')
+    else:
+        if after:
+            renewal_rows = renewal_rows.filter(
+                Q(next_expiry__gt=after[0]) | Q(next_expiry=after[0], id__gt=after[1])
+            )
+        page_rows = renewal_rows.order_by('next_expiry', 'id')
+    reminder_cutoff = timezone.now() - REMINDER_DEDUP_WINDOW
+    page_rows = list(page_rows.select_related(
+        'vehicle__member__user_account', 'vehicle__member__batch', 'vehicle__document', 'latest_entry'
+    ).annotate(
+        # Latest reminder inside the dedup window, via the (vehicle, sent_at) index
+        last_reminder_at=Subquery(
+            reminded_since(reminder_cutoff).order_by('-sent_at').values('sent_at')[:1]
+        )
+    )[:RENEWALS_HUB_PAGE_SIZE + 1])
+    has_more = len(page_rows) > RENEWALS_HUB_PAGE_SIZE
+    page_rows = page_rows[:RENEWALS_HUB_PAGE_SIZE]
+    if before:
+        page_rows.reverse()
+    has_next = has_more if not before else True
+    has_previous = bool(after) or (has_more if before else False)
     
-    # Collect all renewals
     all_renewals = []
-    urgent_count = 0
-    upcoming_count = 0
-    this_month_count = 0
-    overdue_count = 0
-    
-    for member in members_query:
-        for vehicle in member.vehicles.all():
-            # Get latest approved document entry
-            latest_entry = DocumentEntry.objects.filter(
-                document__vehicle=vehicle
-            ).filter(
-                Q(status="approved") | Q(uploaded_by__isnull=True)
-            ).order_by('-renewal_date').first()
-            
-            if latest_entry and latest_entry.renewal_date:
-                candidate = latest_entry.renewal_date
-                
-                # Convert to date if datetime
-                if hasattr(candidate, "date"):
-                    candidate = candidate.date()
-                
-                # Normalize expiry date to future
-                attempts = 0
-                while candidate < today and attempts < 5:
-                    candidate = _add_years_safe(candidate, 1)
-                    attempts += 1
-                
-                days_left = (candidate - today).days
-                
-                # Determine status
-                status = 'normal'
-                status_class = 'secondary'
-                if days_left < 0:
-                    status = 'overdue'
-                    status_class = 'dark'
-                    overdue_count += 1
-                elif 0 <= days_left <= 29:
-                    status = 'urgent'
-                    status_class = 'danger'
-                    urgent_count += 1
-                elif 30 <= days_left <= 60:
-                    status = 'upcoming'
-                    status_class = 'warning'
-                    upcoming_count += 1
-                
-                # Count this month
-                if 0 <= days_left <= 30:
-                    this_month_count += 1
-                
-                # Apply status filter
-                if status_filter and status != status_filter:
-                    continue
-                
-                # Apply date range filter
-                if start_date and end_date:
-                    if not (start_date <= candidate <= end_date):
-                        continue
-                
-                renewal_info = {
-                    'id': latest_entry.id,
-                    'member': member,
-                    'vehicle': vehicle,
-                    'plate': vehicle.plate_number,
-                    'mv_file_no': getattr(vehicle.document, 'mv_file_no', 'N/A') if hasattr(vehicle, 'document') else 'N/A',
-                    'expiry_date': candidate,
-                    'days_left': days_left,
-                    'days_until_overdue': abs(days_left) if days_left < 0 else 0,
-                    'status': status,
-                    'status_class': status_class,
-                    'document_entry': latest_entry,
-                    'email_sent': False,  # Placeholder for email tracking
-                    'email_sent_date': None,  # Placeholder for date tracking
-                }
-                
-                all_renewals.append(renewal_info)
+    for row in page_rows:
+        vehicle = row.vehicle
+        days_left = (row.next_expiry - today).days
+        all_renewals.append({
+            'id': row.latest_entry_id,
+            'member': vehicle.member,
+            'vehicle': vehicle,
+            'plate': vehicle.plate_number,
+            'mv_file_no': getattr(vehicle.document, 'mv_file_no', 'N/A') if hasattr(vehicle, 'document') else 'N/A',
+            'expiry_date': row.next_expiry,
+            'days_left': days_left,
+            'days_until_overdue': abs(days_left) if days_left < 0 else 0,
+            'status': row.status,
+            'status_class': STATUS_CLASSES[row.status],
+            'document_entry': row.latest_entry,
+            'email_sent': row.last_reminder_at is not None,
+            'email_sent_date': timezone.localtime(row.last_reminder_at).date() if row.last_reminder_at else None,
+        })
     
-    # Sort by days left (ascending)
-    all_renewals.sort(key=lambda x: x['days_left'])
+    # Links to the neighbouring pages keep the current filters
+    next_page_url = previous_page_url = None
+    if page_rows and has_next:
+        params = request.GET.copy()
+        params.pop('before', None)
+        params['after'] = _renewal_cursor(page_rows[-1])
+        next_page_url = f"?{params.urlencode()}"
+    if page_rows and has_previous:
+        params = request.GET.copy()
+        params.pop('after', None)
+        params['before'] = _renewal_cursor(page_rows[0])
+        previous_page_url = f"?{params.urlencode()}"
     
     # Get all batches for filter dropdown
     batches = Batch.objects.all().order_by('number')
     
-    # Get recently sent email reminders from session (last 24 hours)
-    recently_sent = request.session.get('renewal_emails_sent', {})
-    current_time = timezone.now().timestamp()
-    
-    # Clean up old entries (older than 24 hours)
-    recently_sent = {k: v for k, v in recently_sent.items() 
-                     if current_time - v['timestamp'] < 86400}
-    request.session['renewal_emails_sent'] = recently_sent
-    
-    # Mark renewals that have had emails sent
-    for renewal in all_renewals:
-        key = f"{renewal['member'].id}_{renewal['vehicle'].id}"
-        if key in recently_sent:
-            renewal['email_sent'] = True
-            renewal['email_sent_date'] = timezone.datetime.fromtimestamp(
-                recently_sent[key]['timestamp']
-            ).date()
-    
-    # Prepare email logs for display (last 24 hours)
-    recently_sent_emails = []
-    for key, data in recently_sent.items():
-        sent_datetime = timezone.datetime.fromtimestamp(data['timestamp'])
-        recently_sent_emails.append({
-            'member_name': data.get('member', 'Unknown'),
-            'plate_number': data.get('plate', 'N/A'),
-            'sent_at': sent_datetime,
-            'sent_by': request.user.username
-        })
+    # Reminders sent by any staff member in the last 24 hours
+    recently_sent_emails = [
+        {
+            'member_name': log.member.full_name,
+            'plate_number': log.vehicle.plate_number,
+            'sent_at': log.sent_at,
+            'sent_by': log.sent_by.username if log.sent_by else 'System',
+        }
+        for log in RenewalReminderLog.objects.filter(
+            sent_at__gte=reminder_cutoff
+        ).select_related('member', 'vehicle', 'sent_by').order_by('-sent_at')
+    ]
     
-    # Sort by most recent first
-    recently_sent_emails.sort(key=lambda x: x['sent_at'], reverse=True)
+    # Latest bulk reminder campaigns; unfinished ones are polled for progress
+    reminder_campaigns = RenewalReminderCampaign.objects.select_related('batch').order_by('-created_at')[:RECENT_CAMPAIGNS_SHOWN]
     
     context = {
         'renewals': all_renewals,
-        'urgent_count': urgent_count,
-        'upcoming_count': upcoming_count,
-        'this_month_count': this_month_count,
-        'overdue_count': overdue_count,
+        'urgent_count': counts['urgent_count'],
+        'upcoming_count': counts['upcoming_count'],
+        'this_month_count': counts['this_month_count'],
+        'overdue_count': counts['overdue_count'],
+        'total_results': total_results,
+        'next_page_url': next_page_url,
+        'previous_page_url': previous_page_url,
         'batches': batches,
         'filter_type': filter_type,
         'today': today,
         'recently_sent_emails': recently_sent_emails,
+        'reminder_campaigns': reminder_campaigns,
     }
     
     return render(request, 'renewals/renewal_list.html', context)
@@ -3266,106 +3014,39 @@ def renewals_hub(request):
 @require_POST
 def send_bulk_renewal_reminders(request):
     """
-    Send renewal reminders in bulk based on filter criteria.
+    Queue renewal reminders in bulk based on filter criteria.
     Supports: batch, this_week, this_month, next_60, all
+    The emails are sent by the process_reminder_campaigns command; the hub
+    polls renewal_campaign_progress for status.
     """
     filter_type = request.POST.get('filter_type', 'all')
     batch_id = request.POST.get('batch_id', '')
     
-    today = timezone.localtime(timezone.now()).date()
-    
-    # Calculate date ranges based on filter
-    start_date = None
-    end_date = None
-    
-    if filter_type == 'this_week':
-        start_date = today
-        end_date = today + timedelta(days=7)
-    elif filter_type == 'this_month':
-        start_date = today
-        end_date = today + timedelta(days=30)
-    elif filter_type == 'next_60':
-        start_date = today
-        end_date = today + timedelta(days=60)
-    elif filter_type == 'all':
-        start_date = today
-        end_date = today + timedelta(days=365)
-    
-    # Get members based on filters
-    members_query = Member.objects.select_related('user_account', 'batch').prefetch_related(
-        'vehicles__document__entries'
-    ).all()
-    
-    # Apply batch filter
-    if batch_id:
-        members_query = members_query.filter(batch_id=batch_id)
-    
-    # Collect renewals to send
-    reminders_sent = 0
-    reminders_failed = 0
-    
-    # Initialize session tracking
-    if 'renewal_emails_sent' not in request.session:
-        request.session['renewal_emails_sent'] = {}
-    
-    for member in members_query:
-        for vehicle in member.vehicles.all():
-            # Get latest approved document entry
-            latest_entry = DocumentEntry.objects.filter(
-                document__vehicle=vehicle
-            ).filter(
-                Q(status="approved") | Q(uploaded_by__isnull=True)
-            ).order_by('-renewal_date').first()
-            
-            if latest_entry and latest_entry.renewal_date:
-                candidate = latest_entry.renewal_date
-                
-                # Convert to date if datetime
-                if hasattr(candidate, "date"):
-                    candidate = candidate.date()
-                
-                # Normalize expiry date to future
-                attempts = 0
-                while candidate < today and attempts < 5:
-                    candidate = _add_years_safe(candidate, 1)
-                    attempts += 1
-                
-                # Apply date range filter
-                if start_date and end_date:
-                    if start_date <= candidate <= end_date:
-                        # Send reminder
-                        try:
-                            success, message = send_renewal_reminder_email(member, vehicle, latest_entry, request)
-                            if success:
-                                reminders_sent += 1
-                                # Track in session
-                                key = f"{member.id}_{vehicle.id}"
-                                request.session['renewal_emails_sent'][key] = {
-                                    'timestamp': timezone.now().timestamp(),
-                                    'member': member.full_name,
-                                    'plate': vehicle.plate_number
-                                }
-                            else:
-                                reminders_failed += 1
-                        except Exception as e:
-                            reminders_failed += 1
-    
-    # Save session
-    request.session.modified = True
+    campaign = create_campaign(
+        filter_type,
+        batch_id=batch_id or None,
+        portal_url=request.build_absolute_uri('/user-documents/'),
+        created_by=request.user,
+    )
     
     # Display summary message
-    if reminders_sent > 0:
-        messages.success(request, f"✅ Successfully sent {reminders_sent} renewal reminder(s)!")
-    
-    if reminders_failed > 0:
-        messages.warning(request, f"⚠️ Failed to send {reminders_failed} reminder(s).")
-    
-    if reminders_sent == 0 and reminders_failed == 0:
+    if campaign is None or campaign.total_count == 0:
         messages.info(request, "No renewals found matching the selected criteria.")
+    else:
+        messages.success(request, f"✅ Queued {campaign.total_count} renewal reminder(s). Progress is shown below.")
     
     return redirect('renewals_hub')
 
 
+@staff_member_required
+def renewal_campaign_progress(request, pk):
+    """
+    JSON progress for a bulk reminder campaign, polled by the renewals hub.
+    """
+    campaign = get_object_or_404(RenewalReminderCampaign, pk=pk)
+    return JsonResponse(campaign_progress(campaign))
+
+
 @staff_member_required
 @require_POST
 def send_renewal_reminder(request, member_id, vehicle_id):
@@ -3378,9 +3059,7 @@ def send_renewal_reminder(request, member_id, vehicle_id):
     # Get the vehicle's document and latest entry
     try:
         document = vehicle.document
-        latest_entry = document.entries.filter(
-            models.Q(uploaded_by__isnull=True) | models.Q(status="approved")
-        ).order_by('-renewal_date').first()
+        latest_entry = DocumentEntry.objects.latest_approved([vehicle]).first()
         
         if not latest_entry:
             messages.error(request, f"No approved document entry found for vehicle {vehicle.plate_number}")
@@ -3395,17 +3074,8 @@ def send_renewal_reminder(request, member_id, vehicle_id):
         if success:
             messages.success(request, f"✅ {message}")
             
-            # Track sent email in session
-            if 'renewal_emails_sent' not in request.session:
-                request.session['renewal_emails_sent'] = {}
-            
-            key = f"{member.id}_{vehicle.id}"
-            request.session['renewal_emails_sent'][key] = {
-                'timestamp': timezone.now().timestamp(),
-                'member': member.full_name,
-                'plate': vehicle.plate_number
-            }
-            request.session.modified = True
+            # Record in the shared reminder log
+            record_reminder(member, vehicle, sent_by=request.user)
             
             # Create in-app notification
             from .notifications import create_notification
@@ -3453,10 +3123,7 @@ def mark_as_renewed(request, member_id, vehicle_id):
     vehicle = get_object_or_404(Vehicle, pk=vehicle_id)
     
     # Get or create document for this vehicle
-    document, created = Document.objects.get_or_create(
-        vehicle=vehicle,
-        defaults={'document_type': 'Registration'}
-    )
+    document, created = Document.objects.get_or_create(vehicle=vehicle)
     
     # Create new renewal entry
     new_renewal_date = timezone.now().date()
@@ -3903,26 +3570,18 @@ def export_member_pdf(request, year_id, member_id):
     elements.append(Spacer(1, 0.2*inch))
     
     # ===== PAYMENT TABLE =====
-    # Get car wash data for the period
+    # All of the member's entries for the year in one query
+    ledger = MemberLedger(member, year)
+    
+    # Count car wash services for this member's vehicles in the selected period
     carwash_count = 0
-    try:
-        # Count car wash services for this member's vehicles in the selected period
-        if member.vehicles.exists():
-            carwash_count = PaymentEntry.objects.filter(
-                payment_type__year=year,
-                payment_type__is_car_wash=True,
-                is_car_wash_record=True,
-                member=member,
-                month__gte=start_month,
-                month__lte=end_month
-            ).count()
-    except:
-        pass
+    if member.vehicles.exists():
+        carwash_count = ledger.carwash_count(start_month, end_month)
     
     # Get payment types
-    from_members_types = PaymentType.objects.filter(year=year, payment_type='from_members').order_by('name')
+    from_members_types = ledger.from_members_types
     
-    if from_members_types.exists():
+    if from_members_types:
         # Table header - no amount column, just months and total
         months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
         filtered_months = months[start_month-1:end_month]
@@ -3936,19 +3595,14 @@ def export_member_pdf(request, year_id, member_id):
             row_amounts = []
             row_total = 0
             
+            monthly_totals = ledger.monthly_totals(payment_type)
             for month_num in range(start_month, end_month + 1):
-                month_total = payment_type.entries.filter(
-                    month=month_num, 
-                    member=member
-                ).aggregate(total=Sum('amount_paid'))['total'] or 0
+                month_total = monthly_totals[month_num - 1] or 0
                 row_total += month_total
                 row_amounts.append(f"{month_total:,.2f}" if month_total > 0 else "-")
             
-            # Calculate expected amount for the period
-            months_in_period = end_month - start_month + 1
-            expected_amount = (payment_type.amount * months_in_period) if payment_type.amount else 0
-            balance = max(expected_amount - row_total, 0)
-            total_outstanding += balance
+            # Balance against the expected amount for the period
+            total_outstanding += ledger.balance(payment_type, start_month, end_month)
             
             row = [
                 f"{month_names[start_month-1][:3]}-{month_names[end_month-1][:3]}",
@@ -4060,13 +3714,11 @@ def email_member_report(request, year_id, member_id):
         
         email = member.user_account.email
         
-        # Validation 3: Check if member has any payment records
-        has_payments = PaymentEntry.objects.filter(
-            payment_type__year=year,
-            member=member
-        ).exists()
+        # All of the member's entries for the year in one query
+        ledger = MemberLedger(member, year)
         
-        if not has_payments:
+        # Validation 3: Check if member has any payment records
+        if not ledger.has_entries:
             return JsonResponse({
                 'success': False,
                 'error': 'No payment records found for this member.'
@@ -4160,23 +3812,13 @@ def email_member_report(request, year_id, member_id):
         # ===== PAYMENT TABLE =====
         # Get car wash data for full year
         carwash_count = 0
-        try:
-            if member.vehicles.exists():
-                carwash_count = PaymentEntry.objects.filter(
-                    payment_type__year=year,
-                    payment_type__is_car_wash=True,
-                    is_car_wash_record=True,
-                    member=member,
-                    month__gte=1,
-                    month__lte=12
-                ).count()
-        except:
-            pass
+        if member.vehicles.exists():
+            carwash_count = ledger.carwash_count()
         
         # Get payment types
-        from_members_types = PaymentType.objects.filter(year=year, payment_type='from_members').order_by('name')
+        from_members_types = ledger.from_members_types
         
-        if from_members_types.exists():
+        if from_members_types:
             # Table header - no amount column
             months = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
             month_names = ['January', 'February', 'March', 'April', 'May', 'June', 
@@ -4191,18 +3833,13 @@ def email_member_report(request, year_id, member_id):
                 row_amounts = []
                 row_total = 0
                 
-                for month_num in range(1, 13):
-                    month_total = payment_type.entries.filter(
-                        month=month_num, 
-                        member=member
-                    ).aggregate(total=Sum('amount_paid'))['total'] or 0
+                for month_total in ledger.monthly_totals(payment_type):
+                    month_total = month_total or 0
                     row_total += month_total
                     row_amounts.append(f"{month_total:,.2f}" if month_total > 0 else "-")
                 
-                # Calculate expected amount for full year
-                expected_amount = (payment_type.amount * 12) if payment_type.amount else 0
-                balance = max(expected_amount - row_total, 0)
-                total_outstanding += balance
+                # Balance against the expected amount for the full year
+                total_outstanding += ledger.balance(payment_type)
                 
                 row = [
                     "Jan-Dec",
@@ -4369,6 +4006,11 @@ def manage_carwash_compliance(request, year_id):
     }
     return render(request, 'payments/manage_carwash_compliance.html', context)
 
+from .payments import (
+    carwash_service_types, member_wash_counts, public_wash_counts, record_carwash, service_type_counts,
+    vehicle_compliance_grid, vehicle_wash_counts, wash_compliance, weakest_vehicle_counts,
+)
+
 @staff_member_required
 def carwash_year_detail(request, year_id):
     """
@@ -4403,72 +4045,52 @@ def carwash_year_detail(request, year_id):
             'service_type_breakdown': []
         })
     
-    # Get all members with vehicles
+    # Get all members with vehicles, paginated before any counting (10 per page)
+    from django.core.paginator import Paginator
     members_with_vehicles = Member.objects.filter(
         vehicles__isnull=False
-    ).distinct().prefetch_related('vehicles')
+    ).distinct().order_by('pk').prefetch_related('vehicles')
+    paginator = Paginator(members_with_vehicles, 10)
+    page_number = request.GET.get('page', 1)
+    page_obj = paginator.get_page(page_number)
     
-    members_carwash_data = []
+    # Wash counts for the page's members and their vehicles, one grouped query each
+    wash_counts = member_wash_counts([member.pk for member in page_obj.object_list], carwash_types)
+    vehicle_counts = vehicle_wash_counts(
+        [vehicle.pk for member in page_obj.object_list for vehicle in member.vehicles.all()], carwash_types
+    )
+    # No compliance settings configured means everyone is compliant
+    monthly_threshold = compliance.monthly_threshold if compliance else 0
     
-    for member in members_with_vehicles:
-        # Get all vehicles for this member
+    members_carwash_data = []
+    for member in page_obj.object_list:
         vehicles = member.vehicles.all()
-        
-        # Count car wash records per month (aggregated across all vehicles)
-        monthly_counts = []
-        total_count = 0
-        
-        for month_num in range(1, 13):
-            # Count entries for this member in this month (all vehicles combined)
-            count = PaymentEntry.objects.filter(
-                member=member,
-                payment_type__in=carwash_types,
-                month=month_num,
-                is_car_wash_record=True,
-                is_public_customer=False,  # Only member records
-                is_penalty=False
-            ).count()
-            
-            monthly_counts.append(count)
-            total_count += count
-        
-        # Check compliance using global threshold
-        if compliance:
-            # Monthly threshold applies per month
-            monthly_threshold = compliance.monthly_threshold
-            non_compliant_months = sum(1 for count in monthly_counts if count < monthly_threshold)
-            is_compliant = non_compliant_months == 0
-        else:
-            # No compliance settings configured
-            monthly_threshold = 0
-            non_compliant_months = 0
-            is_compliant = True
-        
+        monthly_counts = wash_counts[member.pk]
+        # The threshold applies per vehicle: a month only counts when every vehicle meets it
+        weakest_counts = weakest_vehicle_counts([vehicle.pk for vehicle in vehicles], vehicle_counts)
+        non_compliant_months, is_compliant = wash_compliance(weakest_counts, monthly_threshold)
+        month_cells = [
+            {
+                'count': count,
+                'is_short': weakest < monthly_threshold,
+                'vehicle_counts': [(vehicle.plate_number, vehicle_counts[vehicle.pk][index]) for vehicle in vehicles],
+            }
+            for index, (count, weakest) in enumerate(zip(monthly_counts, weakest_counts))
+        ]
         members_carwash_data.append({
             'member': member,
             'vehicles': vehicles,
             'monthly_counts': monthly_counts,
-            'total_count': total_count,
+            'month_cells': month_cells,
+            'total_count': sum(monthly_counts),
             'is_compliant': is_compliant,
             'non_compliant_months': non_compliant_months,
             'monthly_threshold': monthly_threshold
         })
     
-    # Get public customer statistics (monthly breakdown)
-    public_customer_data = []
-    public_total = 0
-    
-    for month_num in range(1, 13):
-        count = PaymentEntry.objects.filter(
-            payment_type__in=carwash_types,
-            month=month_num,
-            is_car_wash_record=True,
-            is_public_customer=True,
-            is_penalty=False
-        ).count()
-        
-        public_customer_data.append(count)
-        public_total += count
+    # Public customer statistics (monthly breakdown)
+    public_customer_data = public_wash_counts(carwash_types)
+    public_total = sum(public_customer_data)
     
     # Get individual public customer records with names
     public_customer_records = PaymentEntry.objects.filter(
@@ -4479,27 +4101,15 @@ def carwash_year_detail(request, year_id):
     ).select_related('payment_type').order_by('customer_name', 'month')
     
     # Service type breakdown (how many times each service was used)
+    type_counts = service_type_counts(carwash_types)
     service_type_breakdown = []
     for service_type in carwash_types:
-        member_count = PaymentEntry.objects.filter(
-            payment_type=service_type,
-            is_car_wash_record=True,
-            is_public_customer=False,
-            is_penalty=False
-        ).count()
-        
-        public_count = PaymentEntry.objects.filter(
-            payment_type=service_type,
-            is_car_wash_record=True,
-            is_public_customer=True,
-            is_penalty=False
-        ).count()
-        
+        counts = type_counts.get(service_type.pk, {'member_count': 0, 'public_count': 0})
         service_type_breakdown.append({
             'name': service_type.name,
-            'member_count': member_count,
-            'public_count': public_count,
-            'total_count': member_count + public_count
+            'member_count': counts['member_count'],
+            'public_count': counts['public_count'],
+            'total_count': counts['member_count'] + counts['public_count']
         })
     
     # Get recent car wash logs for this year
@@ -4508,17 +4118,13 @@ def carwash_year_detail(request, year_id):
         carwash_year=year.year
     ).select_related('member', 'vehicle', 'logged_by').order_by('-timestamp')[:5]
     
-    # Pagination for member records (10 per page)
-    from django.core.paginator import Paginator
-    paginator = Paginator(members_carwash_data, 10)
-    page_number = request.GET.get('page', 1)
-    page_obj = paginator.get_page(page_number)
+    page_obj.object_list = members_carwash_data
 
     context = {
         'year': year,
         'compliance': compliance,
         'carwash_types': carwash_types,
-        'members_carwash_data': members_carwash_data,  # Keep full list for breakdown
+        'members_carwash_data': members_carwash_data,  # Rows for the current page
         'page_obj': page_obj,  # Paginated data
         'is_paginated': page_obj.has_other_pages(),
         'public_customer_data': public_customer_data,
@@ -4532,6 +4138,40 @@ def carwash_year_detail(request, year_id):
     return render(request, 'payments/carwash_year_detail.html', context)
 
 
+@staff_member_required
+def vehicle_compliance_api(request, year_id):
+    """
+    Per-vehicle car wash counts and compliance for a year, in one query.
+    GET params: plate (spaces, dashes and case are ignored), member_id
+    Returns JSON { year, monthly_threshold, vehicles: [{ vehicle_id, plate_number,
+    member_id, member_name, counts, compliant, is_compliant }] } with 12 entries
+    (January first) in counts and compliant.
+    """
+    from .models import CarWashCompliance, Vehicle
+
+    year = get_object_or_404(PaymentYear, pk=year_id)
+    compliance = CarWashCompliance.objects.filter(year=year).first()
+    # No compliance settings configured means everyone is compliant
+    monthly_threshold = compliance.monthly_threshold if compliance else 0
+
+    vehicles = Vehicle.objects.filter(member__isnull=False)
+    plate = request.GET.get('plate', '').strip()
+    if plate:
+        vehicles = vehicles.filter(plate_key=Vehicle.normalize_plate(plate))
+    member_id = request.GET.get('member_id', '').strip()
+    if member_id:
+        if not member_id.isdigit():
+            return JsonResponse({'error': 'Invalid member_id'}, status=400)
+        vehicles = vehicles.filter(member_id=member_id)
+
+    carwash_types = PaymentType.objects.filter(year=year, is_car_wash=True)
+    return JsonResponse({
+        'year': year.year,
+        'monthly_threshold': monthly_threshold,
+        'vehicles': vehicle_compliance_grid(vehicles, carwash_types, monthly_threshold),
+    })
+
+
 @staff_member_required
 def add_carwash_type(request, year_id):
     """
@@ -4669,15 +4309,93 @@ def add_carwash_record(request, year_id):
     })
 
 
+@staff_member_required
+@require_POST
+def carwash_pos_api(request, year_id):
+    """
+    Record one car wash from the wash bay as JSON:
+    {"plate": "ABC 1234", "service_type": 5} for a member's vehicle (or
+    "member_id" when the member has a single vehicle), or
+    {"customer_name": "Juan", "plate": "...", "service_type": 5} for a public
+    customer. "month" defaults to the current month.
+
+    An idempotency key (Idempotency-Key header or "idempotency_key") makes
+    retries safe: a repeated key returns the first transaction unchanged.
+    Returns JSON { success, transaction_id, replayed }.
+    """
+    from .models import Vehicle
+
+    catalog = carwash_service_types(year_id)
+    if catalog is None:
+        return JsonResponse({'success': False, 'error': 'Unknown payment year.'}, status=404)
+    try:
+        payload = json.loads(request.body)
+        service_type_id = int(payload['service_type'])
+        month = int(payload.get('month') or timezone.localdate().month)
+        member_id = int(payload['member_id']) if payload.get('member_id') else None
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return JsonResponse({'success': False, 'error': 'Expected a service_type and a plate or member_id.'}, status=400)
+
+    service = catalog['services'].get(service_type_id)
+    if service is None:
+        return JsonResponse({'success': False, 'error': f'Unknown car wash service type for {catalog["year"]}.'}, status=400)
+    if not 1 <= month <= 12:
+        return JsonResponse({'success': False, 'error': 'Month must be between 1 and 12.'}, status=400)
+    idempotency_key = str(request.headers.get('Idempotency-Key') or payload.get('idempotency_key') or '').strip()
+    if len(idempotency_key) > 64:
+        return JsonResponse({'success': False, 'error': 'Idempotency key is limited to 64 characters.'}, status=400)
+
+    plate = str(payload.get('plate') or '').strip()
+    customer_name = str(payload.get('customer_name') or '').strip()
+    if len(plate) > 20 or len(customer_name) > 255:
+        return JsonResponse({'success': False, 'error': 'Plate or customer name is too long.'}, status=400)
+    vehicle_id = None
+    if not customer_name:
+        plate_key = Vehicle.normalize_plate(plate)
+        if not plate_key and member_id is None:
+            return JsonResponse({'success': False, 'error': 'Expected a plate or member_id.'}, status=400)
+        vehicles = Vehicle.objects.filter(member__isnull=False)
+        if plate_key:
+            vehicles = vehicles.filter(plate_key=plate_key)
+        if member_id is not None:
+            vehicles = vehicles.filter(member_id=member_id)
+        matches = list(vehicles.values_list('pk', 'member_id')[:2])
+        if not matches:
+            return JsonResponse({'success': False, 'error': 'No member vehicle matches.'}, status=404)
+        if len(matches) > 1:
+            return JsonResponse({'success': False, 'error': 'Several vehicles match; send the plate number.'}, status=400)
+        vehicle_id, member_id = matches[0]
+    else:
+        member_id = None
+
+    log, created = record_carwash(
+        year_id, catalog['year'], service_type_id, service, month,
+        member_id=member_id,
+        vehicle_id=vehicle_id,
+        customer_name=customer_name,
+        vehicle_plate=plate,
+        recorded_by=request.user,
+        idempotency_key=idempotency_key,
+    )
+    return JsonResponse(
+        {'success': True, 'transaction_id': log.transaction_id, 'replayed': not created},
+        status=201 if created else 200,
+    )
+
+
 @staff_member_required
 def carwash_public_records(request, year_id):
     """
     Display all public customer car wash records for a specific year.
     Includes search, filtering by service type and month, and pagination.
     Separate view for better scalability and organization.
+    
+    Statistics come from one aggregate query and the 50-row page is
+    positioned by (timestamp, id) cursors rather than page numbers.
     """
-    from django.db.models import Count, Sum, Q
+    from django.db.models import Q
     from .models import CarWashLog
+    from .payments import carwash_log_stats, keyset_page
     
     year = get_object_or_404(PaymentYear, pk=year_id)
     
@@ -4691,7 +4409,7 @@ def carwash_public_records(request, year_id):
     records = CarWashLog.objects.filter(
         carwash_year=year.year,
         customer_type='public'
-    ).select_related('logged_by').order_by('-timestamp')
+    ).select_related('logged_by')
     
     # Apply filters
     search = request.GET.get('search', '').strip()
@@ -4711,35 +4429,20 @@ def carwash_public_records(request, year_id):
     if month_filter:
         records = records.filter(carwash_month=int(month_filter))
     
-    # Calculate statistics
-    total_records = records.count()
-    unique_customers = records.values('customer_name').distinct().count()
-    total_revenue = records.aggregate(total=Sum('service_amount'))['total'] or 0
-    average_amount = (total_revenue / total_records) if total_records > 0 else 0
-    
-    # Monthly breakdown
-    monthly_breakdown = records.values('carwash_month').annotate(
-        count=Count('id'),
-        revenue=Sum('service_amount')
-    ).order_by('carwash_month')
+    # Calculate statistics (counts, unique customers, revenue, monthly breakdown)
+    stats = carwash_log_stats(records)
     
-    # Pagination
-    from django.core.paginator import Paginator
-    paginator = Paginator(records, 50)  # 50 records per page
-    page_number = request.GET.get('page', 1)
-    page_obj = paginator.get_page(page_number)
+    # Pagination: ?after=<cursor> for older records, ?before=<cursor> for newer
+    before = request.GET.get('before', '').strip()
+    page = keyset_page(records, cursor=before or request.GET.get('after', '').strip(), before=bool(before), per_page=50)
     
     context = {
         'year': year,
-        'records': page_obj,
-        'page_obj': page_obj,
-        'is_paginated': page_obj.has_other_pages(),
+        'records': page['object_list'],
+        'page': page,
+        'is_paginated': page['has_next'] or page['has_previous'],
         'service_types': service_types,
-        'total_records': total_records,
-        'unique_customers': unique_customers,
-        'total_revenue': total_revenue,
-        'average_amount': average_amount,
-        'monthly_breakdown': monthly_breakdown,
+        **stats,
         # Preserve filter values
         'search': search,
         'service_type_filter': service_type_filter,
@@ -4852,6 +4555,7 @@ def notifications_center(request):
 # ============================================================================
 
 from .models import PaymentLog, CarWashLog, LogEmailHistory
+from .payments import CARWASH_PENALTY_TYPE_NAME, settle_carwash_penalty
 from django.core.paginator import Paginator
 from django.db.models import Q, Count, Sum
 from datetime import datetime, date
@@ -4959,11 +4663,25 @@ def payment_logs_view(request):
         'logged_by_id': logged_by_id,
         'status': status,
         'search': search,
+        'carwash_penalty_type_name': CARWASH_PENALTY_TYPE_NAME,
     }
     
     return render(request, 'logs/payment_logs.html', context)
 
 
+@staff_member_required
+@require_POST
+def settle_carwash_penalty_view(request, log_id):
+    """Mark a pending car wash penalty as paid, recording its payment entry."""
+    penalty_log = get_object_or_404(PaymentLog, pk=log_id, status='pending')
+    entry = settle_carwash_penalty(penalty_log, recorded_by=request.user)
+    if entry is None:
+        messages.error(request, f'{penalty_log.transaction_id} is not a car wash penalty.')
+    else:
+        messages.success(request, f'Car wash penalty {penalty_log.transaction_id} marked as paid (₱{entry.amount_paid}).')
+    return redirect(request.META.get('HTTP_REFERER', 'payment_logs'))
+
+
 @staff_member_required
 def carwash_logs_view(request):
     """
@@ -0,0 +1,52 @@
+# coop/whiteboard.py
+"""
+Cached counts for the staff whiteboard.
+
+pending_counts_api is polled by every open staff page, so the counts are
+kept in the cache and only recomputed after an account activation, a
+document entry change or a renewal (see coop.signals).
+"""
+from django.core.cache import cache
+
+from .renewals import local_today, pending_renewals_count
+
+PENDING_COUNTS_KEY = 'whiteboard:pending_counts:{date}'
+
+# Renewal buckets depend on the date, so keys are per day and simply age out
+PENDING_COUNTS_TIMEOUT = 60 * 60 * 24
+
+
+def get_pending_counts(today=None):
+    """
+    Whiteboard counts, served from the cache when possible.
+
+    Args:
+        today: Reference date for the renewal window (defaults to local today)
+
+    Returns:
+        dict with 'accounts', 'documents' and 'renewals' counts
+    """
+    from django.contrib.auth import get_user_model
+    from .models import DocumentEntry
+
+    today = today or local_today()
+    key = PENDING_COUNTS_KEY.format(date=today.isoformat())
+    counts = cache.get(key)
+    if counts is None:
+        UserModel = get_user_model()
+        counts = {
+            # pending accounts: client role and not active
+            'accounts': UserModel.objects.filter(is_active=False, dormant=0).count(),
+            # documents pending: entries uploaded by users with status "pending"
+            'documents': DocumentEntry.objects.filter(status__iexact="pending", uploaded_by__isnull=False).count(),
+            # urgent + upcoming renewals
+            'renewals': pending_renewals_count(today),
+        }
+        cache.set(key, counts, PENDING_COUNTS_TIMEOUT)
+    return counts
+
+
+def invalidate_pending_counts(today=None):
+    """Drop today's cached whiteboard counts."""
+    today = today or local_today()
+    cache.delete(PENDING_COUNTS_KEY.format(date=today.isoformat()))
@@ -89,6 +89,29 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Redis in production (set REDIS_URL), local memory for development and tests.
+
+REDIS_URL = os.environ.get('REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'coopims',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'coopims',
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -146,6 +169,17 @@ LOGOUT_REDIRECT_URL = 'login'
 LOGIN_REDIRECT_URL = 'home'
 LOGIN_URL = 'login'
 
+# Payments
+# Store only real payments; member month grids treat missing months as unpaid.
+# Set to False to keep seeding zero-amount placeholder entries for every
+# member and "From Members" payment type.
+PAYMENT_SPARSE_LEDGER = True
+
+# Transaction IDs each worker reserves at a time (see coop.sequences). 1 keeps
+# IDs gap-free and in posting order; larger blocks cut contention on the
+# sequence row when many cashiers post at once.
+TRANSACTION_ID_BLOCK_SIZE = 1
+
 
 # Hardcoded email credentials for PythonAnywhere
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
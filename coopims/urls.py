@@ -81,6 +81,8 @@ urlpatterns = [
     path('api/members/vehicle-search/', views.member_for_vehicle_search_api, name='member_for_vehicle_search_api'),
     path('api/user/document-entry-count/', views.user_document_entry_count_api, name='user_document_entry_count_api'),
     path('api/pending_counts/', views.pending_counts_api, name='api_pending_counts'),
+    path('api/batches/<int:pk>/preview/', views.batch_preview_api, name='batch_preview_api'),
+    path('api/renewals/calendar/', views.renewal_calendar_api, name='renewal_calendar_api'),
     path('api/users/search/', views.user_search_api, name='user_search_api'),
     path('api/vehicle-member-select2/', views.vehicle_member_select2_api, name='vehicle_member_select2_api'),
     path('api/vehicle-data/', views.get_vehicle_data, name='get_vehicle_data'),
@@ -102,6 +104,8 @@ urlpatterns = [
     path('payments/<int:year_id>/other/add-entry/', views.add_other_payment_entry, name='add_other_payment_entry'),
     path('payments/<int:year_id>/from-members/<int:member_id>/', views.member_payment_list, name='member_payment_list'),
     path('payments/<int:year_id>/from-members/<int:member_id>/add-entry/', views.add_payment_entry, name='add_payment_entry_member'),
+    path('payments/<int:year_id>/from-members/<int:member_id>/add-batch/', views.add_payment_batch, name='add_payment_batch'),
+    path('api/payments/<int:year_id>/batch/', views.payment_batch_api, name='payment_batch_api'),
     
     # PDF EXPORTS
     path('payments/<int:year_id>/export/<str:report_type>/', views.export_year_pdf, name='export_year_pdf'),
@@ -115,10 +119,13 @@ urlpatterns = [
     path('payments/<int:year_id>/carwash/add-type/', views.add_carwash_type, name='add_carwash_type'),
     path('payments/<int:year_id>/carwash/edit-type/<int:type_id>/', views.edit_carwash_type, name='edit_carwash_type'),
     path('payments/<int:year_id>/carwash/add-record/', views.add_carwash_record, name='add_carwash_record'),
+    path('api/carwash/<int:year_id>/record/', views.carwash_pos_api, name='carwash_pos_api'),
+    path('api/carwash/<int:year_id>/vehicle-compliance/', views.vehicle_compliance_api, name='vehicle_compliance_api'),
 
     # RENEWAL TRACKING
     path('renewals/', views.renewals_hub, name='renewals_hub'),
     path('renewals/bulk-send/', views.send_bulk_renewal_reminders, name='send_bulk_renewal_reminders'),
+    path('renewals/campaigns/<int:pk>/progress/', views.renewal_campaign_progress, name='renewal_campaign_progress'),
     path('renewals/<str:date>/', views.renewal_details, name='renewal_details'),
     path('renewals/<int:member_id>/<int:vehicle_id>/send-reminder/', views.send_renewal_reminder, name='send_renewal_reminder'),
     path('renewals/<int:member_id>/<int:vehicle_id>/mark-renewed/', views.mark_as_renewed, name='mark_as_renewed'),
@@ -137,6 +144,7 @@ urlpatterns = [
     
     # LOGGING SYSTEM
     path('logs/payments/', views.payment_logs_view, name='payment_logs'),
+    path('logs/payments/<int:log_id>/settle-penalty/', views.settle_carwash_penalty_view, name='settle_carwash_penalty'),
     path('logs/carwash/', views.carwash_logs_view, name='carwash_logs'),
     path('logs/member/<int:member_id>/', views.member_logs_view, name='member_logs'),
     path('logs/member/<int:member_id>/send-email/', views.send_member_logs_email, name='send_member_logs_email'),
@@ -1,9 +1,8 @@
-// Updated: prefer --batch-default, and fallback to client-side member expiry parsing when server counts are zero.
-// Draws donuts and recalculates urgent/warning if needed.
+// Draws batch donuts from the server-side counts on each card and loads the
+// member preview for a card on demand.
 
 (function () {
   'use strict';
-  var MS_PER_DAY = 1000 * 60 * 60 * 24;
 
   function getCssVar(name) {
     var el = document.querySelector('.admin-dashboard') || document.documentElement;
@@ -21,41 +20,6 @@
     return { urgent: urgent, warning: upcoming, normal: normal, bg: bg };
   })();
 
-  function parseDateSafe(s) {
-    if (!s || s === 'N/A') return null;
-    var d = new Date(s);
-    if (!isNaN(d.getTime())) return new Date(d.getFullYear(), d.getMonth(), d.getDate());
-    var parts = ('' + s).trim().split(/[-\/]/);
-    if (parts.length === 3) {
-      var y = parseInt(parts[0],10), m = parseInt(parts[1],10)-1, day = parseInt(parts[2],10);
-      if (!isNaN(y) && !isNaN(m) && !isNaN(day)) return new Date(y,m,day);
-    }
-    return null;
-  }
-
-  function addYearsSafe(dateObj, years) {
-    var d = new Date(dateObj.getTime());
-    var y = d.getFullYear() + years;
-    d.setFullYear(y);
-    // handle Feb 29 -> Feb 28 if invalid
-    if (d.getMonth() !== dateObj.getMonth()) {
-      d.setMonth(1); d.setDate(28);
-    }
-    return d;
-  }
-
-  // normalize expiry: if expiry < today, advance by years until >= today (cap attempts)
-  function normalizeExpiryToFuture(expiryDate, todayDate) {
-    if (!expiryDate) return null;
-    var e = new Date(expiryDate.getFullYear(), expiryDate.getMonth(), expiryDate.getDate());
-    var attempts = 0;
-    while (e < todayDate && attempts < 5) {
-      e = addYearsSafe(e, 1);
-      attempts++;
-    }
-    return e;
-  }
-
   function buildSegments(total, urgent, upcoming) {
     var normal = Math.max(0, total - (urgent + upcoming));
     var segs = [];
@@ -136,83 +100,15 @@
     });
   }
 
-  // compute counts from members_preview, using new thresholds:
-  // URGENT: 0-29 days before renewal
-  // UPCOMING: 30-60 days before renewal
-  function computeCountsFromPreview(batchObj) {
-    var total = 0, urgent = 0, upcoming = 0;
-    if (!batchObj) return { total:0, urgent:0, upcoming:0 };
-
-    // members_preview expected: [{ member_name, vehicles: [{ plate, expiry_date, days_left, status }] }, ...]
-    var members = batchObj.members_preview || batchObj.members || [];
-    if (!Array.isArray(members)) return { total:0, urgent:0, upcoming:0 };
-
-    total = members.length;
-
-    var today = (window._today_iso) ? parseDateSafe(window._today_iso) : new Date();
-    var todayMid = new Date(today.getFullYear(), today.getMonth(), today.getDate()).getTime();
-
-    members.forEach(function(member) {
-      var memberUrgent = false;
-      var memberUpcoming = false;
-
-      // If preview has vehicles array
-      var vehicles = Array.isArray(member.vehicles) ? member.vehicles : (member.members || []);
-      if (!Array.isArray(vehicles) && member.expiry_date) {
-        // legacy single-vehicle preview
-        vehicles = [{ expiry_date: member.expiry_date, plate: member.plate || null }];
-      }
-
-      vehicles.forEach(function (v) {
-        var expiryStr = v.expiry_date || v.expiry || null;
-        var expiry = parseDateSafe(expiryStr);
-        if (!expiry) return;
-        expiry = normalizeExpiryToFuture(expiry, new Date(today.getFullYear(), today.getMonth(), today.getDate()));
-        if (!expiry) return;
-        var expiryMid = new Date(expiry.getFullYear(), expiry.getMonth(), expiry.getDate()).getTime();
-        var diffMs = expiryMid - todayMid;
-        var daysLeft = Math.ceil(diffMs / MS_PER_DAY);
-
-        if (daysLeft >= 0 && daysLeft <= 29) {
-          memberUrgent = true;
-        } else if (daysLeft >= 30 && daysLeft <= 60) {
-          if (!memberUrgent) memberUpcoming = true;
-        }
-      });
-
-      if (memberUrgent) urgent++;
-      else if (memberUpcoming) upcoming++;
-      // else counted as normal implicitly (normal = total - urgent - upcoming)
-    });
-
-    return { total: total, urgent: urgent, upcoming: upcoming };
-  }
-
   function renderBatchCards() {
-    var data = Array.isArray(window.batchCards) ? window.batchCards : [];
     var grid = document.getElementById('batchGrid');
     if (!grid) return;
     var cards = grid.querySelectorAll('.batch-card');
-    cards.forEach(function (card, idx) {
+    cards.forEach(function (card) {
       var total = parseInt(card.dataset.total || '0', 10) || 0;
       var urgent = parseInt(card.dataset.urgent || '0', 10) || 0;
       var upcoming = parseInt(card.dataset.warning || '0', 10) || 0; // note: attribute still named data-warning
 
-      // if server counts zero or missing, compute from preview
-      if ((!total || total === 0) && data.length) {
-        var dataIdx = parseInt(card.getAttribute('data-batch-index'), 10);
-        var useIdx = (!isNaN(dataIdx) ? dataIdx : idx);
-        var batchObj = data[useIdx] || null;
-        if (batchObj) {
-          var counts = computeCountsFromPreview(batchObj);
-          if (counts.total) {
-            total = counts.total;
-            urgent = counts.urgent;
-            upcoming = counts.upcoming;
-          }
-        }
-      }
-
       var svg = card.querySelector('.batch-svg');
       if (!svg) return;
       var segments = buildSegments(total, urgent, upcoming);
@@ -235,8 +131,88 @@
     });
   }
 
+  // ---- member preview (fetched once per batch when a card is expanded) ----
+  var previewCache = {};
+  var openToggle = null;
+
+  function escapeHtml(value) {
+    return String(value == null ? '' : value).replace(/[&<>"']/g, function (c) {
+      return { '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;' }[c];
+    });
+  }
+
+  function renderPreview(panel, data) {
+    var body = panel.querySelector('.batch-preview-body');
+    var members = (data && data.members_preview) || [];
+    panel.querySelector('.batch-preview-title').textContent = 'Batch ' + (data.number || '') + ' members';
+    if (!members.length) {
+      body.innerHTML = '<p class="text-muted mb-0">No members in this batch.</p>';
+      return;
+    }
+    body.innerHTML = '<ul class="list-unstyled mb-0">' + members.map(function (m) {
+      var vehicles = (m.vehicles || []).map(function (v) {
+        var expiry = v.expiry_date ? (v.expiry_date + ' (' + v.days_left + 'd)') : 'N/A';
+        return '<span class="preview-vehicle ' + escapeHtml(v.status) + '">' + escapeHtml(v.plate) + ' · ' + escapeHtml(expiry) + '</span>';
+      }).join(', ');
+      return '<li><strong>' + escapeHtml(m.member_name) + '</strong>' + (vehicles ? ' — ' + vehicles : '') + '</li>';
+    }).join('') + '</ul>';
+  }
+
+  function closePreview() {
+    var panel = document.getElementById('batchPreview');
+    if (panel) panel.hidden = true;
+    if (openToggle) openToggle.setAttribute('aria-expanded', 'false');
+    openToggle = null;
+  }
+
+  function togglePreview(toggle) {
+    var panel = document.getElementById('batchPreview');
+    var url = toggle.getAttribute('data-preview-url');
+    if (!panel || !url) return;
+    if (openToggle === toggle) { closePreview(); return; }
+    closePreview();
+    openToggle = toggle;
+    toggle.setAttribute('aria-expanded', 'true');
+    panel.hidden = false;
+
+    if (previewCache[url]) { renderPreview(panel, previewCache[url]); return; }
+    panel.querySelector('.batch-preview-body').innerHTML = '<p class="text-muted mb-0">Loading…</p>';
+    fetch(url, { credentials: 'same-origin', headers: { 'X-Requested-With': 'XMLHttpRequest' } })
+      .then(function (res) { if (!res.ok) throw new Error('HTTP ' + res.status); return res.json(); })
+      .then(function (data) {
+        previewCache[url] = data;
+        if (openToggle === toggle) renderPreview(panel, data);
+      })
+      .catch(function () {
+        panel.querySelector('.batch-preview-body').innerHTML = '<p class="text-danger mb-0">Could not load members.</p>';
+      });
+  }
+
+  function initPreview() {
+    var grid = document.getElementById('batchGrid');
+    if (!grid) return;
+    grid.addEventListener('click', function (e) {
+      var toggle = e.target.closest('.batch-preview-toggle');
+      if (!toggle) return;
+      // the toggle sits inside the card link; don't navigate
+      e.preventDefault();
+      e.stopPropagation();
+      togglePreview(toggle);
+    });
+    grid.addEventListener('keydown', function (e) {
+      var toggle = e.target.closest('.batch-preview-toggle');
+      if (!toggle || (e.key !== 'Enter' && e.key !== ' ')) return;
+      e.preventDefault();
+      e.stopPropagation();
+      togglePreview(toggle);
+    });
+    var closeBtn = document.querySelector('#batchPreview .batch-preview-close');
+    if (closeBtn) closeBtn.addEventListener('click', closePreview);
+  }
+
   function initRender() {
     renderBatchCards();
+    initPreview();
     document.addEventListener('batchCharts:refresh', renderBatchCards);
     var grid = document.getElementById('batchGrid');
     if (grid && window.MutationObserver) {